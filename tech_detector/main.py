@@ -1,12 +1,13 @@
 import argparse
+import os
 import sys
 import json
-import webbrowser
 from src.scanner import Scanner
+from src.registry import MODULES, resolve_modules
 
 def main():
     parser = argparse.ArgumentParser(description="Advanced Web Technology Detector (Professional Edition)")
-    parser.add_argument("url", help="Target URL to scan")
+    parser.add_argument("url", nargs="?", help="Target URL to scan")
     parser.add_argument("--json", action="store_true", help="Output in JSON format")
     parser.add_argument("--verbose", "-v", action="store_true", help="Show detailed evidence")
     parser.add_argument("--deep", "-d", action="store_true", help="Enable Deep Crawler (scans sub-pages)")
@@ -15,17 +16,139 @@ def main():
     parser.add_argument("--passive", action="store_true", help="Passive Mode (Skip active port/error scans)")
     parser.add_argument("--threads", type=int, default=5, help="Number of crawl threads (default: 5)")
     parser.add_argument("--proxy", help="Proxy URL (e.g. http://127.0.0.1:8080)")
+    parser.add_argument("--time-budget", type=float, help="Total scan time budget in seconds (returns partial results when hit)")
+    parser.add_argument("--phase-budget", action="append", default=[], metavar="PHASE=SECONDS",
+                        help="Sub-budget for a phase: infrastructure, recon or content (repeatable)")
+    parser.add_argument("--incremental", action="store_true", help="Reuse analysis from the previous scan for unchanged pages")
+    parser.add_argument("--state-dir", help="Directory for incremental scan state (default: ~/.cache/techdetector/state)")
+    parser.add_argument("--modules", help="Comma-separated modules to run (see --list-modules)")
+    parser.add_argument("--skip", help="Comma-separated modules to skip")
+    parser.add_argument("--list-modules", action="store_true", help="List available modules and exit")
+    parser.add_argument("--ports", help="Port profile (default, top-100, top-1000, all) or list/ranges, e.g. 22,80,8000-8100")
+    parser.add_argument("--wordlist", help="Subdomain wordlist file (one label per line) for brute-forcing")
+    parser.add_argument("--resolvers", help="Comma-separated DNS resolvers for subdomain brute-forcing, e.g. 1.1.1.1,8.8.8.8")
+    parser.add_argument("--ct-mirror", help="Certificate Transparency source instead of crt.sh: a JSON/text dump, a directory of <domain>.json dumps, or a crt.sh-compatible URL")
+    parser.add_argument("--path-wordlist", help="Path wordlist file (one path per line) for content discovery, on top of the built-in sensitive files")
+    parser.add_argument("--path-extensions", help="Comma-separated extensions tried on bare wordlist names, e.g. php,aspx,txt")
+    parser.add_argument("--path-backups", action="store_true", help="Also try backup copies of files (.bak, .old, ~, .swp...)")
+    parser.add_argument("--fingerprints", help="Fingerprints JSON file or a directory of shards (ours or upstream Wappalyzer) instead of data/fingerprints.json")
+    parser.add_argument("--favicon-db", help="Comma-separated favicon hash datasets (Shodan mmh3 hashes; JSON or hash,name lines)")
+    parser.add_argument("--geoip-db", help="Comma-separated local IP-range datasets (CSV/TSV) for offline GeoIP/ASN lookups")
+    parser.add_argument("--geoip-offline", action="store_true", help="Never query the online GeoIP API (use only --geoip-db)")
+    parser.add_argument("--vuln-db", help="Vulnerability store (SQLite) used for CVE correlation (default: ~/.cache/techdetector/vulnerabilities.sqlite)")
+    parser.add_argument("--import-advisories", action="append", default=[], metavar="PATH",
+                        help="Import an NVD JSON feed, OSV export (.json/.json.gz/.zip) or a directory of them into the vulnerability store (repeatable)")
+    parser.add_argument("--serve", action="store_true", help="Run as a scan service with a warm scanner (HTTP API)")
+    parser.add_argument("--listen", default="127.0.0.1:8700", help="Service address HOST:PORT (default: 127.0.0.1:8700)")
+    parser.add_argument("--socket", help="Serve on a Unix socket at this path instead of TCP")
+    parser.add_argument("--max-jobs", type=int, default=4, help="Concurrent scans in service mode (default: 4)")
+    parser.add_argument("--max-queue", type=int, default=16, help="Queued scans before the service rejects new jobs (default: 16)")
     
     args = parser.parse_args()
+
+    if args.list_modules:
+        for spec in MODULES.values():
+            deps = f" (needs: {', '.join(spec.depends)})" if spec.depends else ""
+            print(f"{spec.name:<12} {spec.cost:<8} {spec.description}{deps}")
+        return
+
+    modules = [m.strip() for m in args.modules.split(",") if m.strip()] if args.modules else None
+    skip = [m.strip() for m in args.skip.split(",") if m.strip()] if args.skip else None
+    unknown = [m for m in (modules or []) + (skip or []) if m not in MODULES]
+    if unknown:
+        parser.error(f"unknown module(s): {', '.join(unknown)} (see --list-modules)")
+    if args.deep and 'crawl' not in resolve_modules(modules, skip):
+        parser.error("--deep needs the crawl module (add it to --modules or drop it from --skip)")
+
+    module_options = {}
+    if args.fingerprints:
+        if not os.path.exists(args.fingerprints):
+            parser.error(f"fingerprints not found: {args.fingerprints}")
+        module_options.setdefault('tech', {})['fingerprints_path'] = args.fingerprints
+    if args.favicon_db:
+        favicon_paths = [p.strip() for p in args.favicon_db.split(",") if p.strip()]
+        for path in favicon_paths:
+            if not os.path.isfile(path):
+                parser.error(f"favicon dataset not found: {path}")
+        module_options.setdefault('tech', {})['favicon_db_paths'] = favicon_paths
+    if args.ports:
+        from src.port_scanner import PortScanner # asyncio: only when ports are asked for
+        try:
+            PortScanner.parse_ports(args.ports)
+        except ValueError as e:
+            parser.error(f"invalid --ports: {e}")
+        module_options['ports'] = {'ports': args.ports}
+    if args.wordlist or args.resolvers or args.ct_mirror:
+        if args.wordlist and not os.path.isfile(args.wordlist):
+            parser.error(f"wordlist not found: {args.wordlist}")
+        module_options['subdomains'] = {
+            'wordlist': args.wordlist,
+            'resolvers': [r.strip() for r in args.resolvers.split(",") if r.strip()] if args.resolvers else None,
+            'ct_mirror': args.ct_mirror
+        }
+    if args.path_wordlist or args.path_extensions or args.path_backups:
+        if args.path_wordlist and not os.path.isfile(args.path_wordlist):
+            parser.error(f"path wordlist not found: {args.path_wordlist}")
+        module_options['files'] = {
+            'wordlist': args.path_wordlist,
+            'extensions': [e.strip() for e in args.path_extensions.split(",") if e.strip()] if args.path_extensions else None,
+            'backups': args.path_backups
+        }
+    if args.geoip_db or args.geoip_offline:
+        db_paths = [p.strip() for p in args.geoip_db.split(",") if p.strip()] if args.geoip_db else None
+        for path in db_paths or []:
+            if not os.path.isfile(path):
+                parser.error(f"GeoIP dataset not found: {path}")
+        module_options['geoip'] = {'db_paths': db_paths, 'online': not args.geoip_offline}
+
+    if args.vuln_db:
+        module_options['vulns'] = module_options['headers'] = {'store_path': args.vuln_db}
+    if args.import_advisories:
+        from src.vuln_store import VulnerabilityStore
+        store = VulnerabilityStore(args.vuln_db)
+        for path in args.import_advisories:
+            if not os.path.exists(path):
+                parser.error(f"advisory feed not found: {path}")
+            print(f"[*] Importing advisories from {path}...")
+            imported, skipped, count = store.import_path(path)
+            print(f"[+] {count} advisories from {imported} file(s); {skipped} unchanged file(s) skipped.")
+        if not args.url and not args.serve:
+            return
+
+    phase_budgets = {}
+    for item in args.phase_budget:
+        name, _, seconds = item.partition("=")
+        if name not in Scanner.PHASE_SHARES or not seconds:
+            parser.error(f"invalid --phase-budget '{item}' (expected e.g. recon=30)")
+        try:
+            phase_budgets[name] = float(seconds)
+        except ValueError:
+            parser.error(f"invalid --phase-budget '{item}' (expected e.g. recon=30)")
     
-    scanner = Scanner(proxy=args.proxy)
+    if args.serve:
+        from src.service import serve
+        host, _, port = args.listen.rpartition(":")
+        scanner = Scanner(proxy=args.proxy, state_dir=args.state_dir, asset_cache_size=500, skip=skip,
+                          module_options=module_options)
+        serve(scanner, host=host or "127.0.0.1", port=int(port), socket_path=args.socket,
+              max_jobs=args.max_jobs, max_queue=args.max_queue)
+        return
+
+    if not args.url:
+        parser.error("the following arguments are required: url")
+
+    scanner = Scanner(proxy=args.proxy, state_dir=args.state_dir, modules=modules, skip=skip,
+                      module_options=module_options)
     results, data, report_path, csv_path = scanner.scan(
         args.url, 
         deep_scan=args.deep, 
         passive_mode=args.passive,
         threads=args.threads,
         generate_report=args.report, 
-        export_csv=args.csv
+        export_csv=args.csv,
+        time_budget=args.time_budget,
+        phase_budgets=phase_budgets,
+        incremental=args.incremental
     )
     
     if args.json:
@@ -53,6 +176,7 @@ def main():
 
     if report_path:
         print(f"\n[+] Report Generated: {report_path}")
+        import webbrowser
         webbrowser.open('file://' + os.path.abspath(report_path))
         
     if csv_path:
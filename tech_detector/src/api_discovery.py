@@ -1,8 +1,8 @@
-import requests
-import concurrent.futures
-from urllib.parse import urljoin
 from typing import List
-from .utils import DetectionResult
+from .utils import DetectionResult, PROBE_PATHS
+from .deadline import Deadline
+from .soft404 import Soft404Baseline
+from .path_discovery import PathDiscovery
 
 class APIDiscovery:
     # Common endpoints for API Docs and Interfaces
@@ -23,51 +23,50 @@ class APIDiscovery:
         '/actuator/health'
     ]
 
-    def scan(self, url: str) -> List[DetectionResult]:
+    def __init__(self, connections=8):
+        self.engine = PathDiscovery(connections=connections)
+
+    def scan(self, url: str, deadline: Deadline = None, cache=None, soft404: Soft404Baseline = None) -> List[DetectionResult]:
+        deadline = deadline or Deadline()
         results = []
+        baseline = soft404 or Soft404Baseline(cache)
         
-        def check_endpoint(path):
-            target = urljoin(url, path)
-            try:
-                # Use a short timeout
-                HEADERS = {
-                    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                }
-                resp = requests.get(target, headers=HEADERS, timeout=3, verify=False, allow_redirects=True)
-                if resp.status_code == 200:
-                    # Basic validation to ensure it's not just a custom 200 page
-                    content_type = resp.headers.get('Content-Type', '').lower()
-                    text = resp.text.lower()
-                    
-                    is_valid = False
-                    
-                    # Swagger/OpenAPI validation
-                    if 'json' in path and ('swagger' in text or 'openapi' in text):
-                        is_valid = True
-                    elif 'graphql' in path and ('query' in text or 'graphql' in text or 'json' in content_type):
-                         is_valid = True
-                    elif 'actuator' in path and 'status' in text:
-                        is_valid = True
-                    elif 'html' in path and ('swagger' in text or 'api' in text):
-                        is_valid = True
-                        
-                    if is_valid:
-                        return DetectionResult(
-                            technology="Exposed API Endpoint",
-                            category="API Discovery",
-                            confidence=100,
-                            evidence=f"Found accessible {path} (Status: 200)"
-                        )
-            except:
-                pass
+        def check_endpoint(path, headers, body):
+            # Basic validation to ensure it's not just a custom 200 page
+            content_type = headers.get('Content-Type', '').lower()
+            text = body.decode('utf-8', errors='replace').lower()
+            
+            is_valid = False
+            
+            # Swagger/OpenAPI validation
+            if 'json' in path and ('swagger' in text or 'openapi' in text):
+                is_valid = True
+            elif 'graphql' in path and ('query' in text or 'graphql' in text or 'json' in content_type):
+                 is_valid = True
+            elif 'actuator' in path and 'status' in text:
+                is_valid = True
+            elif 'html' in path and ('swagger' in text or 'api' in text):
+                is_valid = True
+                
+            if is_valid:
+                return DetectionResult(
+                    technology="Exposed API Endpoint",
+                    category="API Discovery",
+                    confidence=100,
+                    evidence=f"Found accessible {path} (Status: 200)"
+                )
             return None
 
-        # Threaded scan
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_path = {executor.submit(check_endpoint, p): p for p in self.ENDPOINTS}
-            for future in concurrent.futures.as_completed(future_to_path):
-                res = future.result()
-                if res:
-                    results.append(res)
+        # A 200 that answers like any random path is the host's catch-all, not an endpoint;
+        # docs and API answers identify themselves in their first few KB
+        # /graphql is also one of the fetcher's probes: it goes through the scan cache, once
+        shared = [path for path in self.ENDPOINTS if path in PROBE_PATHS]
+        for hit in self.engine.discover(url, self.ENDPOINTS, deadline, statuses={200}, soft404=baseline, shared=shared):
+            try:
+                res = check_endpoint(hit['path'], hit['headers'], hit['body'])
+            except Exception:
+                res = None
+            if res:
+                results.append(res)
         
         return results
@@ -0,0 +1,209 @@
+import asyncio
+import itertools
+import random
+import string
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+from .deadline import Deadline
+
+def iter_wordlist(path: str, lower=True) -> Iterator[str]:
+    # Streams a wordlist line by line; 100k-line lists never sit in memory as a whole.
+    # DNS labels are case-insensitive, URL paths are not (lower=False).
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            word = line.strip().lower() if lower else line.strip()
+            if word and not word.startswith('#'):
+                yield word
+
+class AsyncDNSEngine:
+    # Resolvers used when the system configuration can't be read
+    FALLBACK_RESOLVERS = ['1.1.1.1', '8.8.8.8', '9.9.9.9']
+
+    def __init__(self, resolvers: List[str] = None, concurrency=1000, timeout=2.0, retries=2):
+        self.resolvers = list(resolvers or [])
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self._resolvers = None # Built on first use and kept: their answer cache outlives one batch
+        self._lock = threading.Lock()
+
+    def resolve_many(self, names: Iterable[str], rdtype='A', deadline: Deadline = None, aliases=False) -> Dict[str, List[str]]:
+        # name -> answer records (as text) for every name that resolved. aliases: a name that is only
+        # an alias (CNAME to a target without addresses, or to nothing) counts too, answered by its target.
+        deadline = deadline or Deadline()
+        if deadline.expired():
+            return {}
+        try:
+            return asyncio.run(self._resolve_many(names, lambda *args: self._query(*args, rdtype, aliases), deadline))
+        except (OSError, RuntimeError):
+            return {}
+
+    def resolve_records(self, queries: Iterable[tuple], deadline: Deadline = None) -> Dict[tuple, List[str]]:
+        # Mixed lookups in one pass: (name, rdtype) -> answer records for every query that returned some
+        deadline = deadline or Deadline()
+        if deadline.expired():
+            return {}
+        query = lambda resolvers, start, item, deadline: self._query(resolvers, start, item[0], deadline, item[1])
+        try:
+            return asyncio.run(self._resolve_many(queries, query, deadline))
+        except (OSError, RuntimeError):
+            return {}
+
+    def cname_chains(self, names: Iterable[str], deadline: Deadline = None) -> Dict[str, dict]:
+        # alias -> {'chain': [cname, ...], 'nxdomain': bool}; nxdomain means the chain ends nowhere
+        deadline = deadline or Deadline()
+        if deadline.expired():
+            return {}
+        try:
+            return asyncio.run(self._resolve_many(names, self._chain, deadline))
+        except (OSError, RuntimeError):
+            return {}
+
+    def wildcard(self, domain: str, rdtype='A', deadline: Deadline = None) -> set:
+        # Answers for random labels; non-empty means *.domain resolves (or is a wildcard alias)
+        labels = [f"{self._random_label()}.{domain}" for _ in range(3)]
+        answers = self.resolve_many(labels, rdtype, deadline, aliases=True)
+        return set(itertools.chain.from_iterable(answers.values()))
+
+    def brute_force(self, domain: str, words: Iterable[str], deadline: Deadline = None, wildcard: set = None) -> Dict[str, List[str]]:
+        deadline = deadline or Deadline()
+        if wildcard is None:
+            wildcard = self.wildcard(domain, deadline=deadline)
+        names = (f"{word}.{domain}" for word in words)
+        found = self.resolve_many(names, 'A', deadline, aliases=True)
+        # Under wildcard DNS only names pointing somewhere other than the wildcard target are real
+        return {name: ips for name, ips in found.items() if not wildcard or not set(ips) <= wildcard}
+
+    async def _resolve_many(self, names: Iterable[str], query, deadline: Deadline) -> dict:
+        resolvers = self._build_resolvers()
+        rotation = itertools.cycle(range(len(resolvers)))
+        pending = iter(names)
+        found = {}
+
+        async def worker():
+            for name in pending:
+                if deadline.expired():
+                    return
+                answer = await query(resolvers, next(rotation), name, deadline)
+                if answer:
+                    found[name] = answer
+
+        await asyncio.gather(*(worker() for _ in range(self._max_concurrency())))
+        return found
+
+    async def _query(self, resolvers: list, start: int, name: str, deadline: Deadline, rdtype: str,
+                     aliases=False) -> Optional[List[str]]:
+        import dns.exception
+        import dns.resolver
+
+        # Timeouts and SERVFAIL move on to the next resolver; NXDOMAIN/NOERROR are final
+        for attempt in range(self.retries + 1):
+            if deadline.expired():
+                return None
+            resolver = resolvers[(start + attempt) % len(resolvers)]
+            try:
+                answer = await resolver.resolve(name, rdtype, lifetime=deadline.timeout(self.timeout), raise_on_no_answer=False)
+            except dns.resolver.NXDOMAIN as e:
+                if not aliases or rdtype not in ('A', 'AAAA'):
+                    return None
+                # An alias whose target is gone still exists itself (and is a takeover candidate)
+                canonical = e.canonical_name.to_text().rstrip('.')
+                return [canonical] if canonical.lower() != name.rstrip('.').lower() else None
+            except dns.resolver.NoAnswer:
+                return None
+            except (dns.exception.Timeout, dns.resolver.NoNameservers):
+                continue
+            except dns.exception.DNSException:
+                return None
+            if answer.rrset is None:
+                # CNAME without an address (e.g. a dangling alias) still proves the name exists
+                if aliases and answer.canonical_name != answer.qname and rdtype in ('A', 'AAAA'):
+                    return [answer.canonical_name.to_text().rstrip('.')]
+                return None
+            return [rdata.to_text().rstrip('.') for rdata in answer.rrset]
+        return None
+
+    async def _chain(self, resolvers: list, start: int, name: str, deadline: Deadline) -> Optional[dict]:
+        import dns.exception
+        import dns.resolver
+
+        for attempt in range(self.retries + 1):
+            if deadline.expired():
+                return None
+            resolver = resolvers[(start + attempt) % len(resolvers)]
+            try:
+                answer = await resolver.resolve(name, 'A', lifetime=deadline.timeout(self.timeout), raise_on_no_answer=False)
+                response, nxdomain = answer.response, False
+            except dns.resolver.NXDOMAIN as e:
+                # For an alias, NXDOMAIN refers to the end of the chain: the target is gone
+                response, nxdomain = next(iter(e.responses().values()), None), True
+            except (dns.exception.Timeout, dns.resolver.NoNameservers):
+                continue
+            except dns.exception.DNSException:
+                return None
+            chain = self._follow_cnames(name, response)
+            return {'chain': chain, 'nxdomain': nxdomain} if chain else None
+        return None
+
+    def _follow_cnames(self, name: str, response) -> List[str]:
+        import dns.rdatatype
+
+        if response is None:
+            return []
+        aliases = {rrset.name.to_text().rstrip('.').lower(): rrset[0].target.to_text().rstrip('.').lower()
+                   for rrset in response.answer if rrset.rdtype == dns.rdatatype.CNAME}
+        chain = []
+        current = name.rstrip('.').lower()
+        # Bounded walk: a CNAME loop must not spin forever
+        while current in aliases and len(chain) < 16:
+            current = aliases[current]
+            chain.append(current)
+        return chain
+
+    def _build_resolvers(self) -> list:
+        with self._lock:
+            if self._resolvers is None:
+                self._resolvers = self._new_resolvers()
+            return self._resolvers
+
+    def _new_resolvers(self) -> list:
+        import dns.asyncresolver
+        import dns.resolver
+
+        # One answer cache for all of them; the service puts one on the default resolver for every
+        # job to share, and that one is used when present
+        try:
+            cache = dns.resolver.get_default_resolver().cache
+        except Exception:
+            cache = None
+        cache = cache or dns.resolver.LRUCache()
+
+        if not self.resolvers:
+            try:
+                resolver = dns.asyncresolver.Resolver()
+                resolver.timeout = self.timeout
+                resolver.cache = cache
+                return [resolver]
+            except Exception:
+                pass
+
+        resolvers = []
+        for nameserver in self.resolvers or self.FALLBACK_RESOLVERS:
+            resolver = dns.asyncresolver.Resolver(configure=False)
+            resolver.nameservers = [nameserver]
+            resolver.timeout = self.timeout
+            resolver.cache = cache
+            resolvers.append(resolver)
+        return resolvers
+
+    def _max_concurrency(self) -> int:
+        # One UDP socket per in-flight query: keep clear of the file-descriptor limit
+        try:
+            import resource
+            soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+            return max(1, min(self.concurrency, soft_limit - 64))
+        except (ImportError, ValueError, OSError):
+            return self.concurrency
+
+    def _random_label(self) -> str:
+        return ''.join(random.choices(string.ascii_lowercase + string.digits, k=16))
@@ -0,0 +1,113 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+# Minimal DER reader for X.509 certificates. getpeercert() only returns parsed fields for
+# verified connections, and we inspect with CERT_NONE, so the fields are read from the DER bytes.
+
+NAME_OIDS = {
+    '2.5.4.3': 'commonName',
+    '2.5.4.6': 'countryName',
+    '2.5.4.7': 'localityName',
+    '2.5.4.8': 'stateOrProvinceName',
+    '2.5.4.10': 'organizationName',
+    '2.5.4.11': 'organizationalUnitName'
+}
+SAN_OID = '2.5.29.17'
+
+def _read_tlv(data: bytes, pos: int) -> Tuple[int, int, int]:
+    # Returns (tag, value start, value end)
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        size = length & 0x7f
+        length = int.from_bytes(data[pos:pos + size], 'big')
+        pos += size
+    if pos + length > len(data):
+        raise ValueError("Truncated DER")
+    return tag, pos, pos + length
+
+def _children(data: bytes, start: int, end: int) -> List[Tuple[int, int, int]]:
+    items = []
+    pos = start
+    while pos < end:
+        tag, value_start, value_end = _read_tlv(data, pos)
+        items.append((tag, value_start, value_end))
+        pos = value_end
+    return items
+
+def _oid(value: bytes) -> str:
+    arcs = [value[0] // 40, value[0] % 40]
+    current = 0
+    for byte in value[1:]:
+        current = (current << 7) | (byte & 0x7f)
+        if not byte & 0x80:
+            arcs.append(current)
+            current = 0
+    return '.'.join(str(arc) for arc in arcs)
+
+def _string(tag: int, value: bytes) -> str:
+    if tag == 0x1e: # BMPString
+        return value.decode('utf-16-be', errors='replace')
+    return value.decode('utf-8', errors='replace')
+
+def _name(data: bytes, start: int, end: int) -> Dict[str, str]:
+    # Name ::= SEQUENCE OF SET OF SEQUENCE { type OID, value ANY }
+    name = {}
+    for _, set_start, set_end in _children(data, start, end):
+        for _, attr_start, attr_end in _children(data, set_start, set_end):
+            (_, oid_start, oid_end), (value_tag, value_start, value_end) = _children(data, attr_start, attr_end)[:2]
+            oid = _oid(data[oid_start:oid_end])
+            name.setdefault(NAME_OIDS.get(oid, oid), _string(value_tag, data[value_start:value_end]))
+    return name
+
+def _time(tag: int, value: bytes) -> datetime:
+    text = value.decode('ascii').rstrip('Z')
+    if tag == 0x17: # UTCTime: two-digit year, 50-99 means 19xx
+        year = int(text[:2])
+        text = str(1900 + year if year >= 50 else 2000 + year) + text[2:]
+    return datetime.strptime(text[:14], '%Y%m%d%H%M%S').replace(tzinfo=timezone.utc)
+
+def _sans(data: bytes, start: int, end: int) -> List[str]:
+    # extnValue OCTET STRING wraps GeneralNames ::= SEQUENCE OF GeneralName
+    _, seq_start, seq_end = _read_tlv(data, start)
+    names = []
+    for tag, value_start, value_end in _children(data, seq_start, seq_end):
+        if tag == 0x82: # dNSName
+            names.append(data[value_start:value_end].decode('ascii', errors='replace').lower())
+        elif tag == 0x87 and value_end - value_start == 4: # iPAddress (v4)
+            names.append('.'.join(str(b) for b in data[value_start:value_end]))
+    return names
+
+def parse_certificate(der: bytes) -> dict:
+    _, cert_start, cert_end = _read_tlv(der, 0)
+    _, tbs_start, tbs_end = _children(der, cert_start, cert_end)[0]
+    fields = _children(der, tbs_start, tbs_end)
+
+    # Optional [0] version comes first in v3 certificates
+    if fields[0][0] == 0xa0:
+        fields = fields[1:]
+    serial = int.from_bytes(der[fields[0][1]:fields[0][2]], 'big')
+    issuer = _name(der, fields[2][1], fields[2][2])
+    not_before, not_after = [_time(tag, der[s:e]) for tag, s, e in _children(der, fields[3][1], fields[3][2])]
+    subject = _name(der, fields[4][1], fields[4][2])
+
+    sans = []
+    for tag, start, end in fields[6:]:
+        if tag != 0xa3: # [3] extensions
+            continue
+        _, exts_start, exts_end = _read_tlv(der, start)
+        for _, ext_start, ext_end in _children(der, exts_start, exts_end):
+            parts = _children(der, ext_start, ext_end)
+            if _oid(der[parts[0][1]:parts[0][2]]) == SAN_OID:
+                _, value_start, value_end = parts[-1]
+                sans = _sans(der, value_start, value_end)
+
+    return {
+        'serial': format(serial, 'x'),
+        'issuer': issuer,
+        'subject': subject,
+        'not_before': not_before,
+        'not_after': not_after,
+        'sans': sans
+    }
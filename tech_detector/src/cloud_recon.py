@@ -1,80 +1,184 @@
 import requests
 import concurrent.futures
-from typing import List
+import re
+import threading
+from collections import Counter
+from typing import Iterable, List, Set, Tuple
 from urllib.parse import urlparse
-from .utils import DetectionResult
+from .utils import DetectionResult, SiteData, registered_domain
+from .deadline import Deadline
+from .async_dns import AsyncDNSEngine
 
 class CloudRecon:
-    # Common bucket naming patterns
+    # Common bucket naming patterns ({base} is the domain, its name, a subdomain label or a page keyword)
     PATTERNS = [
-        '{domain}',
-        '{domain}-assets',
-        '{domain}-static',
-        '{domain}-backup',
-        '{domain}-media',
-        '{domain}-logs',
-        '{name}',
-        '{name}-assets',
-        '{name}-backup'
+        '{base}',
+        '{base}-{word}',
+        '{base}.{word}',
+        '{base}{word}',
+        '{word}-{base}',
+        '{word}.{base}'
     ]
-    
-    # Cloud Providers
+
+    WORDS = [
+        'assets', 'static', 'backup', 'backups', 'media', 'logs', 'dev', 'prod', 'production', 'staging',
+        'test', 'data', 'uploads', 'files', 'images', 'img', 'cdn', 'public', 'private', 'web', 'www',
+        'archive', 'db', 'database', 'config', 'internal', 'storage', 'content', 'docs', 'export'
+    ]
+
+    # Cloud Providers: endpoint template, the DNS name a bucket implies (None: path-style, no DNS check)
+    # and which names the provider accepts
     PROVIDERS = {
-        'AWS S3': 'https://{bucket}.s3.amazonaws.com',
-        'Azure Blob': 'https://{bucket}.blob.core.windows.net',
-        'GCP Storage': 'https://storage.googleapis.com/{bucket}'
+        'AWS S3': {
+            # Path-style keeps every probe on one host so connections are reused
+            'url': 'https://s3.amazonaws.com/{bucket}',
+            'dns': None,
+            'valid': r'^(?!\d+\.\d+\.\d+\.\d+$)(?!.*\.\.)[a-z0-9][a-z0-9.-]{1,61}[a-z0-9]$'
+        },
+        'Azure Blob': {
+            'url': 'https://{bucket}.blob.core.windows.net/?comp=list',
+            'dns': '{bucket}.blob.core.windows.net',
+            'valid': r'^[a-z0-9]{3,24}$'
+        },
+        'GCP Storage': {
+            'url': 'https://storage.googleapis.com/{bucket}',
+            'dns': None,
+            'valid': r'^(?!goog)(?!.*\.\.)[a-z0-9][a-z0-9._-]{1,61}[a-z0-9]$'
+        }
     }
-    
+
+    # Words that say nothing about the organisation
+    STOPWORDS = {'the', 'and', 'for', 'with', 'your', 'you', 'our', 'are', 'from', 'this', 'that', 'home',
+                 'page', 'welcome', 'official', 'site', 'website', 'online', 'best', 'more', 'www', 'http', 'https'}
+
     # Stealth Headers
     HEADERS = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
     }
 
-    def scan(self, url: str) -> List[DetectionResult]:
-        domain = urlparse(url).netloc
+    def __init__(self, max_candidates=2000, workers=32, resolvers: List[str] = None):
+        self.max_candidates = max_candidates
+        self.workers = workers
+        self.dns_engine = AsyncDNSEngine(resolvers=resolvers)
+        self._local = threading.local()
+
+    def scan(self, url: str, deadline: Deadline = None, subdomains: Iterable[str] = None, keywords: Iterable[str] = None) -> List[DetectionResult]:
+        deadline = deadline or Deadline()
+        domain = urlparse(url).hostname or ''
         if domain.startswith('www.'):
             domain = domain[4:]
-        
-        name = domain.split('.')[0]
+
+        candidates = self.generate_candidates(domain, subdomains or [], keywords or [])
+        targets = []
+        for prov, provider in self.PROVIDERS.items():
+            valid = re.compile(provider['valid'])
+            names = [name for name in candidates if valid.match(name)]
+            targets.extend((prov, name) for name in self._dns_prefilter(provider, names, deadline))
+
+        found, throttled = self._probe_all(targets, deadline)
+        if throttled:
+            print(f"[!] Cloud recon: {', '.join(sorted(throttled))} started rate-limiting; stopped probing there.")
+
+        # One result per provider (results merge by technology name); open buckets listed first
         results = []
-        
-        # Generate candidates
-        candidates = []
-        for pat in self.PATTERNS:
-            candidates.append(pat.format(domain=domain, name=name))
-            
-        def check_bucket(bucket_name, provider_name, url_template):
-            target = url_template.format(bucket=bucket_name)
-            try:
-                # Fast checking
-                resp = requests.head(target, headers=self.HEADERS, timeout=3, verify=False)
-                
-                if resp.status_code in [200, 403]: # 200 (Open), 403 (Exists but Private)
-                    return (provider_name, bucket_name, resp.status_code, target)
-            except:
-                pass
-            return None
-
-        # Threaded Scan
-        tasks = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            for bucket in candidates:
-                for prov, templ in self.PROVIDERS.items():
-                    tasks.append(executor.submit(check_bucket, bucket, prov, templ))
-                    
-            for future in concurrent.futures.as_completed(tasks):
-                res = future.result()
-                if res:
-                    prov, buck, status, link = res
-                    
-                    access_level = "Public (Open)" if status == 200 else "Private (Exists)"
-                    severity = 100 if status == 200 else 50
-                    
-                    results.append(DetectionResult(
-                        technology=f"{prov} Bucket Found",
-                        category="Cloud Assets",
-                        confidence=severity,
-                        evidence=f"Bucket: {buck} ({access_level}) - {link}"
-                    ))
-                    
+        for prov in self.PROVIDERS:
+            buckets = sorted((access != "Public (Open)", bucket, access, link) for p, bucket, access, link in found if p == prov)
+            if buckets:
+                results.append(DetectionResult(
+                    technology=f"{prov} Bucket Found",
+                    category="Cloud Assets",
+                    confidence=50 if buckets[0][0] else 100,
+                    evidence="; ".join(f"Bucket: {bucket} ({access}) - {link}" for _, bucket, access, link in buckets)
+                ))
         return results
+
+    def generate_candidates(self, domain: str, subdomains: Iterable[str], keywords: Iterable[str]) -> List[str]:
+        registered = registered_domain(domain)
+        name = registered.split('.')[0]
+
+        bases = [domain, registered, domain.replace('.', '-'), domain.replace('.', ''), name]
+        for sub in subdomains:
+            sub = sub.lower().rstrip('.')
+            if sub.endswith('.' + registered):
+                label = sub[:-len(registered) - 1]
+                bases.extend([f"{label}-{name}", f"{name}-{label}", f"{label}.{registered}"])
+        bases.extend(f"{name}-{keyword}" for keyword in keywords if keyword != name)
+
+        # dict keeps first-seen order while deduplicating; the cap holds for the bases too
+        candidates = dict.fromkeys(list(dict.fromkeys(bases))[:self.max_candidates])
+        for base in list(candidates):
+            for pattern in self.PATTERNS[1:]:
+                for word in self.WORDS:
+                    if len(candidates) >= self.max_candidates:
+                        return list(candidates)
+                    candidates[pattern.format(base=base, word=word)] = None
+        return list(candidates)
+
+    @classmethod
+    def page_keywords(cls, data: SiteData, limit=10) -> List[str]:
+        # Organisation words from the title and descriptive meta tags
+        title = re.search(r'<title[^>]*>(.*?)</title>', data.html or '', re.IGNORECASE | re.DOTALL)
+        text = ' '.join([title.group(1) if title else ''] + [data.meta_tags.get(key, '') for key in ('og:site_name', 'application-name', 'keywords')])
+        words = [w for w in re.findall(r'[a-z0-9]{3,20}', text.lower()) if w not in cls.STOPWORDS and not w.isdigit()]
+        return [word for word, _ in Counter(words).most_common(limit)]
+
+    def _dns_prefilter(self, provider: dict, names: List[str], deadline: Deadline) -> List[str]:
+        # Only meaningful where each bucket gets its own hostname and the zone isn't wildcarded
+        if not provider['dns'] or not names or deadline.expired():
+            return names
+        zone = provider['dns'].split('.', 1)[1]
+        if self.dns_engine.wildcard(zone, deadline=deadline):
+            return names
+        resolved = self.dns_engine.resolve_many((provider['dns'].format(bucket=name) for name in names), 'A', deadline)
+        return [name for name in names if provider['dns'].format(bucket=name) in resolved]
+
+    def _session(self, prov: str) -> requests.Session:
+        # One keep-alive session per provider endpoint and worker thread
+        sessions = self._local.__dict__.setdefault('sessions', {})
+        if prov not in sessions:
+            session = requests.Session()
+            session.headers.update(self.HEADERS)
+            session.verify = False # Dotted bucket names don't match the providers' wildcard certs
+            session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4))
+            sessions[prov] = session
+        return sessions[prov]
+
+    def _probe_all(self, targets: List[tuple], deadline: Deadline) -> Tuple[List[tuple], Set[str]]:
+        throttled = set()
+
+        def check_bucket(prov, bucket):
+            if deadline.expired() or prov in throttled:
+                return None
+            target = self.PROVIDERS[prov]['url'].format(bucket=bucket)
+            try:
+                # HEAD: no body to drain, so the pooled connection goes straight back for the next probe
+                resp = self._session(prov).head(target, timeout=deadline.timeout(5), allow_redirects=False)
+                status = resp.status_code
+
+                # S3 redirects path-style requests for buckets in other regions
+                region = resp.headers.get('x-amz-bucket-region')
+                if status in (301, 307) and region:
+                    target = f"https://{bucket}.s3.{region}.amazonaws.com"
+                    resp = self._session(prov).head(target, timeout=deadline.timeout(5), allow_redirects=False)
+                    status = resp.status_code
+            except Exception:
+                return None
+
+            if status in (429, 503):
+                # Provider is rate-limiting us: stop probing it rather than hammering on
+                throttled.add(prov)
+                return None
+            if status == 200:
+                return (prov, bucket, "Public (Open)", target)
+            if status in (401, 403) or self.PROVIDERS[prov]['dns']:
+                # Past the DNS prefilter any answer means the account exists
+                return (prov, bucket, "Private (Exists)", target)
+            return None # 400/404: nonexistent (or an invalid name)
+
+        found = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            tasks = [executor.submit(check_bucket, prov, bucket) for prov, bucket in targets]
+            for future in deadline.as_completed(executor, tasks):
+                if future.result():
+                    found.append(future.result())
+        return found, throttled
@@ -14,6 +14,10 @@ class ContextAnalyzer:
     }
 
     def analyze(self, data: SiteData) -> DetectionResult:
+        if data.soup is None:
+            # Fetch failed or was cut short by the scan budget
+            return DetectionResult("General / Unknown", "Context Analysis", 0, evidence="No page content")
+
         text_content = data.soup.get_text(" ", strip=True).lower()
         meta_desc = data.meta_tags.get('description', '').lower()
         title = ""
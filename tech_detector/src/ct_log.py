@@ -0,0 +1,122 @@
+import json
+import os
+import re
+import time
+from typing import Iterable, Iterator, Set
+from .utils import CACHE_DIR, content_hash, iter_json_array, registered_domain
+from .deadline import Deadline
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+class CTLogSource:
+    CRT_SH_URL = "https://crt.sh/"
+
+    def __init__(self, cache_dir: str = None, refresh=86400, mirror: str = None):
+        # refresh: seconds a cached CT name list stays fresh
+        # mirror: local crt.sh-style JSON dump, a directory of <registered-domain>.json/.txt dumps,
+        #         or the base URL of a crt.sh-compatible service
+        self.cache_dir = cache_dir or os.path.join(CACHE_DIR, 'ct')
+        self.refresh = refresh
+        self.mirror = mirror
+
+    def names(self, domain: str, deadline: Deadline = None) -> Set[str]:
+        # Certificate names under `domain`, served from the per-registered-domain cache when fresh
+        deadline = deadline or Deadline()
+        registered = registered_domain(domain)
+        cached = self._load(registered)
+
+        if cached is None or time.time() - cached['fetched'] > self.refresh:
+            names, complete = self._download(registered, deadline)
+            if complete:
+                self._save(registered, names)
+                cached = {'names': names}
+            elif cached is None:
+                cached = {'names': names}
+            else:
+                # Keep the stale list, topped up with whatever the interrupted download produced
+                cached = {'names': set(cached['names']) | names}
+
+        return {name for name in cached['names'] if name == domain or name.endswith('.' + domain)}
+
+    def _download(self, registered: str, deadline: Deadline):
+        # Returns (names, complete); an interrupted stream keeps the names read so far
+        names = set()
+        try:
+            for entry in self._entries(registered, deadline):
+                names.update(self._entry_names(entry))
+                if deadline.expired():
+                    return names, False
+            return names, True
+        except Exception:
+            return names, False
+
+    def _entries(self, registered: str, deadline: Deadline) -> Iterator:
+        mirror = self.mirror
+        if mirror and os.path.isdir(mirror):
+            for ext in ('.json', '.txt'):
+                path = os.path.join(mirror, registered + ext)
+                if os.path.exists(path):
+                    mirror = path
+                    break
+            else:
+                raise FileNotFoundError(f"No CT dump for {registered} in {mirror}")
+
+        if mirror and os.path.isfile(mirror):
+            yield from self._read_dump(mirror)
+            return
+
+        import requests
+
+        base = mirror or self.CRT_SH_URL
+        r = requests.get(base, params={'q': f"%.{registered}", 'output': 'json'}, headers=HEADERS,
+                         timeout=deadline.timeout(30), stream=True)
+        try:
+            if r.status_code != 200:
+                raise ValueError(f"CT source returned HTTP {r.status_code}")
+            r.encoding = r.encoding or 'utf-8'
+            yield from iter_json_array(r.iter_content(chunk_size=65536, decode_unicode=True))
+        finally:
+            r.close()
+
+    def _read_dump(self, path: str) -> Iterator:
+        # crt.sh JSON output, or a plain list with one name per line
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            head = f.read(1024).lstrip()
+            f.seek(0)
+            if head.startswith('['):
+                yield from iter_json_array(iter(lambda: f.read(65536), ''))
+            else:
+                for line in f:
+                    yield {'name_value': line.strip()}
+
+    def _entry_names(self, entry) -> Iterable[str]:
+        for name in str(entry.get('name_value', '') if isinstance(entry, dict) else entry).split('\n'):
+            name = name.strip().lower().rstrip('.')
+            if name and '*' not in name:
+                yield name
+
+    def _path(self, registered: str) -> str:
+        # Keyed by source as well: a partial mirror must not stand in for crt.sh (or another mirror)
+        source = os.path.abspath(self.mirror) if self.mirror and os.path.exists(self.mirror) else (self.mirror or self.CRT_SH_URL)
+        name = re.sub(r'[^A-Za-z0-9._-]', '_', registered)
+        return os.path.join(self.cache_dir, f"{name}.{content_hash(source)[:12]}.json")
+
+    def _load(self, registered: str):
+        try:
+            with open(self._path(registered), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, registered: str, names: Set[str]):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write then rename so concurrent scans never read a half-written list
+            tmp_path = self._path(registered) + f".{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'fetched': int(time.time()), 'names': sorted(names)}, f)
+            os.replace(tmp_path, self._path(registered))
+        except OSError:
+            pass
@@ -0,0 +1,47 @@
+import concurrent.futures
+import time
+from typing import Optional
+
+class Deadline:
+    # Smallest timeout handed to sockets/requests once a budget is nearly spent
+    MIN_TIMEOUT = 0.05
+
+    def __init__(self, budget: Optional[float] = None, parent: 'Deadline' = None, name: str = "scan"):
+        self.name = name
+        self.budget = budget
+        self.parent = parent
+        self.expires_at = None
+
+        if budget is not None:
+            self.expires_at = time.monotonic() + budget
+        # A phase can never outlive the scan it belongs to
+        if parent is not None and parent.expires_at is not None:
+            if self.expires_at is None or parent.expires_at < self.expires_at:
+                self.expires_at = parent.expires_at
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def timeout(self, default: float) -> float:
+        # Clamp a module's own timeout to whatever is left of the budget
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        return max(min(default, remaining), self.MIN_TIMEOUT)
+
+    def phase(self, name: str, budget: Optional[float] = None) -> 'Deadline':
+        return Deadline(budget, parent=self, name=name)
+
+    def as_completed(self, executor, futures):
+        # Yield finished futures until the budget runs out, then drop the queued rest.
+        # Calls already running finish on their own (clamped) timeouts.
+        try:
+            for future in concurrent.futures.as_completed(futures, timeout=self.remaining()):
+                yield future
+        except concurrent.futures.TimeoutError:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -1,53 +1,148 @@
-import dns.resolver
-from typing import List, Dict
+import json
+import os
+import re
+from typing import Dict, Iterable, List, Optional
 from urllib.parse import urlparse
-from .utils import DetectionResult
+from .utils import DetectionResult, registered_domain
+from .deadline import Deadline
+from .async_dns import AsyncDNSEngine
 
 class DNSIntelligence:
-    def analyze(self, url: str) -> List[DetectionResult]:
+    SIGNATURES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'dns_providers.json')
+
+    # Looked up on the scanned host itself; mail, name server and CA records live at the zone apex
+    HOST_RECORDS = ('A', 'AAAA', 'CNAME')
+    ZONE_RECORDS = ('MX', 'TXT', 'NS', 'SOA', 'CAA')
+
+    def __init__(self, resolvers: List[str] = None, concurrency=200):
+        self.dns_engine = AsyncDNSEngine(resolvers=resolvers, concurrency=concurrency)
+        self._signatures = None
+
+    @property
+    def signatures(self) -> dict:
+        # Compiled on first use. Host kinds (mx, spf, dmarc, ns, cname, caa) become a suffix map plus a
+        # label map (keys without a dot, e.g. "awsdns" for ns-1.awsdns-12.org); txt becomes a token map
+        # keyed by what precedes '=' or ':' in a verification record. Lookups cost O(labels), not O(signatures).
+        if self._signatures is None:
+            try:
+                with open(self.SIGNATURES_PATH, 'r') as f:
+                    raw = json.load(f)
+            except (OSError, ValueError):
+                raw = {}
+            compiled = {}
+            for kind, entries in raw.items():
+                index = {'suffixes': {}, 'labels': {}, 'tokens': {}}
+                for key, sig in entries.items():
+                    key = key.lower()
+                    target = 'tokens' if kind == 'txt' else ('suffixes' if '.' in key else 'labels')
+                    index[target][key] = (sig['technology'], sig['category'], sig.get('confidence', 100))
+                compiled[kind] = index
+            self._signatures = compiled
+        return self._signatures
+
+    def preload(self):
+        return self.signatures
+
+    def analyze(self, url: str, deadline: Deadline = None) -> List[DetectionResult]:
+        return self.analyze_many([url], deadline).get(url, [])
+
+    def analyze_many(self, urls: Iterable[str], deadline: Deadline = None) -> Dict[str, List[DetectionResult]]:
+        # Every record of every domain goes out in a single concurrent batch: latency is one
+        # round-trip (plus retries), not the sum of them
+        deadline = deadline or Deadline()
+        hosts = {}
+        for url in urls:
+            host = (urlparse(url if '://' in url else 'https://' + url).hostname or '').rstrip('.').lower()
+            hosts[url] = (host, registered_domain(host))
+
+        queries = set()
+        for host, zone in hosts.values():
+            if not host:
+                continue
+            queries.update((host, rdtype) for rdtype in self.HOST_RECORDS)
+            queries.update((zone, rdtype) for rdtype in self.ZONE_RECORDS)
+            queries.add((f"_dmarc.{zone}", 'TXT'))
+
+        records = self.dns_engine.resolve_records(queries, deadline) if queries else {}
+        return {url: self._interpret(host, zone, records) if host else [] for url, (host, zone) in hosts.items()}
+
+    def _interpret(self, host: str, zone: str, records: Dict[tuple, List[str]]) -> List[DetectionResult]:
         results = []
-        domain = urlparse(url).netloc
-        
-        try:
-            # 1. Check MX Records (Email Providers)
-            mx_records = dns.resolver.resolve(domain, 'MX')
-            for mx in mx_records:
-                exchange = str(mx.exchange).lower()
-                if 'google.com' in exchange or 'googlemail.com' in exchange:
-                    results.append(DetectionResult("Google Workspace", "Email", 100, f"MX: {exchange}"))
-                    break # Avoid duplicates
-                elif 'outlook.com' in exchange or 'protection.outlook.com' in exchange:
-                    results.append(DetectionResult("Microsoft 365", "Email", 100, f"MX: {exchange}"))
-                    break
-                elif 'zoho.com' in exchange:
-                    results.append(DetectionResult("Zoho Mail", "Email", 100, f"MX: {exchange}"))
-                    break
-                elif 'yandex.net' in exchange:
-                    results.append(DetectionResult("Yandex Mail", "Email", 100, f"MX: {exchange}"))
-                    break
-
-            # 2. Check TXT Records (Verifications)
-            txt_records = dns.resolver.resolve(domain, 'TXT')
-            for txt in txt_records:
-                # content is a list of byte strings usually
-                content = b"".join(txt.strings).decode('utf-8').lower()
-                
-                if 'facebook-domain-verification' in content:
-                    results.append(DetectionResult("Facebook Business", "Marketing", 100, "TXT Verification"))
-                elif 'google-site-verification' in content:
-                    results.append(DetectionResult("Google Search Console", "SEO", 100, "TXT Verification"))
-                elif 'stripe-verification' in content:
-                    results.append(DetectionResult("Stripe", "Payment Processors", 100, "TXT Verification"))
-                elif 'atlassian-domain-verification' in content:
-                    results.append(DetectionResult("Atlassian Cloud", "SaaS", 100, "TXT Verification"))
-                elif 'ms=' in content: # MS verification
-                    results.append(DetectionResult("Microsoft 365", "Email", 80, "TXT Verification"))
-                elif 'spf.protection.outlook.com' in content:
-                     # SPF record also indicates usage
-                     pass 
-
-        except Exception as e:
-            # DNS errors happen (no records, timeout)
-            pass
-            
+        seen = set()
+
+        def add(sig, evidence):
+            # One result per technology, first evidence wins
+            if sig and sig[0] not in seen:
+                seen.add(sig[0])
+                results.append(DetectionResult(sig[0], sig[1], sig[2], evidence=evidence))
+
+        # 1. Host: addresses, IPv6 reachability and the platform behind an alias. The address result
+        # has the name GeoIP gives it, so the two merge when both modules run.
+        for ip in records.get((host, 'A'), [])[:1]:
+            results.append(DetectionResult(f"IP: {ip}", "Infrastructure", 100, evidence=f"DNS Resolution for {host}"))
+        if records.get((host, 'AAAA')):
+            results.append(DetectionResult("IPv6", "Infrastructure", 100, evidence=f"AAAA: {records[(host, 'AAAA')][0]}"))
+        for target in records.get((host, 'CNAME'), []):
+            add(self._match_host('cname', target), f"CNAME: {target}")
+
+        # 2. MX Records (Email Providers)
+        for mx in records.get((zone, 'MX'), []):
+            exchange = mx.split()[-1].lower()
+            add(self._match_host('mx', exchange), f"MX: {exchange}")
+
+        # 3. TXT Records (Verifications, SPF includes)
+        for txt in records.get((zone, 'TXT'), []):
+            content = self._txt(txt)
+            if content.lower().startswith('v=spf1'):
+                for include in re.findall(r'(?:include:|redirect=)(\S+)', content, re.IGNORECASE):
+                    add(self._match_host('spf', include), f"SPF include: {include.lower()}")
+            else:
+                token = re.split(r'[=:]', content, 1)[0].strip().lower()
+                add(self.signatures.get('txt', {}).get('tokens', {}).get(token), "TXT Verification")
+
+        # 4. DMARC policy and the report processors it names
+        for txt in records.get((f"_dmarc.{zone}", 'TXT'), []):
+            content = self._txt(txt)
+            if not content.lower().startswith('v=dmarc1'):
+                continue
+            policy = re.search(r'\bp\s*=\s*(\w+)', content, re.IGNORECASE)
+            results.append(DetectionResult(f"DMARC: {policy.group(1).lower() if policy else 'none'}", "Email Security", 100, evidence=content[:120]))
+            for mailbox in re.findall(r'mailto:[^@\s;,]+@([^\s;,!]+)', content, re.IGNORECASE):
+                add(self._match_host('dmarc', mailbox), f"DMARC reports: {mailbox.lower()}")
+
+        # 5. Name servers (NS, plus the SOA primary)
+        for ns in records.get((zone, 'NS'), []):
+            add(self._match_host('ns', ns), f"NS: {ns.lower()}")
+        for soa in records.get((zone, 'SOA'), []):
+            mname = soa.split()[0].rstrip('.').lower()
+            add(self._match_host('ns', mname), f"SOA: {mname}")
+
+        # 6. CAA: which certificate authorities may issue for the domain
+        for caa in records.get((zone, 'CAA'), []):
+            parts = caa.split(None, 2)
+            if len(parts) == 3 and parts[1].lower() in ('issue', 'issuewild'):
+                issuer = parts[2].strip('"').split(';')[0].strip().lower()
+                if issuer:
+                    add(self._match_host('caa', issuer), f"CAA: {parts[1]} {issuer}")
+
         return results
+
+    def _match_host(self, kind: str, host: str) -> Optional[tuple]:
+        index = self.signatures.get(kind)
+        if not index:
+            return None
+        labels = host.rstrip('.').lower().split('.')
+        for i in range(len(labels)):
+            sig = index['suffixes'].get('.'.join(labels[i:]))
+            if sig:
+                return sig
+        for label in labels:
+            sig = index['labels'].get(re.sub(r'-\d+$', '', label))
+            if sig:
+                return sig
+        return None
+
+    def _txt(self, text: str) -> str:
+        # dnspython renders TXT rdata as quoted chunks: "v=spf1 include:a" " include:b"
+        chunks = re.findall(r'"((?:[^"\\]|\\.)*)"', text)
+        return ''.join(chunks) if chunks else text
@@ -1,26 +1,25 @@
-import requests
-import uuid
-from urllib.parse import urljoin
 from .utils import DetectionResult
+from .deadline import Deadline
+from .soft404 import Soft404Baseline
 import re
 
 class ErrorFingerprinter:
-    def analyze(self, url: str) -> list[DetectionResult]:
-        # Generate a random non-existent path
-        error_url = urljoin(url, f"/{uuid.uuid4()}")
+    def analyze(self, url: str, deadline: Deadline = None, cache=None, soft404: Soft404Baseline = None) -> list[DetectionResult]:
+        deadline = deadline or Deadline()
         results = []
+        if deadline.expired():
+            return results
         
         try:
-            HEADERS = {
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            }
-            resp = requests.get(error_url, headers=HEADERS, timeout=5, verify=False)
+            # The soft-404 baseline already requested random non-existent paths (bare, .json, dotfile,
+            # nested .php) on this host; their answers are the error pages
+            samples = (soft404 or Soft404Baseline(cache)).samples(url, deadline)
             # We expect 404, but the headers or body might reveal info
             
             evidence = []
             
             # Check Server Header (often revealed on defaults)
-            server = resp.headers.get("Server")
+            server = next((sample['headers'].get("Server") for sample in samples if sample['headers'].get("Server")), None)
             if server:
                 evidence.append(f"Server Header: {server}")
                 
@@ -34,9 +33,10 @@ class ErrorFingerprinter:
             ]
             
             for pat in patterns:
-                match = re.search(pat, resp.text)
-                if match:
-                    evidence.append(f"Body Leak: {match.group(0)}")
+                for sample in samples:
+                    match = re.search(pat, sample['text'])
+                    if match and f"Body Leak: {match.group(0)}" not in evidence:
+                        evidence.append(f"Body Leak: {match.group(0)}")
             
             if evidence:
                 results.append(DetectionResult(
@@ -0,0 +1,79 @@
+import csv
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+from .utils import content_hash
+
+class FaviconHashIndex:
+    # External favicon-hash datasets (Shodan http.favicon.hash, i.e. mmh3 of the base64 icon):
+    # JSON {"<hash>": "Name"} / {"<hash>": {"name", "category"}} / [{"hash", "name", ...}], or text
+    # lines "hash,name[,category]" (also ':' or tab separated). Loaded on first use into one dict.
+    HASH_KEYS = ('hash', 'favicon_hash', 'mmh3', 'icon_hash')
+    NAME_KEYS = ('name', 'technology', 'product', 'app')
+
+    def __init__(self, paths: List[str]):
+        self.paths = list(paths or [])
+        self._hashes = None # str(hash) -> (technology, category or '')
+        self._lock = threading.Lock()
+        # Cheap to compute at startup: results change when any dataset file does
+        stamps = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                stamps.append(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}")
+            except OSError:
+                stamps.append(path)
+        self.signature = content_hash('|'.join(stamps)) if stamps else ''
+
+    def preload(self) -> Dict[str, Tuple[str, str]]:
+        with self._lock:
+            if self._hashes is None:
+                hashes = {}
+                for path in self.paths:
+                    try:
+                        self._load(path, hashes)
+                    except (OSError, ValueError):
+                        pass
+                self._hashes = hashes
+        return self._hashes
+
+    def lookup(self, favicon_hash) -> Optional[Tuple[str, str]]:
+        return self.preload().get(str(favicon_hash)) if self.paths else None
+
+    def _load(self, path: str, hashes: dict):
+        interned = {}
+        def add(icon_hash, name, category=''):
+            icon_hash = str(icon_hash).strip()
+            name = str(name or '').strip()
+            if re.fullmatch(r'-?\d+', icon_hash) and name:
+                # First dataset wins; thousands of hashes share a few hundred names
+                hashes.setdefault(icon_hash, interned.setdefault((name, category or ''), (name, category or '')))
+
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            head = f.read(1).lstrip()
+            f.seek(0)
+            if head in ('{', '['):
+                data = json.load(f)
+                if isinstance(data, dict):
+                    for icon_hash, entry in data.items():
+                        if isinstance(entry, dict):
+                            add(icon_hash, self._first(entry, self.NAME_KEYS), entry.get('category', ''))
+                        else:
+                            add(icon_hash, entry)
+                else:
+                    for entry in data:
+                        if isinstance(entry, dict):
+                            add(self._first(entry, self.HASH_KEYS), self._first(entry, self.NAME_KEYS), entry.get('category', ''))
+                return
+
+            sample = f.read(4096)
+            f.seek(0)
+            delimiter = '\t' if '\t' in sample else (',' if ',' in sample else ':')
+            for row in csv.reader(f, delimiter=delimiter):
+                if len(row) >= 2 and not row[0].lstrip().startswith('#'):
+                    add(row[0], row[1], row[2].strip() if len(row) > 2 else '')
+
+    def _first(self, entry: dict, keys) -> str:
+        return next((entry[key] for key in keys if entry.get(key) not in (None, '')), '')
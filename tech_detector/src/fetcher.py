@@ -3,17 +3,39 @@ from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-import mmh3
 import codecs
 import concurrent.futures
-import dns.resolver
-from .utils import SiteData
+from .utils import SiteData, PROBE_PATHS
+from .deadline import Deadline
+from .cert_parser import parse_certificate
 import warnings
 import random
+import threading
+import time
+from collections import OrderedDict
 
 # Suppress SSL warnings
 warnings.filterwarnings("ignore")
 
+class TLSCaptureAdapter(HTTPAdapter):
+    # Records the peer certificate, protocol and cipher of the connection a response arrived on,
+    # so certificate inspection doesn't need a handshake of its own
+    def build_response(self, req, resp):
+        response = super().build_response(req, resp)
+        conn = getattr(resp, '_connection', None) or getattr(resp, 'connection', None)
+        sock = getattr(conn, 'sock', None)
+        if sock is not None and hasattr(sock, 'getpeercert'):
+            try:
+                cipher = sock.cipher()
+                response.tls = {
+                    'der': sock.getpeercert(binary_form=True) or b"",
+                    'protocol': sock.version() or "",
+                    'cipher': cipher[0] if cipher else ""
+                }
+            except (OSError, ValueError):
+                pass
+        return response
+
 class Fetcher:
     USER_AGENTS = [
         'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -28,9 +50,23 @@ class Fetcher:
         'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0'
     ]
 
-    def __init__(self, timeout=10, max_assets=20, proxy=None):
+    FAVICON_CACHE_SIZE = 1024
+
+    def __init__(self, timeout=10, max_assets=20, proxy=None, asset_cache_size=0, asset_cache_ttl=600):
         self.timeout = timeout
         self.max_assets = max_assets
+
+        # Optional LRU of downloaded JS assets, shared across scans (used by the long-running service)
+        self.asset_cache_size = asset_cache_size
+        self.asset_cache_ttl = asset_cache_ttl
+        self.asset_cache = OrderedDict()
+        self.asset_cache_lock = threading.Lock()
+
+        # Favicon hashes by icon URL: every page of a host (and of a deep crawl) normally shares one
+        # icon, so it is downloaded once; concurrent pages wait for the download already in flight
+        self.favicon_cache = OrderedDict()
+        self.favicon_inflight = {}
+        self.favicon_lock = threading.Lock()
         self.proxies = {"http": proxy, "https": proxy} if proxy else None
         
         # Configure Session with Retries
@@ -42,9 +78,25 @@ class Fetcher:
         )
         adapter = HTTPAdapter(max_retries=retry_strategy)
         self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+        self.session.mount("https://", TLSCaptureAdapter(max_retries=retry_strategy))
         self.session.proxies = self.proxies
 
+        # Budgeted scans skip adapter retries so a dead host cannot stack 3x backoff
+        self.budget_session = requests.Session()
+        self.budget_session.mount("http://", HTTPAdapter())
+        self.budget_session.mount("https://", TLSCaptureAdapter())
+        self.budget_session.proxies = self.proxies
+
+    def _session_for(self, deadline: Deadline):
+        return self.budget_session if deadline.expires_at is not None else self.session
+
+    def _get(self, url: str, deadline: Deadline, cache=None, **kwargs):
+        # Through the scan's response cache when there is one: pages of the same host share probes and assets
+        session = self._session_for(deadline)
+        if cache is not None:
+            return cache.get(url, session=session, **kwargs)
+        return session.get(url, **kwargs)
+
     def _get_random_headers(self):
         return {
             'User-Agent': random.choice(self.USER_AGENTS),
@@ -55,12 +107,16 @@ class Fetcher:
             'Upgrade-Insecure-Requests': '1'
         }
 
-    def fetch(self, url: str) -> SiteData:
+    def fetch(self, url: str, deadline: Deadline = None, cache=None) -> SiteData:
+        deadline = deadline or Deadline()
         try:
             if not url.startswith('http'):
                 url = 'https://' + url
-                
-            response = self.session.get(url, headers=self._get_random_headers(), timeout=self.timeout, verify=False)
+
+            if deadline.expired():
+                return SiteData(url=url, final_url=url, status_code=0, headers={}, cookies={}, html="")
+
+            response = self._get(url, deadline, cache, headers=self._get_random_headers(), timeout=deadline.timeout(self.timeout), verify=False)
             
             soup = BeautifulSoup(response.text, 'html.parser')
             
@@ -74,20 +130,30 @@ class Fetcher:
                 soup=soup
             )
             
+            tls = getattr(response, 'tls', None)
+            if tls:
+                data.peer_cert = tls['der']
+                data.tls_version = tls['protocol']
+                data.tls_cipher = tls['cipher']
+                try:
+                    data.cert_issuer = parse_certificate(tls['der'])['issuer'].get('organizationName', '')
+                except (ValueError, IndexError):
+                    pass
+
             # Parse Assets
             self._parse_assets(data, soup)
             
             # Download Assets (Parallel)
-            self._download_assets(data)
+            self._download_assets(data, deadline, cache)
             
             # Get Favicon
-            self._fetch_favicon(data)
+            self._fetch_favicon(data, deadline)
 
             # Probes
-            self.probe_paths(data)
+            self.probe_paths(data, deadline, cache)
             
             # DNS
-            self.resolve_dns(data)
+            self.resolve_dns(data, deadline)
             
             return data
             
@@ -115,13 +181,14 @@ class Fetcher:
             if name and content:
                 data.meta_tags[name.lower()] = content
 
-    def _download_assets(self, data: SiteData):
+    def _download_assets(self, data: SiteData, deadline: Deadline = None, cache=None):
+        deadline = deadline or Deadline()
         # Limit assets to avoid slow scans
         target_scripts = data.scripts[:self.max_assets]
         
         with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_url = {executor.submit(self._fetch_content, url): url for url in target_scripts}
-            for future in concurrent.futures.as_completed(future_to_url):
+            future_to_url = {executor.submit(self._fetch_asset, url, deadline, cache): url for url in target_scripts}
+            for future in deadline.as_completed(executor, future_to_url):
                 url = future_to_url[future]
                 try:
                     content = future.result()
@@ -130,16 +197,42 @@ class Fetcher:
                 except Exception:
                     pass
 
-    def _fetch_content(self, url: str) -> str:
+    def _fetch_asset(self, url: str, deadline: Deadline = None, cache=None) -> str:
+        if not self.asset_cache_size:
+            return self._fetch_content(url, deadline, cache)
+
+        with self.asset_cache_lock:
+            cached = self.asset_cache.get(url)
+            if cached and time.monotonic() - cached[0] < self.asset_cache_ttl:
+                self.asset_cache.move_to_end(url)
+                return cached[1]
+
+        content = self._fetch_content(url, deadline, cache)
+        if content:
+            with self.asset_cache_lock:
+                self.asset_cache[url] = (time.monotonic(), content)
+                self.asset_cache.move_to_end(url)
+                while len(self.asset_cache) > self.asset_cache_size:
+                    self.asset_cache.popitem(last=False)
+        return content
+
+    def _fetch_content(self, url: str, deadline: Deadline = None, cache=None) -> str:
+        deadline = deadline or Deadline()
+        if deadline.expired():
+            return ""
         try:
-            r = self.session.get(url, headers=self._get_random_headers(), timeout=5, verify=False)
+            r = self._get(url, deadline, cache, headers=self._get_random_headers(), timeout=deadline.timeout(5), verify=False)
             if r.status_code == 200:
                 return r.text
         except:
             pass
         return ""
 
-    def _fetch_favicon(self, data: SiteData):
+    def _fetch_favicon(self, data: SiteData, deadline: Deadline = None):
+        deadline = deadline or Deadline()
+        if deadline.expired():
+            return
+
         # Try finding icon in link tags
         icon_link = data.soup.find("link", rel=lambda x: x and 'icon' in x.lower(), href=True)
         if icon_link:
@@ -147,20 +240,48 @@ class Fetcher:
         else:
             favicon_url = urljoin(data.final_url, '/favicon.ico')
             
+        data.favicon_hash = self._favicon_hash(favicon_url, deadline)
+
+    def _favicon_hash(self, favicon_url: str, deadline: Deadline) -> int:
+        with self.favicon_lock:
+            cached = self.favicon_cache.get(favicon_url)
+            if cached and time.monotonic() - cached[0] < self.asset_cache_ttl:
+                self.favicon_cache.move_to_end(favicon_url)
+                return cached[1]
+            pending = self.favicon_inflight.get(favicon_url)
+            if pending is None:
+                self.favicon_inflight[favicon_url] = threading.Event()
+
+        if pending is not None:
+            pending.wait(deadline.timeout(5))
+            with self.favicon_lock:
+                cached = self.favicon_cache.get(favicon_url)
+            return cached[1] if cached else 0
+
+        favicon_hash = 0
         try:
-            r = self.session.get(favicon_url, headers=self._get_random_headers(), timeout=5, verify=False)
+            import mmh3
+            r = self._session_for(deadline).get(favicon_url, headers=self._get_random_headers(), timeout=deadline.timeout(5), verify=False)
             if r.status_code == 200:
                 favicon = codecs.encode(r.content, "base64")
-                data.favicon_hash = mmh3.hash(favicon)
+                favicon_hash = mmh3.hash(favicon)
+            # A missing icon is an answer too: no need to ask again for every page
+            with self.favicon_lock:
+                self.favicon_cache[favicon_url] = (time.monotonic(), favicon_hash)
+                while len(self.favicon_cache) > self.FAVICON_CACHE_SIZE:
+                    self.favicon_cache.popitem(last=False)
         except:
             pass
+        finally:
+            with self.favicon_lock:
+                self.favicon_inflight.pop(favicon_url).set()
+        return favicon_hash
 
-    def probe_paths(self, data: SiteData):
-        paths = ['/robots.txt', '/sitemap.xml', '/manifest.json', '/feed', '/rss', '/atom.xml', '/graphql', '/.well-known/security.txt', '/.well-known/apple-app-site-association']
-        
+    def probe_paths(self, data: SiteData, deadline: Deadline = None, cache=None):
+        deadline = deadline or Deadline()
         with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_path = {executor.submit(self._fetch_content, urljoin(data.final_url, p)): p for p in paths}
-            for future in concurrent.futures.as_completed(future_to_path):
+            future_to_path = {executor.submit(self._fetch_content, urljoin(data.final_url, p), deadline, cache): p for p in PROBE_PATHS}
+            for future in deadline.as_completed(executor, future_to_path):
                 path = future_to_path[future]
                 try:
                     content = future.result()
@@ -169,28 +290,30 @@ class Fetcher:
                 except:
                     pass
 
-    def resolve_dns(self, data: SiteData):
-        if not data.final_url:
+    def resolve_dns(self, data: SiteData, deadline: Deadline = None):
+        deadline = deadline or Deadline()
+        if not data.final_url or deadline.expired():
             return
+        import dns.resolver
         try:
             domain = urlparse(data.final_url).netloc
             # CNAME
             try:
-                answers = dns.resolver.resolve(domain, 'CNAME')
+                answers = dns.resolver.resolve(domain, 'CNAME', lifetime=deadline.timeout(5.0))
                 data.dns_records['CNAME'] = [str(r.target) for r in answers]
             except:
                 pass
                 
             # A
             try:
-                answers = dns.resolver.resolve(domain, 'A')
+                answers = dns.resolver.resolve(domain, 'A', lifetime=deadline.timeout(5.0))
                 data.dns_records['A'] = [str(r) for r in answers]
             except:
                 pass
             
             # MX
             try:
-                answers = dns.resolver.resolve(domain, 'MX')
+                answers = dns.resolver.resolve(domain, 'MX', lifetime=deadline.timeout(5.0))
                 data.dns_records['MX'] = [str(r.exchange) for r in answers]
             except:
                 pass
@@ -1,8 +1,11 @@
-import requests
-import concurrent.futures
-from urllib.parse import urljoin
+import itertools
+from urllib.parse import urlparse
 from typing import List
 from .utils import DetectionResult
+from .deadline import Deadline
+from .soft404 import Soft404Baseline
+from .async_dns import iter_wordlist
+from .path_discovery import PathDiscovery
 
 class FileFuzzer:
     # Critical files to check
@@ -24,74 +27,89 @@ class FileFuzzer:
         '/sftp-config.json'
     ]
 
-    def scan(self, url: str) -> List[DetectionResult]:
+    # Config files are small; anything bigger is a page, not a leak
+    MAX_BODY = 50000
+
+    # Discovered paths listed in the evidence
+    SHOWN_PATHS = 20
+
+    def __init__(self, wordlist: str = None, extensions: List[str] = None, backups=False, connections=8):
+        self.wordlist = wordlist
+        self.extensions = list(extensions or [])
+        self.backups = backups
+        self.engine = PathDiscovery(connections=connections)
+
+    def scan(self, url: str, deadline: Deadline = None, cache=None, soft404: Soft404Baseline = None) -> List[DetectionResult]:
+        deadline = deadline or Deadline()
         results = []
-        
-        def check_file(path):
-            target = urljoin(url, path)
-            try:
-                # Disable stream to get content
-                HEADERS = {
-                    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                }
-                resp = requests.get(target, headers=HEADERS, timeout=3, verify=False, stream=False)
-                
-                # Only trust 200 OK
-                if resp.status_code == 200:
-                    content = resp.text.lower()
-                    
-                    # False Positive reduction: check if it's just the homepage or a custom 404
-                    # Heuristic: if content length is too large (like full html page), skip
-                    # Most config files are small (< 10KB)
-                    if len(resp.content) > 50000: 
-                        return None
-                        
-                    is_leak = False
-                    evidence = ""
-                    
-                    if '.env' in path and ('db_password=' in content or 'api_key=' in content):
-                        is_leak = True
-                        evidence = "Exposed Environment Variables"
-                    elif '.git/config' in path and 'repositoryformatversion' in content:
-                        is_leak = True
-                        evidence = "Exposed Git Config"
-                    elif '.ds_store' in path: 
-                        # Binary match
-                        if b'Bud1' in resp.content or b'DSDB' in resp.content:
-                            is_leak = True
-                            evidence = "Exposed macOS Metadata"
-                    elif 'id_rsa' in path and 'private key' in content:
-                        is_leak = True
-                        evidence = "Exposed Private Key"
-                    elif 'backup.sql' in path and ('create table' in content or 'insert into' in content):
-                        is_leak = True
-                        evidence = "Exposed Database Backup"
-                    elif 'package.json' in path and 'dependencies' in content:
-                        is_leak = True
-                        evidence = "Exposed Node.js Config"
-                    elif resp.status_code == 200:
-                         # Generic match for other files if 200 OK and not HTML
-                         if '<html' not in content and '<body' not in content:
-                             is_leak = True
-                             evidence = f"Accessible Sensitive File"
+        baseline = soft404 or Soft404Baseline(cache)
+
+        def check_file(path, body):
+            content = body.decode('utf-8', errors='replace').lower()
 
-                    if is_leak:
-                        return DetectionResult(
-                            technology="Sensitive File Risk",
-                            category="Security Risk",
-                            confidence=100,
-                            evidence=f"Found {path}: {evidence}"
-                        )
-            except:
-                pass
+            is_leak = False
+            evidence = ""
+
+            if '.env' in path and ('db_password=' in content or 'api_key=' in content):
+                is_leak = True
+                evidence = "Exposed Environment Variables"
+            elif '.git/config' in path and 'repositoryformatversion' in content:
+                is_leak = True
+                evidence = "Exposed Git Config"
+            elif '.ds_store' in path:
+                # Binary match
+                if b'Bud1' in body or b'DSDB' in body:
+                    is_leak = True
+                    evidence = "Exposed macOS Metadata"
+            elif 'id_rsa' in path and 'private key' in content:
+                is_leak = True
+                evidence = "Exposed Private Key"
+            elif 'backup.sql' in path and ('create table' in content or 'insert into' in content):
+                is_leak = True
+                evidence = "Exposed Database Backup"
+            elif 'package.json' in path and 'dependencies' in content:
+                is_leak = True
+                evidence = "Exposed Node.js Config"
+            elif '<html' not in content and '<body' not in content:
+                # Generic match for other files if 200 OK and not HTML
+                is_leak = True
+                evidence = f"Accessible Sensitive File"
+
+            if is_leak:
+                return DetectionResult(
+                    technology="Sensitive File Risk",
+                    category="Security Risk",
+                    confidence=100,
+                    evidence=f"Found {path}: {evidence}"
+                )
             return None
 
-        # Threaded scan
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_path = {executor.submit(check_file, p): p for p in self.SENSITIVE_FILES}
-            for future in concurrent.futures.as_completed(future_to_path):
-                res = future.result()
+        # Built-in files first, then the wordlist (streamed), each with its permutations.
+        # Only answers unlike the host's catch-all come back; files are read up to MAX_BODY.
+        words = itertools.chain(self.SENSITIVE_FILES, iter_wordlist(self.wordlist, lower=False) if self.wordlist else [])
+        paths = PathDiscovery.expand(words, self.extensions, self.backups)
+        sensitive = set(self.SENSITIVE_FILES)
+        discovered = []
+        report = {}
+        for hit in self.engine.discover(url, paths, deadline, max_body=self.MAX_BODY, soft404=baseline, report=report):
+            if hit['path'] not in sensitive:
+                discovered.append(f"{hit['path']} ({hit['status']})")
+            elif hit['status'] == 200 and hit['complete']:
+                try:
+                    res = check_file(hit['path'], hit['body'])
+                except Exception:
+                    res = None
                 if res:
                     results.append(res)
-        
+
+        if report.get('stopped'):
+            print(f"[!] Path discovery: {urlparse(url).netloc} {report['stopped']}; stopped probing there.")
+        if discovered:
+            results.append(DetectionResult(
+                technology=f"Found {len(discovered)} Paths",
+                category="Reconnaissance",
+                confidence=100,
+                evidence=", ".join(discovered[:self.SHOWN_PATHS]) + ("..." if len(discovered) > self.SHOWN_PATHS else "")
+            ))
+
         return results
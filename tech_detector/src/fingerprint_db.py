@@ -0,0 +1,257 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from .utils import content_hash
+
+# Evidence types a fingerprint can use, in the order the engine scores them
+EVIDENCE_TYPES = ('headers', 'cookies', 'meta', 'html', 'script_src', 'js', 'icon_hash', 'probe')
+
+# Wappalyzer technology keys -> ours (evidence Wappalyzer has and we don't, e.g. dom/xhr/dns, is dropped)
+WAPPALYZER_KEYS = {'headers': 'headers', 'cookies': 'cookies', 'meta': 'meta', 'html': 'html',
+                   'scriptSrc': 'script_src', 'js': 'js', 'implies': 'imply'}
+
+MANIFEST = 'manifest.json'
+CATEGORIES = 'categories.json'
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+def normalize(raw: dict, categories: Dict[str, str] = None) -> List[dict]:
+    # Fingerprint file -> list of rules in our format. Ours: {"technologies": [{"name", "category", ...}]};
+    # Wappalyzer: {"Name": {"cats": [1], "scriptSrc": ..., "implies": ..., ...}} with categories.json ids.
+    if isinstance(raw.get('technologies'), list):
+        return raw['technologies']
+    if isinstance(raw.get('technologies') or raw.get('apps'), dict):
+        # Single-file Wappalyzer (technologies.json / apps.json) carries its own categories
+        categories = {str(k): v.get('name', '') for k, v in raw.get('categories', {}).items()} or categories
+        raw = raw.get('technologies') or raw.get('apps')
+
+    rules = []
+    for name, tech in raw.items():
+        if not isinstance(tech, dict):
+            continue
+        cats = [(categories or {}).get(str(cat), '') for cat in tech.get('cats', [])]
+        rule = {'name': name, 'category': next((cat for cat in cats if cat), 'Unknown')}
+        for key, ours in WAPPALYZER_KEYS.items():
+            if key not in tech:
+                continue
+            value = tech[key]
+            if ours in ('html', 'script_src', 'imply'):
+                rule[ours] = _as_list(value)
+            elif ours == 'js':
+                # Wappalyzer names a global property path; in bundle text that is a literal string
+                rule[ours] = {re.escape(path): '' for path in value}
+            else:
+                rule[ours] = dict(value)
+        rules.append(rule)
+    return rules
+
+def compile_pattern(pattern: str, flags=re.IGNORECASE) -> Tuple[Optional[re.Pattern], int, str]:
+    # "regex\;version:\1\;confidence:50" -> (compiled regex, version group, regex source).
+    # Plain strings without regex syntax compile to None and are matched as substrings.
+    source, *tags = str(pattern).split('\\;')
+    group = 1
+    for tag in tags:
+        key, _, value = tag.partition(':')
+        match = re.match(r'\\(\d)', value)
+        if key == 'version' and match:
+            group = int(match.group(1))
+    if not re.search(r'[\\^$.|?*+()\[\]{}]', source):
+        return None, 0, source
+    return re.compile(source, flags), group, source
+
+class FingerprintDB:
+    # Fingerprints from a single JSON file or a directory of shards (per category, per letter,
+    # upstream Wappalyzer layout...). A directory's manifest.json records which evidence types
+    # each shard uses, so only shards relevant to the evidence at hand are ever parsed; the
+    # rules are indexed per evidence type (header name, cookie name, meta name, icon hash, ...).
+    def __init__(self, path: str, evidence_types: Iterable[str] = None):
+        self.path = path
+        self.evidence_types = set(evidence_types or EVIDENCE_TYPES)
+        self.errors = []      # Validation problems: "<shard>: <technology>: <reason>"
+        self.technologies = {} # name -> {'category', 'imply', 'order'}
+        self._shards = []     # [(path, evidence types or None if unknown)]
+        self._categories = {}
+        self._loaded = set()
+        self._lock = threading.Lock()
+        self._index = {
+            'headers': {},   # header name (lower) -> [(seq, tech, key, regex, group, source)]
+            'cookies': {},   # cookie name -> [(seq, tech)]
+            'meta': {},      # meta name (lower) -> [(seq, tech, key, regex, group, source)]
+            'html': [],      # [(seq, tech, regex, group, source)]
+            'script_src': [],
+            'js': [],
+            'icon_hash': {}, # hash -> [(seq, tech)]
+            'probe': {}      # path -> [(seq, tech, keyword)]
+        }
+        # Position of each pattern in rule order, so evidence reads the same however the index is walked
+        self._seq = 0
+        self._open()
+
+    def _open(self):
+        if not os.path.isdir(self.path):
+            with open(self.path, 'rb') as f:
+                self.signature = content_hash(f.read())
+            self._shards = [(self.path, None)]
+            return
+
+        manifest_path = os.path.join(self.path, MANIFEST)
+        stale = set()
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'rb') as f:
+                raw = f.read()
+            manifest = json.loads(raw)
+            # Shards edited after the manifest was built: their recorded evidence types may be wrong,
+            # so they are loaded whatever the evidence, and the signature follows their size/mtime
+            built = os.stat(manifest_path).st_mtime_ns
+            stamps = []
+            for shard in manifest.get('shards', []):
+                try:
+                    stat = os.stat(os.path.join(self.path, shard['file']))
+                except OSError:
+                    continue
+                stamps.append(f"{shard['file']}:{stat.st_size}:{stat.st_mtime_ns}")
+                if stat.st_mtime_ns > built:
+                    stale.add(shard['file'])
+                    self.errors.append(f"{shard['file']}: changed since {MANIFEST} was built")
+            self.signature = content_hash(raw + '|'.join(stamps).encode())
+        else:
+            # No manifest: every shard has to be read once to learn what it holds
+            manifest = build_manifest(self.path)
+            self.signature = content_hash(json.dumps(manifest, sort_keys=True))
+
+        self.errors.extend(manifest.get('errors', []))
+        self._categories = manifest.get('categories', {})
+        self._shards = [(os.path.join(self.path, shard['file']), None if shard['file'] in stale else set(shard['evidence']))
+                        for shard in manifest.get('shards', [])]
+        for name, meta in manifest.get('technologies', {}).items():
+            self._register(name, meta.get('category', 'Unknown'), meta.get('imply', []))
+
+    def ensure(self, evidence_types: Iterable[str]) -> Dict[str, object]:
+        # Loads every not yet loaded shard that has rules for one of these evidence types
+        wanted = set(evidence_types) & self.evidence_types
+        with self._lock:
+            for shard_path, shard_types in self._shards:
+                if shard_path in self._loaded or (shard_types is not None and not shard_types & wanted):
+                    continue
+                self._load_shard(shard_path)
+                self._loaded.add(shard_path)
+        return self._index
+
+    def preload(self):
+        return self.ensure(EVIDENCE_TYPES)
+
+    def order(self, name: str) -> int:
+        return self.technologies.get(name, {}).get('order', len(self.technologies))
+
+    def _register(self, name: str, category: str, imply: List[str]):
+        tech = self.technologies.get(name)
+        if tech is None:
+            self.technologies[name] = {'category': category or 'Unknown', 'imply': list(imply), 'order': len(self.technologies)}
+        else:
+            # The same technology split over several shards: merge
+            if tech['category'] == 'Unknown':
+                tech['category'] = category or 'Unknown'
+            tech['imply'].extend(i for i in imply if i not in tech['imply'])
+
+    def _load_shard(self, shard_path: str):
+        shard = os.path.basename(shard_path)
+        try:
+            with open(shard_path, 'r', encoding='utf-8') as f:
+                rules = normalize(json.load(f), self._categories or load_categories(os.path.dirname(shard_path)))
+        except (OSError, ValueError, AttributeError) as e:
+            self.errors.append(f"{shard}: unreadable ({e})")
+            return
+        for rule in rules:
+            self._add(shard, rule)
+
+    def _next(self) -> int:
+        self._seq += 1
+        return self._seq
+
+    def _add(self, shard: str, rule: dict):
+        name = rule.get('name')
+        if not isinstance(name, str) or not name:
+            self.errors.append(f"{shard}: technology without a name")
+            return
+        self._register(name, rule.get('category', 'Unknown'), _as_list(rule.get('imply')))
+
+        def compiled(pattern, flags=re.IGNORECASE):
+            try:
+                return compile_pattern(pattern, flags)
+            except re.error as e:
+                self.errors.append(f"{shard}: {name}: invalid pattern {pattern!r} ({e})")
+                return None
+
+        index = self._index
+        types = self.evidence_types
+        if 'headers' in types:
+            # Wappalyzer allows a list of patterns per name
+            for key, patterns in (rule.get('headers') or {}).items():
+                for pattern in _as_list(patterns):
+                    entry = compiled(pattern)
+                    if entry:
+                        index['headers'].setdefault(key.lower(), []).append((self._next(), name, key) + entry)
+        if 'cookies' in types:
+            for key in (rule.get('cookies') or {}):
+                index['cookies'].setdefault(key, []).append((self._next(), name))
+        if 'meta' in types:
+            # Wappalyzer allows a list of patterns per name
+            for key, patterns in (rule.get('meta') or {}).items():
+                for pattern in _as_list(patterns):
+                    entry = compiled(pattern)
+                    if entry:
+                        index['meta'].setdefault(key.lower(), []).append((self._next(), name, key) + entry)
+        for etype, flags in (('html', re.IGNORECASE), ('script_src', re.IGNORECASE), ('js', 0)):
+            if etype in types:
+                patterns = rule.get(etype)
+                # "js" maps patterns to (unused) values in our format
+                for pattern in (list(patterns) if isinstance(patterns, dict) else _as_list(patterns)):
+                    entry = compiled(pattern, flags)
+                    if entry:
+                        index[etype].append((self._next(), name) + entry)
+        if 'icon_hash' in types and rule.get('icon_hash') is not None:
+            for icon_hash in _as_list(rule['icon_hash']):
+                index['icon_hash'].setdefault(str(icon_hash), []).append((self._next(), name))
+        if 'probe' in types:
+            for path, keyword in (rule.get('probe') or {}).items():
+                index['probe'].setdefault(path, []).append((self._next(), name, keyword))
+
+def load_categories(directory: str) -> Dict[str, str]:
+    # Wappalyzer keeps category ids in categories.json, next to or one level above the shards
+    for candidate in (os.path.join(directory, CATEGORIES), os.path.join(os.path.dirname(directory), CATEGORIES)):
+        try:
+            with open(candidate, 'r', encoding='utf-8') as f:
+                return {str(cat_id): cat.get('name', '') if isinstance(cat, dict) else str(cat)
+                        for cat_id, cat in json.load(f).items()}
+        except (OSError, ValueError, AttributeError):
+            continue
+    return {}
+
+def build_manifest(directory: str) -> dict:
+    # Reads every shard once and records its evidence types, technologies and content hash
+    categories = load_categories(directory)
+    manifest = {'categories': categories, 'shards': [], 'technologies': {}, 'errors': []}
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith('.json') or file_name in (MANIFEST, CATEGORIES):
+            continue
+        try:
+            with open(os.path.join(directory, file_name), 'rb') as f:
+                raw = f.read()
+            rules = normalize(json.loads(raw), categories)
+        except (OSError, ValueError, AttributeError) as e:
+            # One broken shard must not take the other fingerprints down with it
+            manifest['errors'].append(f"{file_name}: unreadable ({e})")
+            continue
+        evidence = sorted({etype for rule in rules for etype in EVIDENCE_TYPES if rule.get(etype)})
+        manifest['shards'].append({'file': file_name, 'sha256': content_hash(raw), 'evidence': evidence,
+                                   'technologies': len(rules)})
+        for rule in rules:
+            meta = manifest['technologies'].setdefault(rule.get('name', ''), {'category': rule.get('category', 'Unknown'), 'imply': []})
+            meta['imply'].extend(i for i in _as_list(rule.get('imply')) if i not in meta['imply'])
+    manifest['technologies'].pop('', None)
+    return manifest
@@ -1,7 +1,10 @@
 import requests
 import socket
 from urllib.parse import urlparse
+from typing import List, Optional
 from .utils import DetectionResult
+from .deadline import Deadline
+from .geoip_db import GeoIPDatabase
 
 # User-Agent to avoid blocking
 HEADERS = {
@@ -9,7 +12,13 @@ HEADERS = {
 }
 
 class GeoIPAnalyzer:
-    def analyze(self, url: str) -> list[DetectionResult]:
+    def __init__(self, db_paths: List[str] = None, online=True):
+        # db_paths: local IP-range datasets (see geoip_db); online: fall back to ip-api.com for IPs they don't cover
+        self.database = GeoIPDatabase(db_paths) if db_paths else None
+        self.online = online
+
+    def analyze(self, url: str, deadline: Deadline = None) -> list[DetectionResult]:
+        deadline = deadline or Deadline()
         results = []
         try:
             domain = urlparse(url).netloc
@@ -24,28 +33,27 @@ class GeoIPAnalyzer:
                 confidence=100,
                 evidence=f"DNS Resolution for {domain}"
             ))
-            
-            # Query free GeoIP API (ip-api.com is common for free use)
-            # Note: Rate limited to 45 requests per minute
-            api_url = f"http://ip-api.com/json/{ip_address}"
-            resp = requests.get(api_url, headers=HEADERS, timeout=5)
-            if resp.status_code == 200:
-                data = resp.json()
-                if data.get('status') == 'success':
-                    country = data.get('country', 'Unknown')
-                    city = data.get('city', 'Unknown')
-                    isp = data.get('isp', 'Unknown')
-                    org = data.get('org', 'Unknown')
-                    
-                    location = f"{city}, {country}"
-                    
-                    results.append(DetectionResult(
-                        technology=f"Location: {location}",
-                        category="Geo-Location",
-                        confidence=100,
-                        evidence=f"GeoIP Lookup"
-                    ))
-                    
+
+            info = self.lookup(ip_address, deadline)
+            if info:
+                country = info.get('country') or 'Unknown'
+                city = info.get('city') or 'Unknown'
+                isp = info.get('isp') or info.get('org')
+                org = info.get('org') or 'Unknown'
+                if info.get('asn'):
+                    org = f"{org} ({info['asn']})"
+
+                location = f"{city}, {country}"
+
+                results.append(DetectionResult(
+                    technology=f"Location: {location}",
+                    category="Geo-Location",
+                    confidence=100,
+                    evidence=f"GeoIP Lookup ({info['source']})"
+                ))
+
+                # A city-only dataset says nothing about the network owner
+                if isp:
                     results.append(DetectionResult(
                         technology=f"ISP: {isp}",
                         category="Infrastructure",
@@ -58,3 +66,40 @@ class GeoIPAnalyzer:
             pass
             
         return results
+
+    def lookup(self, ip_address: str, deadline: Deadline = None) -> Optional[dict]:
+        deadline = deadline or Deadline()
+        if self.database:
+            try:
+                info = self.database.lookup(ip_address)
+            except OSError:
+                info = None # Unreadable dataset: behave as if none was given
+            if info:
+                info['source'] = "offline"
+                return info
+        if self.online:
+            return self._lookup_online(ip_address, deadline)
+        return None
+
+    def _lookup_online(self, ip_address: str, deadline: Deadline) -> Optional[dict]:
+        # Query free GeoIP API (ip-api.com is common for free use)
+        # Note: Rate limited to 45 requests per minute
+        if deadline.expired():
+            return None
+        try:
+            api_url = f"http://ip-api.com/json/{ip_address}"
+            resp = requests.get(api_url, headers=HEADERS, timeout=deadline.timeout(5))
+            if resp.status_code == 200:
+                data = resp.json()
+                if data.get('status') == 'success':
+                    return {
+                        'country': data.get('country'),
+                        'city': data.get('city'),
+                        'isp': data.get('isp'),
+                        'org': data.get('org'),
+                        'asn': (data.get('as') or '').split(' ')[0],
+                        'source': "ip-api.com"
+                    }
+        except Exception:
+            pass
+        return None
@@ -0,0 +1,187 @@
+import csv
+import json
+import os
+import socket
+import threading
+from array import array
+from bisect import bisect_right
+from typing import Dict, List, Optional
+from .utils import CACHE_DIR, content_hash
+
+class IPRangeIndex:
+    # Sorted, non-overlapping IP ranges with binary search. IPv4 bounds live in compact
+    # unsigned arrays; IPv6 bounds are plain int lists. Records are interned, so a million
+    # ranges of a few hundred ASNs cost one tuple per distinct (country, city, asn, org).
+    FIELDS = ('country', 'city', 'asn', 'org')
+
+    # Header names used by common free datasets -> our fields
+    COLUMNS = {
+        'start': ['start', 'ip_start', 'range_start', 'start_ip', 'first_ip', 'network_start'],
+        'end': ['end', 'ip_end', 'range_end', 'end_ip', 'last_ip', 'network_end'],
+        'country': ['country', 'country_code', 'country_iso_code', 'cc'],
+        'city': ['city', 'city_name'],
+        'asn': ['asn', 'as_number', 'autonomous_system_number'],
+        'org': ['org', 'organization', 'as_description', 'as_name', 'isp', 'autonomous_system_organization']
+    }
+
+    def __init__(self):
+        self.records = []
+        self.v4 = (array('L'), array('L'), array('L')) # starts, ends, record ids
+        self.v6 = ([], [], array('L'))
+
+    def lookup(self, ip: str) -> Optional[Dict[str, str]]:
+        try:
+            version, value = self._to_int(ip)
+        except OSError:
+            return None
+        starts, ends, ids = self.v4 if version == 4 else self.v6
+        i = bisect_right(starts, value) - 1
+        if i < 0 or ends[i] < value:
+            return None
+        return dict(zip(self.FIELDS, self.records[ids[i]]))
+
+    @classmethod
+    def load(cls, path: str, cache_dir: str = None) -> 'IPRangeIndex':
+        # Parsing a multi-million-row CSV takes seconds; the compiled index is cached next to the scan state
+        cache_dir = cache_dir or os.path.join(CACHE_DIR, 'geoip')
+        stat = os.stat(path)
+        key = content_hash(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}")[:16]
+        cache_path = os.path.join(cache_dir, key)
+
+        index = cls()
+        if index._read_compiled(cache_path):
+            return index
+        index._parse_csv(path)
+        index._write_compiled(cache_path)
+        return index
+
+    def _parse_csv(self, path: str):
+        with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+            sample = f.read(4096)
+            f.seek(0)
+            reader = csv.reader(f, dialect='excel-tab' if '\t' in sample.split('\n', 1)[0] else 'excel')
+            first = next(reader, None)
+            if first is None:
+                return
+            columns = self._columns(first)
+            rows = reader if columns else self._chain(first, reader)
+            columns = columns or self._positional(len(first))
+
+            rows_v4, rows_v6 = [], []
+            interned = {}
+            for row in rows:
+                try:
+                    version, start = self._to_int(row[columns['start']].strip())
+                    _, end = self._to_int(row[columns['end']].strip())
+                except (OSError, IndexError):
+                    continue
+                record = tuple(row[columns[name]].strip() if columns.get(name) is not None and columns[name] < len(row) else ''
+                               for name in self.FIELDS)
+                asn = record[2]
+                if asn in ('0', 'None'): # iptoasn marks unrouted ranges with AS0
+                    asn = ''
+                elif asn and not asn.upper().startswith('AS'):
+                    asn = f"AS{asn}"
+                record = record[:2] + (asn,) + record[3:]
+                record_id = interned.setdefault(record, len(interned))
+                (rows_v4 if version == 4 else rows_v6).append((start, end, record_id))
+
+        self.records = [None] * len(interned)
+        for record, record_id in interned.items():
+            self.records[record_id] = record
+        for rows, (starts, ends, ids) in ((rows_v4, self.v4), (rows_v6, self.v6)):
+            rows.sort()
+            for start, end, record_id in rows:
+                starts.append(start)
+                ends.append(end)
+                ids.append(record_id)
+
+    def _to_int(self, ip: str):
+        # inet_pton is an order of magnitude faster than ipaddress for millions of rows
+        try:
+            return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+        except OSError:
+            return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), 'big')
+
+    def _columns(self, header: List[str]) -> Optional[Dict[str, int]]:
+        names = [h.strip().lower() for h in header]
+        try:
+            self._to_int(names[0])
+            return None # No header row
+        except OSError:
+            pass
+        columns = {}
+        for field, aliases in self.COLUMNS.items():
+            for alias in aliases:
+                if alias in names:
+                    columns[field] = names.index(alias)
+                    break
+        return columns if 'start' in columns and 'end' in columns else None
+
+    def _positional(self, width: int) -> Dict[str, int]:
+        if width == 5:
+            # iptoasn.com: range_start, range_end, AS_number, country_code, AS_description
+            return {'start': 0, 'end': 1, 'asn': 2, 'country': 3, 'org': 4}
+        if width >= 8:
+            # db-ip city lite: ip_start, ip_end, continent, country, stateprov, city, latitude, longitude
+            return {'start': 0, 'end': 1, 'country': 3, 'city': 5}
+        # Generic: start, end, country, city, asn, org
+        return {'start': 0, 'end': 1, 'country': 2, 'city': 3, 'asn': 4, 'org': 5}
+
+    def _chain(self, first, rows):
+        yield first
+        yield from rows
+
+    def _read_compiled(self, cache_path: str) -> bool:
+        try:
+            with open(cache_path + '.json', 'r') as f:
+                meta = json.load(f)
+            with open(cache_path + '.v4', 'rb') as f:
+                for arr in self.v4:
+                    arr.fromfile(f, meta['v4'])
+            self.records = [tuple(r) for r in meta['records']]
+            self.v6 = ([int(v, 16) for v in meta['v6'][0]], [int(v, 16) for v in meta['v6'][1]], array('L', meta['v6'][2]))
+            return True
+        except (OSError, ValueError, KeyError, EOFError):
+            self.__init__()
+            return False
+
+    def _write_compiled(self, cache_path: str):
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path + '.v4', 'wb') as f:
+                for arr in self.v4:
+                    arr.tofile(f)
+            meta = {
+                'v4': len(self.v4[0]),
+                'records': self.records,
+                'v6': [[format(v, 'x') for v in self.v6[0]], [format(v, 'x') for v in self.v6[1]], list(self.v6[2])]
+            }
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(meta, f)
+            # Metadata last: its presence marks the compiled index as complete
+            os.replace(tmp_path, cache_path + '.json')
+        except OSError:
+            pass
+
+class GeoIPDatabase:
+    # One or more range files (e.g. a city dataset plus an ASN dataset); fields are merged per IP
+    def __init__(self, paths: List[str]):
+        self.paths = paths
+        self._indexes = None
+        self._lock = threading.Lock()
+
+    def preload(self):
+        with self._lock:
+            if self._indexes is None:
+                self._indexes = [IPRangeIndex.load(path) for path in self.paths]
+        return self._indexes
+
+    def lookup(self, ip: str) -> Optional[Dict[str, str]]:
+        merged = {}
+        for index in self.preload():
+            for field, value in (index.lookup(ip) or {}).items():
+                if value and not merged.get(field):
+                    merged[field] = value
+        return merged or None
@@ -0,0 +1,64 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, Optional, Tuple
+from .utils import content_hash
+
+# Comments CDNs add to or strip from otherwise identical files
+SOURCE_MAP = re.compile(r'^\s*(?://[#@]\s*sourceMappingURL=\S*|/\*[#@]\s*sourceMappingURL=\S*\s*\*/)\s*$', re.MULTILINE)
+
+def normalize_js(content: str) -> str:
+    # Same library release, different delivery: BOM, CRLF line endings, trailing whitespace
+    # and source map comments vary between npm, CDNs and self-hosted copies
+    content = content.lstrip('\ufeff').replace('\r\n', '\n').replace('\r', '\n')
+    content = SOURCE_MAP.sub('', content)
+    return '\n'.join(line.rstrip() for line in content.split('\n')).strip('\n')
+
+def hash_variants(content: str) -> Tuple[str, str]:
+    # (whole file, normalized); both are keys of the index
+    return content_hash(content), content_hash(normalize_js(content))
+
+class LibraryHashIndex:
+    # Known library releases by content hash, in the spirit of retire.js: a stock CDN copy of
+    # jQuery or Bootstrap is identified, with its exact version, by one dict lookup.
+    # data/library_hashes.json: {"libraries": {name: {"category", "hashes": {sha256: [versions]}}}};
+    # a file unchanged across releases lists all of them. Build it with tools/build_library_hashes.py.
+    DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'library_hashes.json')
+
+    def __init__(self, path: str = None):
+        self.path = path or self.DEFAULT_PATH
+        self._hashes = None # sha256 -> (technology, category, versions)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, 'rb') as f:
+                self.signature = content_hash(f.read())
+        except OSError:
+            self.signature = ''
+
+    def preload(self) -> Dict[str, tuple]:
+        with self._lock:
+            if self._hashes is None:
+                hashes = {}
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        libraries = json.load(f).get('libraries', {})
+                except (OSError, ValueError, AttributeError):
+                    libraries = {}
+                for name, library in libraries.items():
+                    category = library.get('category', 'JavaScript Libraries')
+                    for digest, versions in library.get('hashes', {}).items():
+                        hashes[digest] = (name, category, tuple(versions))
+                self._hashes = hashes
+        return self._hashes
+
+    def __len__(self):
+        return len(self.preload())
+
+    def lookup(self, content: str) -> Optional[tuple]:
+        # (technology, category, versions) of a known release, or None
+        hashes = self.preload()
+        if not hashes or not content:
+            return None
+        # The normalized variant is only computed when the file isn't a byte-identical copy
+        return hashes.get(content_hash(content)) or hashes.get(content_hash(normalize_js(content)))
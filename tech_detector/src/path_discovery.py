@@ -0,0 +1,340 @@
+import asyncio
+import itertools
+import queue
+import ssl
+import concurrent.futures
+import threading
+from collections import deque
+from types import SimpleNamespace
+from typing import Iterable, Iterator, Set
+from urllib.parse import quote, urlparse
+from .deadline import Deadline
+from .soft404 import Soft404Baseline
+
+class PathDiscovery:
+    # Wordlist-scale content discovery against one host. A few asyncio workers each hold a keep-alive
+    # connection and pipeline several requests on it, so 50k paths need neither 50k handshakes nor a
+    # thread per request. Answers are classified against the host's catch-all (the scan's
+    # Soft404Baseline, seen without following redirects) and streamed to the caller as they arrive;
+    # paths the scan has already fetched are answered from its response cache. A host whose root
+    # redirects elsewhere (http -> https, apex -> www) is probed where it lands. Probing stops early
+    # when the host starts rate-limiting or suddenly answers everything the same way (a WAF block
+    # page, an error page after a ban).
+    HEADERS = Soft404Baseline.HEADERS
+
+    # Statuses worth reporting for a path that doesn't answer like the catch-all
+    STATUSES = {200, 201, 204, 301, 302, 307, 308, 401, 403}
+
+    # Copies editors and admins leave next to a file
+    BACKUP_SUFFIXES = ('.bak', '.old', '.orig', '.save', '.tmp', '~')
+
+    HEAD_LIMIT = 65536      # Status line and headers
+    DRAIN_LIMIT = 262144    # Bodies up to this are read to the end to keep the connection; larger ones close it
+    UNIFORM_RUN = 50        # Consecutive same-shaped "hits" that mean the host answers everything the same
+    BUSY_RUN = 3            # Consecutive 503s that mean we are being throttled
+    FAILURE_RUN = 5         # Consecutive connection failures before giving up on the host
+
+    def __init__(self, connections=8, pipeline=4, timeout=5.0):
+        self.connections = connections
+        self.pipeline = pipeline
+        self.timeout = timeout
+
+    @classmethod
+    def expand(cls, words: Iterable[str], extensions: Iterable[str] = (), backups=False) -> Iterator[str]:
+        # Wordlist entries as paths, plus name.ext for bare names and backup copies of files
+        # (config.php -> config.php.bak, config.php~, .config.php.swp). Lazy, like the wordlist.
+        extensions = [e.strip().lstrip('.') for e in extensions if e.strip().lstrip('.')]
+        for word in words:
+            path = '/' + word.strip().lstrip('/')
+            if path == '/':
+                continue
+            variants = [path]
+            if extensions and not path.endswith('/') and '.' not in path.rsplit('/', 1)[1]:
+                variants.extend(f"{path}.{ext}" for ext in extensions)
+            if backups:
+                for variant in list(variants):
+                    directory, _, name = variant.rpartition('/')
+                    if '.' in name.strip('.') or name.startswith('.'):
+                        variants.extend(variant + suffix for suffix in cls.BACKUP_SUFFIXES)
+                        variants.append(f"{directory}/.{name.lstrip('.')}.swp")
+            yield from variants
+
+    def discover(self, url: str, paths: Iterable[str], deadline: Deadline = None, statuses: Set[int] = None,
+                 max_body: int = None, soft404: Soft404Baseline = None, report: dict = None,
+                 shared: Iterable[str] = ()) -> Iterator[dict]:
+        # Yields {'path', 'url', 'status', 'headers', 'body', 'complete'} for every path that exists,
+        # as answers come in. body is the first PREFIX bytes, or up to max_body for larger files;
+        # complete says whether that is all of it. `report` receives request/hit counts and, when
+        # probing stopped early, the reason ('stopped'). `shared` paths are ones other modules fetch
+        # too: they go through the scan cache (soft404.cache) rather than a connection of our own.
+        deadline = deadline or Deadline()
+        report = report if report is not None else {}
+        report.update(requests=0, found=0, stopped=None)
+        target = urlparse(url if '://' in url else 'https://' + url)
+        if not target.hostname or deadline.expired():
+            return
+
+        items = queue.Queue()
+        stop = threading.Event()
+        done = object()
+
+        baseline = soft404 or Soft404Baseline()
+        origin = f"{target.scheme}://{target.netloc.rsplit('@', 1)[-1]}"
+
+        def run():
+            try:
+                # Raw connections don't follow redirects: go where the root lands first
+                landed = self._landing(target, origin, baseline, deadline)
+                # One baseline per host and scan, learned by whichever module asks first
+                samples = baseline.direct_samples(f"{landed.scheme}://{landed.netloc}/", deadline)
+                if not samples:
+                    return
+                if baseline.cache is not None and shared:
+                    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
+                        futures = [executor.submit(self._fetch_shared, baseline.cache, origin + path, deadline) for path in shared]
+                        for _ in deadline.as_completed(executor, futures):
+                            pass
+                asyncio.run(self._run(landed, origin, iter(paths), deadline, statuses or self.STATUSES, max_body,
+                                      baseline, samples, items.put, stop, report))
+            except (OSError, RuntimeError, ValueError, asyncio.TimeoutError):
+                pass
+            finally:
+                items.put(done)
+
+        # The event loop runs beside the caller, which consumes hits while probing goes on
+        threading.Thread(target=run, daemon=True).start()
+        try:
+            while True:
+                item = items.get()
+                if item is done:
+                    return
+                yield item
+        finally:
+            # Also reached when the caller stops iterating early
+            stop.set()
+
+    def _landing(self, target, origin: str, baseline: Soft404Baseline, deadline: Deadline):
+        landed = baseline.landing(origin, deadline)
+        if landed == origin:
+            return target
+        print(f"[*] Path discovery: {origin} redirects to {landed}, probing there.")
+        return urlparse(landed)
+
+    async def _run(self, target, origin: str, paths: Iterator[str], deadline: Deadline, statuses: Set[int], max_body: int,
+                   baseline: Soft404Baseline, samples: list, emit, stop: threading.Event, report: dict):
+        from requests.structures import CaseInsensitiveDict
+
+        tls = target.scheme == 'https'
+        port = target.port or (443 if tls else 80)
+        host_header = target.netloc.rsplit('@', 1)[-1]
+        base = f"{target.scheme}://{host_header}"
+        context = None
+        if tls:
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        keep = max(baseline.PREFIX, (max_body or 0) + 1)
+        state = {'pipeline': max(1, self.pipeline), 'failures': 0, 'busy': 0}
+        retry = deque()  # Paths whose answer was lost with a connection
+        retried = set()
+        run = []         # Current streak of same-shaped hits, held back until it ends
+
+        def finished():
+            return stop.is_set() or report['stopped'] or deadline.expired()
+
+        def halt(reason):
+            if not report['stopped']:
+                report['stopped'] = reason
+
+        async def connect():
+            return await asyncio.wait_for(
+                asyncio.open_connection(target.hostname, port, ssl=context, server_hostname=target.hostname if tls else None,
+                                        limit=self.HEAD_LIMIT),
+                timeout=deadline.timeout(self.timeout))
+
+        async def exchange(conn, batch):
+            # Requests go out back to back; answers come back in order. On a dead connection the
+            # answered prefix is returned and the rest is the caller's to retry.
+            reader, writer = conn
+            writer.write(b''.join(self._request(host_header, path) for path in batch))
+            await asyncio.wait_for(writer.drain(), timeout=deadline.timeout(self.timeout))
+            answers = []
+            for path in batch:
+                try:
+                    answer = await asyncio.wait_for(self._read_response(reader, keep, CaseInsensitiveDict),
+                                                    timeout=deadline.timeout(self.timeout))
+                except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    return answers, False
+                answers.append((path,) + answer[:-1])
+                if not answer[-1]:
+                    return answers, False
+            return answers, True
+
+        def close(conn):
+            if conn is not None:
+                conn[1].close()
+
+        def fingerprint(path, status, headers, body, complete):
+            response = SimpleNamespace(status_code=status, headers=headers, url=base + path, history=[])
+            return baseline.fingerprint(response, body, complete, path)
+
+        def flush():
+            for hit in run:
+                if hit['status'] in statuses:
+                    report['found'] += 1
+                    emit({key: value for key, value in hit.items() if key != 'fingerprint'})
+            run.clear()
+
+        def handle(path, status, headers, body, complete):
+            report['requests'] += 1
+            state['failures'] = 0
+            state['busy'] = state['busy'] + 1 if status == 503 else 0
+            if status in (404, 410, 429, 503):
+                flush()
+            if status == 429 or state['busy'] >= self.BUSY_RUN:
+                return halt(f"started rate-limiting ({status})")
+            if status in (404, 410, 503):
+                return
+            found = fingerprint(path, status, headers, body, complete)
+            if baseline.matches(found, samples):
+                return flush()
+            hit = {'path': path, 'url': base + path, 'status': status, 'headers': headers, 'body': body,
+                   'complete': complete, 'fingerprint': found}
+            if run and not self._alike(found, run[-1]['fingerprint']):
+                flush()
+            run.append(hit)
+            if len(run) >= self.UNIFORM_RUN:
+                # Dozens of "different" paths in a row with one answer: a block page, not content
+                run.clear()
+                halt("answers every path the same way")
+
+        def take(size):
+            batch = [retry.popleft() for _ in range(min(size, len(retry)))]
+            batch.extend(itertools.islice(candidates, size - len(batch)))
+            return batch
+
+        def lost(batch, answered):
+            for path in batch:
+                if path not in retried:
+                    retried.add(path)
+                    retry.append(path)
+            if not answered:
+                state['failures'] += 1
+                if state['failures'] >= self.FAILURE_RUN:
+                    halt("stopped accepting connections")
+
+        def cached(path):
+            # Answered from the scan cache (URLs as the rest of the scan asks for them, redirects followed)
+            response = baseline.cache.cached('GET', origin + path) if baseline.cache is not None else None
+            if response is None:
+                return False
+            body, complete = response.content[:keep], len(response.content) <= keep
+            if response.status_code in statuses and not baseline.looks_missing(origin + path, response, body, complete, deadline):
+                report['found'] += 1
+                emit({'path': path, 'url': origin + path, 'status': response.status_code, 'headers': response.headers,
+                      'body': body, 'complete': complete})
+            return True
+
+        seen = set()
+        candidates = (p for p in paths if p.startswith('/') and not (p in seen or seen.add(p)) and not cached(p))
+
+        async def worker():
+            conn, served = None, 0
+            try:
+                while not finished():
+                    batch = take(state['pipeline'])
+                    if not batch:
+                        return
+                    try:
+                        if conn is None:
+                            conn, served = await connect(), 0
+                        answers, reusable = await exchange(conn, batch)
+                    except (OSError, asyncio.TimeoutError):
+                        answers, reusable = [], False
+                    for answer in answers:
+                        if not finished():
+                            handle(*answer)
+                    served += len(answers)
+                    if len(answers) < len(batch):
+                        # A server that hangs up right after its first answer doesn't do pipelining
+                        if 0 < served <= 1:
+                            state['pipeline'] = 1
+                        lost(batch[len(answers):], answers)
+                    if not reusable:
+                        close(conn)
+                        conn = None
+            finally:
+                close(conn)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, self.connections))))
+        flush()
+
+    def _fetch_shared(self, cache, url: str, deadline: Deadline):
+        try:
+            cache.get(url, headers=self.HEADERS, timeout=deadline.timeout(self.timeout), verify=False)
+        except Exception:
+            pass
+
+    def _alike(self, a: dict, b: dict) -> bool:
+        # Same kind of answer, ignoring content: block pages carry request IDs, real hits rarely
+        # come fifty in a row
+        return (a['status'] == b['status'] and a['final_path'] == b['final_path']
+                and (a['bucket'] is None or b['bucket'] is None or abs(a['bucket'] - b['bucket']) <= 1))
+
+    def _request(self, host: str, path: str) -> bytes:
+        target = quote(path, safe="/%:@!$&'()*+,;=~?")
+        return (f"GET {target} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: {self.HEADERS['User-Agent']}\r\n"
+                "Accept: */*\r\nAccept-Encoding: identity\r\nConnection: keep-alive\r\n\r\n").encode('utf-8')
+
+    async def _read_response(self, reader: asyncio.StreamReader, keep: int, headers_type) -> tuple:
+        # (status, headers, first `keep` bytes of the body, whether that is all of it, connection reusable)
+        while True:
+            head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+            version, status = head[0].split(' ', 2)[:2]
+            status = int(status)
+            if status >= 200 or status == 101:
+                break
+        headers = headers_type()
+        for line in head[1:]:
+            name, sep, value = line.partition(':')
+            if sep:
+                name = name.strip()
+                headers[name] = f"{headers[name]}, {value.strip()}" if name in headers else value.strip()
+        connection = headers.get('Connection', '').lower()
+        reusable = 'close' not in connection and (version == 'HTTP/1.1' or 'keep-alive' in connection)
+
+        if status in (204, 304):
+            return status, headers, b'', True, reusable
+
+        if 'chunked' in headers.get('Transfer-Encoding', '').lower():
+            chunks, size = [], 0
+            while True:
+                length = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+                if length == 0:
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    return status, headers, b''.join(chunks)[:keep], size <= keep, reusable
+                if size + length > self.DRAIN_LIMIT:
+                    chunks.append(await reader.readexactly(min(length, max(keep - size, 0))))
+                    return status, headers, b''.join(chunks)[:keep], False, False
+                data = await reader.readexactly(length)
+                await reader.readexactly(2)
+                if size < keep:
+                    chunks.append(data[:keep - size])
+                size += length
+
+        length = headers.get('Content-Length', '').strip()
+        if length.isdigit():
+            length = int(length)
+            if length > self.DRAIN_LIMIT:
+                return status, headers, await reader.readexactly(min(length, keep)), False, False
+            return status, headers, (await reader.readexactly(length))[:keep], length <= keep, reusable
+
+        # Delimited by the server closing the connection
+        body = b''
+        while len(body) <= keep:
+            data = await reader.read(65536)
+            if not data:
+                return status, headers, body, True, False
+            body += data
+        return status, headers, body[:keep], False, False
@@ -1,7 +1,37 @@
+import asyncio
+import json
+import os
 import socket
-import concurrent.futures
+import time
 from urllib.parse import urlparse
+from typing import Dict, List
 from .utils import DetectionResult
+from .deadline import Deadline
+from .service_detector import ServiceDetector
+
+class AdaptiveTimeout:
+    # RFC 6298-style estimator: timeout = smoothed RTT + 4 * RTT variance, clamped.
+    # Fed with connect times of open ports, so near hosts get short timeouts and far ones longer.
+    def __init__(self, initial=1.0, minimum=0.25, maximum=3.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.initial = initial
+        self.srtt = None
+        self.rttvar = None
+
+    def observe(self, rtt: float):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    @property
+    def value(self) -> float:
+        if self.srtt is None:
+            return self.initial
+        return min(max(self.srtt + 4 * self.rttvar, self.minimum), self.maximum)
 
 class PortScanner:
     # Common ports of interest
@@ -19,41 +49,138 @@ class PortScanner:
         9200: "Elasticsearch"
     }
 
-    def scan(self, url: str) -> list[DetectionResult]:
-        domain = urlparse(url).netloc
-        if ":" in domain:
-            domain = domain.split(":")[0]
-            
-        open_ports = []
-
-        def check_port(port):
-            try:
-                # Short timeout for speed
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-                    sock.settimeout(1.0) 
-                    result = sock.connect_ex((domain, port))
-                    if result == 0:
-                        return port
-            except:
-                pass
-            return None
+    PROFILES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'port_profiles.json')
+
+    def __init__(self, ports="default", concurrency=500, initial_timeout=1.0, min_timeout=0.25, max_timeout=3.0,
+                 detect_services=True):
+        # ports: a profile name from data/port_profiles.json (default, top-100, top-1000, all)
+        # or a custom spec such as "22,80,8000-8100"
+        self.ports = ports
+        # Banner grabbing / protocol probes ride on the connect that found the port open
+        self.detector = ServiceDetector() if detect_services else None
+        self.concurrency = concurrency
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+
+    @classmethod
+    def parse_ports(cls, spec: str) -> List[int]:
+        with open(cls.PROFILES_PATH, 'r') as f:
+            profiles = json.load(f)
+        spec = profiles.get(spec, spec)
+
+        ports = set()
+        for part in str(spec).split(','):
+            part = part.strip()
+            if not part:
+                continue
+            start, _, end = part.partition('-')
+            start, end = int(start), int(end or start)
+            if not 0 < start <= end <= 65535:
+                raise ValueError(f"Invalid port range: {part}")
+            ports.update(range(start, end + 1))
+        return sorted(ports)
+
+    def scan(self, url: str, deadline: Deadline = None) -> list[DetectionResult]:
+        deadline = deadline or Deadline()
+        parsed = urlparse(url if '://' in url else 'https://' + url)
+        domain = parsed.hostname
+        known_port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+
+        services = {}
+        open_ports = self.scan_ports(domain, self.parse_ports(self.ports), deadline, known_ports=[known_port], services=services)
 
-        # Threaded scan
-        with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-            future_to_port = {executor.submit(check_port, port): port for port in self.PORTS}
-            for future in concurrent.futures.as_completed(future_to_port):
-                p = future.result()
-                if p:
-                    open_ports.append(p)
-        
         results = []
         if open_ports:
-            services = [f"{p}/{self.PORTS[p]}" for p in open_ports]
+            labels = [f"{p}/{services[p].technology if p in services else self._label(p)}" for p in sorted(open_ports)]
             results.append(DetectionResult(
-                technology=f"Open Ports: {', '.join(services)}",
+                technology=f"Open Ports: {', '.join(labels)}",
                 category="Infrastructure",
                 confidence=100,
                 evidence="Active TCP Connect Scan"
             ))
-            
+            results.extend(services[p] for p in sorted(services))
+
         return results
+
+    def scan_ports(self, host: str, ports: List[int], deadline: Deadline = None, known_ports: List[int] = None,
+                   services: Dict[int, DetectionResult] = None) -> Dict[int, float]:
+        # Returns open port -> connect time (seconds); identified services are collected into `services`
+        deadline = deadline or Deadline()
+        if not host or deadline.expired():
+            return {}
+        try:
+            return asyncio.run(self._scan_async(host, ports, deadline, known_ports or [], services))
+        except (OSError, RuntimeError, asyncio.TimeoutError):
+            return {}
+
+    async def _scan_async(self, host: str, ports: List[int], deadline: Deadline, known_ports: List[int],
+                          services: Dict[int, DetectionResult] = None) -> Dict[int, float]:
+        loop = asyncio.get_running_loop()
+        # Resolve once instead of once per probe
+        infos = await asyncio.wait_for(loop.getaddrinfo(host, None, type=socket.SOCK_STREAM), timeout=deadline.timeout(5))
+        ip = infos[0][4][0]
+
+        timer = AdaptiveTimeout(self.initial_timeout, self.min_timeout, self.max_timeout)
+        open_ports = {}
+        wanted = set(ports)
+        identify = (host, services) if services is not None and self.detector else None
+
+        # Calibrate on ports we already expect to be open (the web port) before the sweep;
+        # the last calibration connect doubles as its service probe
+        for port in known_ports:
+            for attempt in range(3):
+                rtt = await self._probe(ip, port, timer, deadline, identify if attempt == 2 and port in wanted else None)
+                if rtt is None:
+                    break
+                open_ports[port] = rtt
+
+        # A fixed pool of workers pulls from one iterator, so memory stays flat for 65k ports
+        pending = (p for p in ports if p not in open_ports)
+
+        async def worker():
+            for port in pending:
+                if deadline.expired():
+                    return
+                rtt = await self._probe(ip, port, timer, deadline, identify)
+                if rtt is not None:
+                    open_ports[port] = rtt
+
+        await asyncio.gather(*(worker() for _ in range(min(self._max_concurrency(), len(ports)) or 1)))
+        return {port: rtt for port, rtt in open_ports.items() if port in wanted}
+
+    async def _probe(self, ip: str, port: int, timer: AdaptiveTimeout, deadline: Deadline, identify=None):
+        start = time.monotonic()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout=deadline.timeout(timer.value))
+        except (asyncio.TimeoutError, OSError):
+            return None
+        rtt = time.monotonic() - start
+        timer.observe(rtt)
+        try:
+            if identify:
+                host, services = identify
+                # Banners arrive within a few round trips; the detector caps the wait itself
+                service = await self.detector.identify(reader, writer, port, host, deadline, wait=max(timer.value * 4, 0.5))
+                if service:
+                    services[port] = service
+        finally:
+            writer.close()
+        return rtt
+
+    def _max_concurrency(self) -> int:
+        # Keep clear of the process file-descriptor limit
+        try:
+            import resource
+            soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+            return max(1, min(self.concurrency, soft_limit - 64))
+        except (ImportError, ValueError, OSError):
+            return self.concurrency
+
+    def _label(self, port: int) -> str:
+        if port in self.PORTS:
+            return self.PORTS[port]
+        try:
+            return socket.getservbyport(port, 'tcp').upper()
+        except OSError:
+            return "unknown"
@@ -1,69 +1,264 @@
 import requests
+import concurrent.futures
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
 from urllib.parse import urlparse
-from typing import List
-from .utils import DetectionResult
+from typing import Dict, Iterable, List, Optional, Tuple
+from .utils import DetectionResult, CACHE_DIR, registered_domain
+from .deadline import Deadline
 
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
 }
 
 class RDAPClient:
-    def analyze(self, url: str) -> List[DetectionResult]:
-        results = []
+    BOOTSTRAP_URL = "https://data.iana.org/rdap/dns.json"
+    # rdap.org is a reliable open redirector, used for TLDs the bootstrap doesn't cover
+    FALLBACK_URL = "https://rdap.org/"
+    # A bootstrap that could only be read stale (offline) is retried after this many seconds
+    BOOTSTRAP_RETRY = 300
+    # Answers kept in memory; the rest are read back from the on-disk cache
+    RESPONSE_CACHE_SIZE = 1024
+
+    def __init__(self, cache_dir: str = None, ttl=86400, bootstrap_ttl=7 * 86400, workers=8):
+        # ttl: seconds an RDAP answer is reused; bootstrap_ttl: refresh window of the IANA TLD -> server map
+        self.cache_dir = cache_dir or os.path.join(CACHE_DIR, 'rdap')
+        self.ttl = ttl
+        self.bootstrap_ttl = bootstrap_ttl
+        self.workers = workers
+        self._bootstrap = {}
+        self._bootstrap_expires = 0.0
+        self._responses = OrderedDict() # registered domain -> (fetched, data), LRU
+        self._inflight = {}  # registered domain -> Event of the lookup in progress
+        self._lock = threading.Lock()
+        self._bootstrap_lock = threading.Lock()
+        self._bootstrap_refresh = threading.Lock() # Held by the one caller (re)loading the bootstrap
+
+    def analyze(self, url: str, deadline: Deadline = None) -> List[DetectionResult]:
+        deadline = deadline or Deadline()
+        domain = urlparse(url if '://' in url else 'https://' + url).hostname or ''
+        return self._parse(self.lookup(registered_domain(domain), deadline))
+
+    def analyze_many(self, urls: Iterable[str], deadline: Deadline = None) -> Dict[str, List[DetectionResult]]:
+        # Hosts under the same registrable domain share a single RDAP query
+        deadline = deadline or Deadline()
+        by_domain = {}
+        for url in urls:
+            domain = urlparse(url if '://' in url else 'https://' + url).hostname or ''
+            by_domain.setdefault(registered_domain(domain), []).append(url)
+
+        results = {url: [] for group in by_domain.values() for url in group}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            future_to_domain = {executor.submit(self.lookup, domain, deadline): domain for domain in by_domain}
+            for future in deadline.as_completed(executor, future_to_domain):
+                for url in by_domain[future_to_domain[future]]:
+                    results[url] = self._parse(future.result())
+        return results
+
+    def lookup(self, domain: str, deadline: Deadline = None) -> Optional[dict]:
+        deadline = deadline or Deadline()
+        if not domain:
+            return None
+
+        cached = self._cached(domain)
+        if cached is not None:
+            return cached
+
+        # Concurrent callers for the same domain wait for the first one instead of querying again
+        with self._lock:
+            event = self._inflight.get(domain)
+            owner = event is None
+            if owner:
+                event = self._inflight[domain] = threading.Event()
+        if not owner:
+            event.wait(deadline.timeout(10))
+            return self._cached(domain)
+
+        try:
+            data = self._query(domain, deadline)
+            if data is not None:
+                self._store(domain, data)
+            return data
+        finally:
+            with self._lock:
+                del self._inflight[domain]
+            event.set()
+
+    def _query(self, domain: str, deadline: Deadline) -> Optional[dict]:
+        if deadline.expired():
+            return None
+        base = self.server_for(domain, deadline) or self.FALLBACK_URL
         try:
-            domain = urlparse(url).netloc
-            if ":" in domain:
-                domain = domain.split(":")[0]
-            
-            # Use rdap.org as a bootstrap/proxy or query IANA/Regional RIRs
-            # rdap.org is a reliable open redirector
-            rdap_url = f"https://rdap.org/domain/{domain}"
-            
-            resp = requests.get(rdap_url, headers=HEADERS, timeout=5)
+            resp = requests.get(f"{base.rstrip('/')}/domain/{domain}", headers=HEADERS, timeout=deadline.timeout(5))
             if resp.status_code == 200:
-                data = resp.json()
-                
-                # 1. Registrar
-                registrar = "Unknown"
-                if 'entities' in data:
-                    for entity in data['entities']:
-                        if 'roles' in entity and 'registrar' in entity['roles']:
-                            if 'vcardArray' in entity and len(entity['vcardArray']) > 1:
-                                # Parse vcard junk: ['vcard', [['version', {}, 'text', '4.0'], ['fn', {}, 'text', 'Name']]]
-                                for item in entity['vcardArray'][1]:
-                                    if item[0] == 'fn':
-                                        registrar = item[3]
-                                        break
-                
-                if registrar != "Unknown":
-                    results.append(DetectionResult(
-                        technology=f"Registrar: {registrar}",
-                        category="Domain Intelligence",
-                        confidence=100,
-                        evidence="RDAP Query"
-                    ))
-                
-                # 2. Dates
-                if 'events' in data:
-                    for event in data['events']:
-                        action = event.get('eventAction')
-                        date = event.get('eventDate')
-                        if action == 'registration':
-                            results.append(DetectionResult(
-                                technology=f"Registered: {date[:10]}",
-                                category="Domain Intelligence",
-                                confidence=100,
-                                evidence="RDAP Registration Date"
-                            ))
-                        elif action == 'expiration':
-                             results.append(DetectionResult(
-                                technology=f"Expires: {date[:10]}",
-                                category="Domain Intelligence",
-                                confidence=100,
-                                evidence="RDAP Expiration Date"
-                            ))
+                return resp.json()
+        except Exception:
+            pass
+        return None
 
+    def server_for(self, domain: str, deadline: Deadline = None) -> Optional[str]:
+        bootstrap = self._load_bootstrap(deadline or Deadline())
+        labels = domain.lower().split('.')
+        # Longest matching suffix wins (the bootstrap also lists multi-label entries)
+        for i in range(len(labels)):
+            server = bootstrap.get('.'.join(labels[i:]))
+            if server:
+                return server
+        return None
+
+    def _load_bootstrap(self, deadline: Deadline) -> Dict[str, str]:
+        # Reloaded once bootstrap_ttl has passed (the service runs for weeks); an empty result is
+        # never kept. The download runs outside _bootstrap_lock: while one caller refreshes, the
+        # others keep using the current map, and only callers without any map wait for it.
+        with self._bootstrap_lock:
+            if self._bootstrap and time.time() < self._bootstrap_expires:
+                return self._bootstrap
+        if self._bootstrap:
+            if not self._bootstrap_refresh.acquire(blocking=False):
+                return self._bootstrap
+        elif not self._bootstrap_refresh.acquire(timeout=deadline.timeout(10)):
+            return {}
+        try:
+            with self._bootstrap_lock:
+                if self._bootstrap and time.time() < self._bootstrap_expires:
+                    return self._bootstrap
+            bootstrap, expires = self._read_bootstrap(deadline)
+            with self._bootstrap_lock:
+                if bootstrap:
+                    self._bootstrap, self._bootstrap_expires = bootstrap, expires
+                return self._bootstrap
+        finally:
+            self._bootstrap_refresh.release()
+
+    def _read_bootstrap(self, deadline: Deadline) -> Tuple[Dict[str, str], float]:
+        # (TLD -> server, when to reload it)
+        path = os.path.join(self.cache_dir, 'dns.json')
+        raw = None
+        expires = 0.0
+        try:
+            mtime = os.path.getmtime(path)
+            if time.time() - mtime < self.bootstrap_ttl:
+                with open(path, 'r') as f:
+                    raw = json.load(f)
+                expires = mtime + self.bootstrap_ttl
+        except (OSError, ValueError):
+            pass
+
+        if raw is None and not deadline.expired():
+            try:
+                resp = requests.get(self.BOOTSTRAP_URL, headers=HEADERS, timeout=deadline.timeout(5))
+                if resp.status_code == 200:
+                    raw = resp.json()
+                    expires = time.time() + self.bootstrap_ttl
+                    self._write(path, raw)
+            except Exception:
+                pass
+
+        if raw is None:
+            # Offline: a stale bootstrap beats none at all, until the next retry
+            try:
+                with open(path, 'r') as f:
+                    raw = json.load(f)
+                expires = time.time() + self.BOOTSTRAP_RETRY
+            except (OSError, ValueError):
+                raw = {}
+
+        bootstrap = {}
+        for tlds, servers in raw.get('services', []):
+            https = [s for s in servers if s.startswith('https://')] or servers
+            for tld in tlds:
+                bootstrap[tld.lower()] = https[0]
+        return bootstrap, expires
+
+    def _cached(self, domain: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._responses.get(domain)
+            if entry is not None:
+                self._responses.move_to_end(domain)
+        if entry is None:
+            try:
+                with open(self._path(domain), 'r') as f:
+                    entry = tuple(json.load(f))
+            except (OSError, ValueError, TypeError):
+                return None
+            self._remember(domain, entry)
+        fetched, data = entry
+        return data if time.time() - fetched < self.ttl else None
+
+    def _store(self, domain: str, data: dict):
+        entry = (time.time(), data)
+        self._remember(domain, entry)
+        self._write(self._path(domain), list(entry))
+
+    def _remember(self, domain: str, entry: tuple):
+        with self._lock:
+            self._responses[domain] = entry
+            self._responses.move_to_end(domain)
+            while len(self._responses) > self.RESPONSE_CACHE_SIZE:
+                self._responses.popitem(last=False)
+
+    def _path(self, domain: str) -> str:
+        return os.path.join(self.cache_dir, 'domains', re.sub(r'[^A-Za-z0-9._-]', '_', domain) + '.json')
+
+    def _write(self, path: str, payload):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def _parse(self, data: Optional[dict]) -> List[DetectionResult]:
+        results = []
+        if not data:
+            return results
+        try:
+            # 1. Registrar
+            registrar = "Unknown"
+            if 'entities' in data:
+                for entity in data['entities']:
+                    if 'roles' in entity and 'registrar' in entity['roles']:
+                        if 'vcardArray' in entity and len(entity['vcardArray']) > 1:
+                            # Parse vcard junk: ['vcard', [['version', {}, 'text', '4.0'], ['fn', {}, 'text', 'Name']]]
+                            for item in entity['vcardArray'][1]:
+                                if item[0] == 'fn':
+                                    registrar = item[3]
+                                    break
+
+            if registrar != "Unknown":
+                results.append(DetectionResult(
+                    technology=f"Registrar: {registrar}",
+                    category="Domain Intelligence",
+                    confidence=100,
+                    evidence="RDAP Query"
+                ))
+
+            # 2. Dates
+            if 'events' in data:
+                for event in data['events']:
+                    action = event.get('eventAction')
+                    date = event.get('eventDate')
+                    if action == 'registration':
+                        results.append(DetectionResult(
+                            technology=f"Registered: {date[:10]}",
+                            category="Domain Intelligence",
+                            confidence=100,
+                            evidence="RDAP Registration Date"
+                        ))
+                    elif action == 'expiration':
+                         results.append(DetectionResult(
+                            technology=f"Expires: {date[:10]}",
+                            category="Domain Intelligence",
+                            confidence=100,
+                            evidence="RDAP Expiration Date"
+                        ))
         except Exception:
             pass
-            
+
         return results
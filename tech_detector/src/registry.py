@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, Set, Tuple
+
+# Cost classes: what running a module does to the target
+PASSIVE = 'passive' # Normal browsing / third-party lookups
+ACTIVE = 'active'   # Probes the target beyond a regular visit (ports, fuzzing, brute-force)
+CRAWL = 'crawl'     # Follows links and sitemaps to additional pages
+
+@dataclass(frozen=True)
+class ModuleSpec:
+    name: str
+    cost: str
+    attr: str = ""      # Scanner attribute holding the instance (empty: created per scan)
+    module: str = ""    # Submodule of src/ that defines the class
+    cls: str = ""
+    depends: Tuple[str, ...] = ()
+    description: str = ""
+
+MODULES: Dict[str, ModuleSpec] = {spec.name: spec for spec in [
+    # Page content
+    ModuleSpec('fetch', PASSIVE, 'fetcher', 'fetcher', 'Fetcher', (), "Fetch the page, its scripts, favicon and well-known paths"),
+    ModuleSpec('tech', PASSIVE, 'engine', 'rules_engine', 'RulesEngine', ('fetch',), "Technology fingerprinting"),
+    ModuleSpec('headers', PASSIVE, 'sec_auditor', 'security_auditor', 'SecurityAuditor', ('fetch',), "Security header grade"),
+    ModuleSpec('secrets', PASSIVE, 'secret_scanner', 'secret_scanner', 'SecretScanner', ('fetch',), "Leaked keys and tokens in HTML/JS"),
+    ModuleSpec('context', PASSIVE, 'context_analyzer', 'context_analyzer', 'ContextAnalyzer', ('fetch',), "Site category from page text"),
+    ModuleSpec('waf', PASSIVE, 'waf_detector', 'waf_detector', 'WAFDetector', ('fetch',), "WAF / firewall detection"),
+    ModuleSpec('osint', PASSIVE, 'osint_collector', 'osint_collector', 'OSINTCollector', ('fetch',), "Emails and social profiles"),
+    ModuleSpec('vulns', PASSIVE, 'sec_auditor', 'security_auditor', 'SecurityAuditor', (), "CVE correlation of detected versions"),
+
+    # Infrastructure
+    ModuleSpec('geoip', PASSIVE, 'geoip', 'geoip_analyzer', 'GeoIPAnalyzer', (), "IP, location and ISP"),
+    ModuleSpec('rdap', PASSIVE, 'rdap_client', 'rdap_client', 'RDAPClient', (), "Registrar and domain dates"),
+    ModuleSpec('ssl', PASSIVE, 'ssl_inspector', 'ssl_inspector', 'SSLInspector', (), "TLS certificate issuer"),
+    ModuleSpec('dns', PASSIVE, 'dns_intel', 'dns_intelligence', 'DNSIntelligence', (), "DNS records: mail, SPF/DMARC, name server, CDN and CA providers"),
+
+    # Active recon
+    ModuleSpec('subdomains', ACTIVE, 'sub_scanner', 'subdomain_scanner', 'SubdomainScanner', (), "Subdomain enumeration and takeover check"),
+    ModuleSpec('ports', ACTIVE, 'port_scanner', 'port_scanner', 'PortScanner', (), "TCP connect port scan and service detection"),
+    ModuleSpec('robots', ACTIVE, 'robots_intel', 'robots_intel', 'RobotsIntelligence', (), "Hidden paths in robots.txt"),
+    ModuleSpec('errors', ACTIVE, 'error_printer', 'error_fingerprinter', 'ErrorFingerprinter', (), "Server leaks on error pages"),
+    ModuleSpec('api', ACTIVE, 'api_discovery', 'api_discovery', 'APIDiscovery', (), "Exposed API docs and endpoints"),
+    ModuleSpec('files', ACTIVE, 'file_fuzzer', 'file_fuzzer', 'FileFuzzer', (), "Sensitive file fuzzing"),
+    ModuleSpec('cloud', ACTIVE, 'cloud_recon', 'cloud_recon', 'CloudRecon', (), "Cloud storage bucket discovery"),
+
+    # Crawling
+    ModuleSpec('crawl', CRAWL, '', 'crawler', 'Crawler', ('fetch',), "Follow internal links to sub-pages"),
+    ModuleSpec('sitemap', CRAWL, '', 'sitemap_parser', 'SitemapParser', ('crawl',), "Seed the crawl from sitemap.xml"),
+]}
+
+def resolve_modules(modules: Iterable[str] = None, skip: Iterable[str] = None,
+                    passive_mode=False, deep_scan=True) -> Set[str]:
+    modules = list(modules or [])
+    skip = set(skip or [])
+    unknown = [name for name in modules + list(skip) if name not in MODULES]
+    if unknown:
+        raise ValueError(f"Unknown module(s): {', '.join(unknown)}. Available: {', '.join(MODULES)}")
+
+    if modules:
+        selected = set(modules)
+    else:
+        # Default selection follows the classic toggles
+        selected = {name for name, spec in MODULES.items() if spec.cost != CRAWL or deep_scan}
+
+    # Passive mode is a safety switch: it removes active modules even when asked for explicitly
+    if passive_mode:
+        selected = {name for name in selected if MODULES[name].cost != ACTIVE}
+
+    # Pull in dependencies, then drop anything whose dependency was skipped
+    pending = list(selected)
+    while pending:
+        for dep in MODULES[pending.pop()].depends:
+            if dep not in selected:
+                selected.add(dep)
+                pending.append(dep)
+
+    changed = True
+    while changed:
+        changed = False
+        for name in list(selected):
+            if name in skip or any(dep not in selected for dep in MODULES[name].depends):
+                selected.discard(name)
+                changed = True
+
+    return selected
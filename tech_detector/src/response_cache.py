@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict
+
+class ResponseCache:
+    # Scan-scoped HTTP response cache keyed by (method, absolute URL). The fetcher, its per-page probes
+    # and the recon modules all ask for /robots.txt, /sitemap.xml, /graphql...; with one instance per
+    # scan each URL goes over the wire once, and a request already in flight is waited for, not repeated.
+    # requests-like: cache.get(url, **kwargs) / cache.head(url, **kwargs), plus session= to send through
+    # a configured session. Streamed requests bypass the cache (their body is read incrementally), and so
+    # do requests with other than the method's usual redirect handling (GET follows, HEAD doesn't).
+    # Other kwargs are not part of the key: whoever asks for a URL first decides the headers it is
+    # fetched with, and later callers get that response.
+    MAX_BODY = 5 << 20 # Larger bodies are returned but not kept
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.requests = 0 # Sent over the wire
+        self.hits = 0     # Answered from the cache
+        self._responses = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url: str, **kwargs):
+        kwargs.setdefault('allow_redirects', False)
+        return self.request('HEAD', url, **kwargs)
+
+    def cached(self, method: str, url: str):
+        # The stored response, without sending anything
+        with self._lock:
+            return self._responses.get((method.upper(), url))
+
+    def request(self, method: str, url: str, session=None, **kwargs):
+        import requests
+        sender = session or requests
+        follows = method.upper() != 'HEAD'
+        if kwargs.get('stream') or kwargs.get('allow_redirects', follows) != follows:
+            with self._lock:
+                self.requests += 1
+            return sender.request(method, url, **kwargs)
+
+        key = (method.upper(), url)
+        with self._lock:
+            response = self._responses.get(key)
+            if response is not None:
+                self._responses.move_to_end(key)
+                self.hits += 1
+                return response
+            pending = self._inflight.get(key)
+            if pending is None:
+                self._inflight[key] = threading.Event()
+
+        if pending is not None:
+            timeout = kwargs.get('timeout')
+            pending.wait(timeout if isinstance(timeout, (int, float)) else None)
+            with self._lock:
+                response = self._responses.get(key)
+                if response is not None:
+                    self.hits += 1
+                    return response
+                # The first request failed (or is still running past our timeout): try on our own
+                self.requests += 1
+            return sender.request(method, url, **kwargs)
+
+        try:
+            with self._lock:
+                self.requests += 1
+            response = sender.request(method, url, **kwargs)
+            if len(response.content) <= self.MAX_BODY:
+                with self._lock:
+                    self._responses[key] = response
+                    while len(self._responses) > self.max_entries:
+                        self._responses.popitem(last=False)
+            return response
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
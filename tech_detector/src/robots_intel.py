@@ -1,19 +1,23 @@
 import requests
 from urllib.parse import urljoin
 from .utils import DetectionResult
+from .deadline import Deadline
 
 class RobotsIntelligence:
-    def analyze(self, url: str) -> list[DetectionResult]:
+    def analyze(self, url: str, deadline: Deadline = None, cache=None) -> list[DetectionResult]:
+        deadline = deadline or Deadline()
         robots_url = urljoin(url, "/robots.txt")
         results = []
         hidden_paths = []
         
         try:
+            if deadline.expired():
+                return results
             # Use a basic fetch (or pass fetcher)
             HEADERS = {
                 'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
             }
-            resp = requests.get(robots_url, headers=HEADERS, timeout=5, verify=False)
+            resp = (cache or requests).get(robots_url, headers=HEADERS, timeout=deadline.timeout(5), verify=False)
             if resp.status_code == 200:
                 lines = resp.text.splitlines()
                 for line in lines:
@@ -1,152 +1,200 @@
-import re
-import json
-import os
-from typing import List, Dict, Any
-from .utils import SiteData, DetectionResult
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+from .utils import SiteData, DetectionResult, content_hash
+from .fingerprint_db import FingerprintDB
+from .library_hashes import LibraryHashIndex
+from .favicon_db import FaviconHashIndex
 
 class RulesEngine:
-    def __init__(self, fingerprints_path: str):
-        with open(fingerprints_path, 'r') as f:
-            self.data = json.load(f)
-        self.technologies = self.data.get('technologies', [])
-        # self.categories is no longer needed as category name is embedded
+    ICON_CACHE_SIZE = 4096
+
+    def __init__(self, fingerprints_path: str, evidence_types: List[str] = None, library_hashes_path: str = None,
+                 favicon_db_paths: List[str] = None):
+        # fingerprints_path: a fingerprints JSON file or a directory of shards (see fingerprint_db)
+        self.db = FingerprintDB(fingerprints_path, evidence_types)
+        self.libraries = LibraryHashIndex(library_hashes_path)
+        self.favicons = FaviconHashIndex(favicon_db_paths)
+        # Changes whenever the rule set does; cached analysis is only valid for the same rules
+        self.signature = content_hash(self.db.signature + self.libraries.signature + self.favicons.signature)
+
+        # Favicon hash -> matches, shared by every page and target this engine sees (crawls and batch
+        # scans keep meeting the same few icons)
+        self._icon_matches = OrderedDict()
+        self._icon_lock = threading.Lock()
+
+    def preload(self):
+        self.libraries.preload()
+        self.favicons.preload()
+        return self.db.preload()
 
     def analyze(self, site_data: SiteData) -> List[DetectionResult]:
+        # Only evidence this page actually has is looked at (and only its shards are loaded);
+        # within a type, the index narrows rules down by header/cookie/meta name, icon hash or probe path
+        available = [etype for etype, present in (
+            ('headers', site_data.headers), ('cookies', site_data.cookies), ('meta', site_data.meta_tags),
+            ('html', site_data.html), ('script_src', site_data.scripts), ('js', site_data.js_bundles),
+            ('icon_hash', site_data.favicon_hash), ('probe', site_data.probe_content)) if present]
+        index = self.db.ensure(available)
+        found = {} # technology -> [(seq, points, evidence, version)]
+        known = {} # technology -> (category, exact version) from the library and favicon hash indexes
+
+        def hit(seq, tech, points, evidence, match=None):
+            found.setdefault(tech, []).append((seq, points, evidence, self._version(match) if match is not None else None))
+
+        def search(regex, group, source, text, lowered):
+            if regex is None:
+                return source.lower() in lowered, None
+            match = regex.search(text)
+            return match is not None, (match, group)
+
+        # 1. Check Headers
+        for h_key, site_header_val in site_data.headers.items():
+            if not site_header_val:
+                continue
+            lowered = site_header_val.lower()
+            for seq, tech, key, regex, group, source in index['headers'].get(h_key.lower(), []):
+                matched, match = search(regex, group, source, site_header_val, lowered)
+                if matched:
+                    hit(seq, tech, 50, f"Header: {key}", match)
+
+        # 2. Check Cookies
+        for c_key in site_data.cookies:
+            for seq, tech in index['cookies'].get(c_key, []):
+                hit(seq, tech, 50, f"Cookie: {c_key}")
+
+        # 3. Check Meta Tags
+        for m_key, val in site_data.meta_tags.items():
+            lowered = (val or '').lower()
+            for seq, tech, key, regex, group, source in index['meta'].get(m_key.lower(), []):
+                matched, match = search(regex, group, source, val or '', lowered)
+                if matched:
+                    hit(seq, tech, 60, f"Meta: {key}", match)
+
+        # 4. Check HTML
+        if site_data.html:
+            lowered = site_data.html.lower()
+            for seq, tech, regex, group, source in index['html']:
+                matched, match = search(regex, group, source, site_data.html, lowered)
+                if matched:
+                    hit(seq, tech, 40, f"HTML Pattern: {source[:20]}...", match)
+
+        # 5. Check Script Src (one hit per pattern, whichever script matches first)
+        scripts = [(script_url, script_url.lower()) for script_url in site_data.scripts]
+        for seq, tech, regex, group, source in index['script_src']:
+            for script_url, lowered in scripts:
+                matched, match = search(regex, group, source, script_url, lowered)
+                if matched:
+                    hit(seq, tech, 50, f"Script: {source}", match)
+                    break
+
+        # 6. Known library releases by content hash: one lookup per bundle, exact version, and the
+        # stock library file needs no pattern scan
+        bundles = []
+        js_found = set()
+        for bundle_url, bundle_content in site_data.js_bundles.items():
+            library = self.libraries.lookup(bundle_content)
+            if library is None:
+                bundles.append(bundle_content)
+                continue
+            tech, category, versions = library
+            file_name = bundle_url.rstrip('/').rsplit('/', 1)[-1].split('?', 1)[0]
+            if len(versions) == 1:
+                hit(0, tech, 100, f"JS Bundle Hash: {file_name}")
+                known.setdefault(tech, (category, versions[0]))
+            else:
+                # A file shipped unchanged by several releases pins no single version (the list is sorted)
+                hit(0, tech, 100, f"JS Bundle Hash: {file_name} ({versions[0]}–{versions[-1]})")
+                known.setdefault(tech, (category, None))
+            js_found.add(tech)
+
+        # 7. Check JS Global Variables / Content in Bundles (one hit per technology)
+        for seq, tech, regex, group, source in index['js']:
+            if tech in js_found:
+                continue
+            for bundle_content in bundles:
+                if regex is None:
+                    matched, match = source in bundle_content, None
+                else:
+                    result = regex.search(bundle_content)
+                    matched, match = result is not None, (result, group)
+                if matched:
+                    hit(seq, tech, 80, f"JS Bundle Pattern: {source}", match)
+                    js_found.add(tech)
+                    break
+
+        # 8. Check Favicon Hash
+        if site_data.favicon_hash:
+            for seq, tech, evidence, category in self._icon_matches_for(site_data.favicon_hash, index):
+                hit(seq, tech, 100, evidence)
+                if category:
+                    known.setdefault(tech, (category, None))
+
+        # 9. Check Probes
+        for path, content in site_data.probe_content.items():
+            if not content:
+                continue
+            for seq, tech, keyword in index['probe'].get(path, []):
+                if keyword in content:
+                    hit(seq, tech, 100, f"Probe {path} confirmed")
+
         results = []
-        
-        for rule in self.technologies:
-            tech_name = rule.get('name')
-            confidence = 0
-            evidence = []
-            version = None
-
-            # Helper to update version if found
-            def update_version(match):
-                nonlocal version
-                if match and match.groups():
-                    version = match.group(1)
-
-            # 1. Check Headers
-            if 'headers' in rule:
-                for h_key, h_pattern in rule['headers'].items():
-                    # Case insensitive header search
-                    site_header_val = next((v for k, v in site_data.headers.items() if k.lower() == h_key.lower()), None)
-                    if site_header_val:
-                        if h_pattern == "":
-                            confidence += 50
-                            evidence.append(f"Header: {h_key}")
-                        else:
-                            match = re.search(h_pattern, site_header_val, re.IGNORECASE)
-                            if match:
-                                confidence += 50
-                                evidence.append(f"Header: {h_key}")
-                                update_version(match)
-
-            # 2. Check Cookies
-            if 'cookies' in rule:
-                for c_key, c_pattern in rule['cookies'].items():
-                    if c_key in site_data.cookies:
-                        confidence += 50
-                        evidence.append(f"Cookie: {c_key}")
-
-            # 3. Check Meta Tags
-            if 'meta' in rule:
-                for m_key, m_pattern in rule['meta'].items():
-                    if m_key.lower() in site_data.meta_tags:
-                        val = site_data.meta_tags[m_key.lower()]
-                        match = re.search(m_pattern, val, re.IGNORECASE)
-                        if match:
-                            confidence += 60
-                            evidence.append(f"Meta: {m_key}")
-                            update_version(match)
-
-            # 4. Check HTML
-            if 'html' in rule: 
-                for pattern in rule['html']:
-                    try:
-                        match = re.search(pattern, site_data.html, re.IGNORECASE)
-                        if match:
-                            confidence += 40
-                            evidence.append(f"HTML Pattern: {pattern[:20]}...")
-                            update_version(match)
-                    except re.error:
-                        pass # Skip invalid regex
-
-            # 5. Check Script Src
-            if 'script_src' in rule:
-                for pattern in rule['script_src']:
-                    for script_url in site_data.scripts:
-                        try:
-                            match = re.search(pattern, script_url, re.IGNORECASE)
-                            if match:
-                                confidence += 50
-                                evidence.append(f"Script: {pattern}")
-                                update_version(match)
-                                break
-                        except re.error:
-                            pass
-
-            # 6. Check JS Global Variables / Content in Bundles
-            if 'js' in rule:
-                for pattern in rule['js']: 
-                    # Check in downloaded bundles
-                    found_in_bundle = False
-                    for bundle_content in site_data.js_bundles.values():
-                        try:
-                            match = re.search(pattern, bundle_content)
-                            if match:
-                                confidence += 80
-                                found_in_bundle = True
-                                evidence.append(f"JS Bundle Pattern: {pattern}")
-                                update_version(match)
-                                break
-                        except re.error:
-                            pass
-                    if found_in_bundle: 
-                        break
-
-            # 7. Check Favicon Hash
-            if 'icon_hash' in rule and site_data.favicon_hash:
-                if str(site_data.favicon_hash) == str(rule['icon_hash']):
-                    confidence += 100
-                    evidence.append("Favicon Hash Match")
-
-            # 8. Check Probes
-            if 'probe' in rule:
-                for path, keyword in rule['probe'].items():
-                    content = site_data.probe_content.get(path, "")
-                    if content and keyword in content:
-                        confidence += 100
-                        evidence.append(f"Probe {path} confirmed")
-
-            if confidence > 0:
-                confidence = min(confidence, 100)
-                cat_name = rule.get('category', "Unknown")
-                
-                results.append(DetectionResult(
-                    technology=tech_name,
-                    category=cat_name,
-                    confidence=confidence,
-                    evidence=", ".join(evidence),
-                    version=version
-                ))
+        for tech in sorted(found, key=self.db.order):
+            # Evidence in rule order; the last pattern that captured a version wins
+            hits = sorted(found[tech], key=lambda h: h[0])
+            versions = [h[3] for h in hits if h[3]]
+            category, exact_version = known.get(tech, ("Unknown", None))
+            results.append(DetectionResult(
+                technology=tech,
+                category=self.db.technologies.get(tech, {}).get('category', category),
+                confidence=min(sum(h[1] for h in hits), 100),
+                evidence=", ".join(h[2] for h in hits),
+                version=exact_version or (versions[-1] if versions else None)
+            ))
 
         # Handle 'implies'
         self._process_implications(results)
         
         return results
 
+    def _icon_matches_for(self, favicon_hash, index) -> List[tuple]:
+        # Fingerprint rules first, then the external datasets for icons no rule knows
+        key = str(favicon_hash)
+        with self._icon_lock:
+            if key in self._icon_matches:
+                self._icon_matches.move_to_end(key)
+                return self._icon_matches[key]
+
+        matches = [(seq, tech, "Favicon Hash Match", None) for seq, tech in index['icon_hash'].get(key, [])]
+        external = self.favicons.lookup(key)
+        if external and external[0] not in {m[1] for m in matches}:
+            tech, category = external
+            # Sorts after every rule hit
+            matches.append((float('inf'), tech, "Favicon Hash Match (dataset)", category or None))
+
+        with self._icon_lock:
+            self._icon_matches[key] = matches
+            while len(self._icon_matches) > self.ICON_CACHE_SIZE:
+                self._icon_matches.popitem(last=False)
+        return matches
+
+    def _version(self, match) -> Optional[str]:
+        match, group = match
+        if match and match.re.groups >= group > 0:
+            return match.group(group)
+        return None
+
     def _process_implications(self, results: List[DetectionResult]):
         # Simple pass to add implied techs
         existing_techs = {r.technology for r in results}
         new_results = []
         
-        # Create a lookup for rules by name
-        rules_by_name = {r['name']: r for r in self.technologies}
+        # Technology metadata (category, implies) is known for every shard, loaded or not
+        rules_by_name = self.db.technologies
         
         for res in results:
             tech_rule = rules_by_name.get(res.technology)
-            if tech_rule and 'imply' in tech_rule: # Changed from implies to imply based on JSON
+            if tech_rule and tech_rule.get('imply'):
                 for implied in tech_rule['imply']:
                     if implied not in existing_techs:
                         implied_rule = rules_by_name.get(implied)
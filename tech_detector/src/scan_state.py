@@ -0,0 +1,90 @@
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import asdict
+from typing import Dict, List, Optional
+from .utils import DetectionResult, SiteData, CACHE_DIR, content_hash
+
+# Headers whose values change on every response; only their presence counts. A header whose
+# value a fingerprint rule matches (x-served-by: Squarespace) must not be listed here.
+VOLATILE_HEADERS = {
+    'date', 'age', 'expires', 'last-modified', 'etag', 'set-cookie', 'content-length',
+    'cf-ray', 'x-request-id', 'x-amz-cf-id', 'x-amzn-requestid', 'x-amz-id-2',
+    'x-runtime', 'server-timing', 'report-to', 'nel', 'x-timer'
+}
+
+def header_signature(headers: Dict[str, str]) -> str:
+    items = sorted((k.lower(), '' if k.lower() in VOLATILE_HEADERS else v) for k, v in headers.items())
+    return content_hash(json.dumps(items))
+
+def results_to_dicts(results: List[DetectionResult]) -> List[dict]:
+    return [asdict(r) for r in results]
+
+def results_from_dicts(items: List[dict]) -> List[DetectionResult]:
+    return [DetectionResult(**item) for item in items]
+
+class ScanStateStore:
+    def __init__(self, state_dir: str = None):
+        self.state_dir = state_dir or os.path.join(CACHE_DIR, 'state')
+
+    def _path(self, target: str) -> str:
+        safe_name = re.sub(r'[^A-Za-z0-9._-]', '_', target)
+        return os.path.join(self.state_dir, f"{safe_name}.json")
+
+    def load(self, target: str) -> dict:
+        try:
+            with open(self._path(target), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, target: str, state: dict):
+        os.makedirs(self.state_dir, exist_ok=True)
+        state['updated'] = int(time.time())
+        # Write then rename so a crash mid-write never leaves a truncated state file; the temp name is
+        # per writer, as service jobs for the same target can save at the same time
+        tmp_path = f"{self._path(target)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._path(target))
+
+# Analyzer outputs for one page, keyed by fingerprints of the inputs each analyzer reads
+class PageState:
+    def __init__(self, data: SiteData, previous: Optional[dict], analyzer_versions: Dict[str, str]):
+        self.previous = previous or {}
+        page_hash = content_hash(data.html)
+        bundle_hashes = {url: content_hash(body) for url, body in data.js_bundles.items()}
+        probe_hashes = {path: content_hash(body) for path, body in data.probe_content.items()}
+        headers_sig = header_signature(data.headers)
+
+        self.current = {
+            'page_hash': page_hash,
+            'bundle_hashes': bundle_hashes,
+            'header_signature': headers_sig,
+            'analysis': {}
+        }
+        self.keys = {
+            'engine': content_hash(json.dumps([
+                analyzer_versions.get('engine'), page_hash, headers_sig, sorted(data.cookies),
+                sorted(bundle_hashes.items()), data.favicon_hash, sorted(probe_hashes.items())
+            ])),
+            'secrets': content_hash(json.dumps([
+                analyzer_versions.get('secrets'), page_hash, sorted(bundle_hashes.items())
+            ])),
+            'context': content_hash(json.dumps([analyzer_versions.get('context'), page_hash]))
+        }
+
+    def cached(self, analyzer: str) -> Optional[List[DetectionResult]]:
+        entry = self.previous.get('analysis', {}).get(analyzer)
+        if entry and entry.get('key') == self.keys[analyzer]:
+            self.current['analysis'][analyzer] = entry
+            self.current.setdefault('reused', True)
+            return results_from_dicts(entry['results'])
+        return None
+
+    def store(self, analyzer: str, results: List[DetectionResult]):
+        # Serialize right away: merged results are mutated in place later on
+        self.current['analysis'][analyzer] = {'key': self.keys[analyzer], 'results': results_to_dicts(results)}
+        self.current['reused'] = False
@@ -1,182 +1,234 @@
-from .fetcher import Fetcher
-from .rules_engine import RulesEngine
-from .crawler import Crawler
-from .reporter import Reporter
-from .sitemap_parser import SitemapParser
-from .ssl_inspector import SSLInspector
-from .dns_intelligence import DNSIntelligence
-from .security_auditor import SecurityAuditor
-from .subdomain_scanner import SubdomainScanner
-from .port_scanner import PortScanner
-from .robots_intel import RobotsIntelligence
-from .error_fingerprinter import ErrorFingerprinter
-from .geoip_analyzer import GeoIPAnalyzer
-from .secret_scanner import SecretScanner
-from .api_discovery import APIDiscovery
-from .file_fuzzer import FileFuzzer
-from .rdap_client import RDAPClient
-from .context_analyzer import ContextAnalyzer
-from .waf_detector import WAFDetector
-from .osint_collector import OSINTCollector
-from .cloud_recon import CloudRecon
-from .utils import DetectionResult, SiteData
+from .registry import MODULES, ACTIVE, resolve_modules
+from .utils import DetectionResult, SiteData, content_hash
+from .scan_state import ScanStateStore, PageState, results_to_dicts
+from .deadline import Deadline
+from .response_cache import ResponseCache
+from .soft404 import Soft404Baseline
+import importlib
 import json
 import os
-from typing import List, Dict
+import threading
+from typing import List, Dict, Optional
+from urllib.parse import urlparse
 import concurrent.futures
 
 class Scanner:
-    def __init__(self, fingerprints_path=None, proxy=None):
+    # Share of the remaining time budget each phase gets unless given an explicit sub-budget
+    PHASE_SHARES = {'infrastructure': 0.2, 'recon': 0.45, 'content': 0.35}
+
+    def __init__(self, fingerprints_path=None, proxy=None, state_dir=None, asset_cache_size=0,
+                 modules=None, skip=None, module_options=None):
         if fingerprints_path is None:
             base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             fingerprints_path = os.path.join(base_dir, 'data', 'fingerprints.json')
-            
-        self.fetcher = Fetcher(proxy=proxy)
-        self.engine = RulesEngine(fingerprints_path)
-        self.reporter = Reporter()
-        self.ssl_inspector = SSLInspector()
-        self.dns_intel = DNSIntelligence()
-        self.sec_auditor = SecurityAuditor()
-        self.sub_scanner = SubdomainScanner()
-        
-        # reconnaissance modules
-        self.port_scanner = PortScanner()
-        self.robots_intel = RobotsIntelligence()
-        self.error_printer = ErrorFingerprinter()
-        self.geoip = GeoIPAnalyzer()
-        self.secret_scanner = SecretScanner()
-        self.api_discovery = APIDiscovery()
-        self.file_fuzzer = FileFuzzer()
-        self.rdap_client = RDAPClient()
-        self.context_analyzer = ContextAnalyzer()
-        
-        # New Advanced Modules
-        self.waf_detector = WAFDetector()
-        self.osint_collector = OSINTCollector()
-        self.cloud_recon = CloudRecon()
 
-    def scan(self, url: str, deep_scan=False, passive_mode=False, threads=5, generate_report=False, export_csv=False):
+        # Module selection: only the chosen analyzers (plus their dependencies) are built
+        self.modules = list(modules or [])
+        self.skip = list(skip or [])
+        self.module_options = {
+            'fetch': {'proxy': proxy, 'asset_cache_size': asset_cache_size},
+            'tech': {'fingerprints_path': fingerprints_path}
+        }
+        for name, options in (module_options or {}).items():
+            self.module_options.setdefault(name, {}).update(options)
+        self._module_lock = threading.Lock()
+        self._reporter = None
+
+        # Incremental rescans: previous page fingerprints and analyzer outputs per target
+        self.state_store = ScanStateStore(state_dir)
+
+    def __getattr__(self, attr: str):
+        # Analyzer attributes (scanner.fetcher, scanner.engine, ...) are built on first access
+        if not attr.startswith('_'):
+            for name, spec in MODULES.items():
+                if spec.attr == attr:
+                    return self._module(name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{attr}'")
+
+    @property
+    def reporter(self):
+        if self._reporter is None:
+            from .reporter import Reporter
+            self._reporter = Reporter()
+        return self._reporter
+
+    def preload(self):
+        # Build every selected module and load its data now (used by the long-running service)
+        for name in resolve_modules(self.modules, self.skip):
+            if MODULES[name].attr:
+                instance = self._module(name)
+                if hasattr(instance, 'preload'):
+                    instance.preload()
+            else:
+                self._module_class(name)
+
+    def _module_class(self, name: str):
+        spec = MODULES[name]
+        return getattr(importlib.import_module(f".{spec.module}", __package__), spec.cls)
+
+    def _module(self, name: str):
+        # Build a registered analyzer on first use; instances are shared across scans
+        spec = MODULES[name]
+        instance = self.__dict__.get(spec.attr)
+        if instance is None:
+            with self._module_lock:
+                instance = self.__dict__.get(spec.attr)
+                if instance is None:
+                    instance = self._module_class(name)(**self.module_options.get(name, {}))
+                    setattr(self, spec.attr, instance)
+        return instance
+
+    def _analyzer_versions(self, enabled) -> Dict[str, str]:
+        versions = {}
+        if 'tech' in enabled:
+            versions['engine'] = self._module('tech').signature
+        if 'secrets' in enabled:
+            versions['secrets'] = content_hash(json.dumps(self._module('secrets').PATTERNS, sort_keys=True))
+        if 'context' in enabled:
+            versions['context'] = content_hash(json.dumps(self._module('context').CATEGORIES, sort_keys=True))
+        return versions
+
+    def scan(self, url: str, deep_scan=False, passive_mode=False, threads=5, generate_report=False, export_csv=False,
+             time_budget=None, phase_budgets=None, incremental=False, modules=None, skip=None):
         all_results = []
         scanned_urls = []
+        subdomains = set() # Filled by subdomain enumeration, reused to seed bucket names
+
+        # Modules for this run: explicit lists win, otherwise the passive/deep toggles decide
+        enabled = resolve_modules(modules or self.modules, list(skip or []) + self.skip,
+                                  passive_mode=passive_mode, deep_scan=deep_scan)
+        deep_scan = 'crawl' in enabled
+
+        # Previous scan state (only read/written for incremental scans)
+        target = urlparse(url if url.startswith('http') else 'https://' + url).netloc
+        previous_state = self.state_store.load(target) if incremental else None
+        new_state = {'target': target, 'pages': {}} if incremental else None
+        analyzer_versions = self._analyzer_versions(enabled) if incremental else {}
+
+        # One response cache per scan: modules asking for the same URL share a single request
+        cache = ResponseCache()
+        # What each host answers for paths that don't exist, learned once and shared by the path probes
+        soft404 = Soft404Baseline(cache)
+
+        # Time budget: the whole scan shares one deadline, each phase gets a slice of what's left
+        deadline = Deadline(time_budget)
+        phase_budgets = phase_budgets or {}
+        active_enabled = any(MODULES[name].cost == ACTIVE for name in enabled)
+        phases = ['infrastructure'] + (['recon'] if active_enabled else []) + ['content']
+        partial_phases = []
         
-        print(f"[*] Starting Analysis for {url} [Deep={deep_scan}, Passive={passive_mode}, Threads={threads}]...")
+        print(f"[*] Starting Analysis for {url} [Deep={deep_scan}, Passive={passive_mode}, Threads={threads}, Budget={time_budget or 'none'}]...")
+        print(f"[*] Modules: {', '.join(name for name in MODULES if name in enabled)}")
 
         # --- Phase 1: Infrastructure (Always Safe-ish) ---
-        print(f"[*] performing GeoIP & Infrastructure Analysis...")
-        geo_results = self.geoip.analyze(url)
-        self._merge_results(all_results, geo_results)
+        phase = self._phase_deadline(deadline, 'infrastructure', phases, phase_budgets)
+        if 'geoip' in enabled:
+            print(f"[*] performing GeoIP & Infrastructure Analysis...")
+            geo_results = self._module('geoip').analyze(url, phase)
+            self._merge_results(all_results, geo_results)
 
         # RDAP (Domain Info)
-        print(f"[*] Querying Domain Registry (RDAP)...")
-        rdap_results = self.rdap_client.analyze(url)
-        self._merge_results(all_results, rdap_results)
-
-        # SSL Check
-        ssl_info = self.ssl_inspector.inspect(url)
-        if 'issuer_org' in ssl_info:
-             if 'Cloudflare' in ssl_info['issuer_org']:
-                 all_results.append(DetectionResult("Cloudflare", "CDN", 100, "SSL Issuer: Cloudflare"))
-             elif 'Google Trust Services' in ssl_info['issuer_org']:
-                 all_results.append(DetectionResult("Google Cloud", "PaaS", 80, "SSL Issuer: Google Trust Services"))
-             elif 'Let\'s Encrypt' in ssl_info['issuer_org']:
-                 all_results.append(DetectionResult("Let's Encrypt", "SSL/TLS", 100, "SSL Issuer: Let's Encrypt"))
-             elif 'Amazon' in ssl_info['issuer_org']:
-                 all_results.append(DetectionResult("AWS", "PaaS", 80, "SSL Issuer: Amazon"))
+        if 'rdap' in enabled:
+            print(f"[*] Querying Domain Registry (RDAP)...")
+            rdap_results = self._module('rdap').analyze(url, phase)
+            self._merge_results(all_results, rdap_results)
+
+        # SSL Check (when the page is fetched, its own handshake supplies the certificate later on)
+        if 'ssl' in enabled and 'fetch' not in enabled:
+            ssl_info = self._module('ssl').inspect(url, phase)
+            self._apply_tls(ssl_info, target, previous_state, new_state, subdomains, all_results)
 
         # DNS 
-        print(f"[*] Querying DNS Records...")
-        dns_results = self.dns_intel.analyze(url)
-        self._merge_results(all_results, dns_results)
+        if 'dns' in enabled:
+            print(f"[*] Querying DNS Records...")
+            dns_results = self._module('dns').analyze(url, phase)
+            self._merge_results(all_results, dns_results)
+        if phase.expired():
+            partial_phases.append(phase.name)
 
         # --- Phase 2: Active Recon (Skip if Passive) ---
-        if not passive_mode:
+        if active_enabled:
+            phase = self._phase_deadline(deadline, 'recon', phases, phase_budgets)
             # Subdomains (DNS enumeration is semi-passive but can be noisy if bruteforce, here it's simple check)
             # We treat subdomain check as okay-ish but Port/Error are definitely active.
-            print(f"[*] Enumerating Subdomains...")
-            sub_results = self.sub_scanner.scan(url)
-            self._merge_results(all_results, sub_results)
+            if 'subdomains' in enabled:
+                print(f"[*] Enumerating Subdomains...")
+                sub_results = self._module('subdomains').scan(url, phase, found=subdomains)
+                self._merge_results(all_results, sub_results)
+
+                if 'ssl' in enabled and subdomains:
+                    print(f"[*] Inspecting TLS on {len(subdomains)} hosts...")
+                    tls_results = self._tls_summary(self._module('ssl'), subdomains, target, phase)
+                    self._merge_results(all_results, tls_results)
 
-            print(f"[*] Active Port Scanning...")
-            port_results = self.port_scanner.scan(url)
-            self._merge_results(all_results, port_results)
+            if 'ports' in enabled:
+                print(f"[*] Active Port Scanning...")
+                port_results = self._module('ports').scan(url, phase)
+                self._merge_results(all_results, port_results)
             
-            print(f"[*] Analyzing Robots.txt...")
-            robots_results = self.robots_intel.analyze(url)
-            self._merge_results(all_results, robots_results)
+            if 'robots' in enabled:
+                print(f"[*] Analyzing Robots.txt...")
+                robots_results = self._module('robots').analyze(url, phase, cache=cache)
+                self._merge_results(all_results, robots_results)
             
-            print(f"[*] Error Fingerprinting...")
-            error_results = self.error_printer.analyze(url)
-            self._merge_results(all_results, error_results)
+            if 'errors' in enabled:
+                print(f"[*] Error Fingerprinting...")
+                error_results = self._module('errors').analyze(url, phase, cache=cache, soft404=soft404)
+                self._merge_results(all_results, error_results)
             
-            print(f"[*] Discovering API Endpoints...")
-            api_results = self.api_discovery.scan(url)
-            self._merge_results(all_results, api_results)
+            if 'api' in enabled:
+                print(f"[*] Discovering API Endpoints...")
+                api_results = self._module('api').scan(url, phase, cache=cache, soft404=soft404)
+                self._merge_results(all_results, api_results)
             
-            print(f"[*] Fuzzing for Sensitive Files (.env, git, backups)...")
-            file_results = self.file_fuzzer.scan(url)
-            self._merge_results(all_results, file_results)
-
-            print(f"[*] Checking for Cloud Storage Assets (S3/Azure)...")
-            cloud_results = self.cloud_recon.scan(url)
-            self._merge_results(all_results, cloud_results)
-        else:
+            if 'files' in enabled:
+                print(f"[*] Fuzzing for Sensitive Files (.env, git, backups)...")
+                file_results = self._module('files').scan(url, phase, cache=cache, soft404=soft404)
+                self._merge_results(all_results, file_results)
+            if phase.expired():
+                partial_phases.append(phase.name)
+        elif passive_mode:
             print("[*] Passive Mode: Skipping Port Scan, Subdomains, Error Provocation, API, Fuzzing.")
 
         # --- Phase 3: Content Analysis (Crawling) ---
+        phase = self._phase_deadline(deadline, 'content', phases, phase_budgets)
+        data = SiteData(url=url, final_url=url, status_code=0, headers={}, cookies={}, html="")
         if deep_scan:
             print(f"[*] Starting Deep Scan using {threads} threads...")
+            crawler = self._module_class('crawl')(url, max_pages=15)
             
             # Sitemap Intelligence (Safe to do in passive too ideally, just fetching xml)
-            sitemap_parser = SitemapParser(url)
-            sitemap_urls = sitemap_parser.get_urls(limit=10)
-            
-            if sitemap_urls:
-                print(f"[*] Sitemap found {len(sitemap_urls)} priority URLs.")
-            
-            crawler = Crawler(url, max_pages=15) 
-            for sm_url in sitemap_urls:
-                if sm_url not in crawler.visited and sm_url not in crawler.queue:
-                     crawler.queue.append(sm_url)
+            if 'sitemap' in enabled:
+                sitemap_parser = self._module_class('sitemap')(url, cache=cache)
+                sitemap_urls = sitemap_parser.get_urls(limit=10, deadline=phase)
+                
+                if sitemap_urls:
+                    print(f"[*] Sitemap found {len(sitemap_urls)} priority URLs.")
+                
+                for sm_url in sitemap_urls:
+                    if sm_url not in crawler.visited and sm_url not in crawler.queue:
+                         crawler.queue.append(sm_url)
 
             # Fetch Root
             scanned_urls.append(url)
             print(f"[*] Fetching root: {url}")
-            root_data = self.fetcher.fetch(url)
-            root_results = self.engine.analyze(root_data)
-            self._merge_results(all_results, root_results)
-            
-            # Security Audit
-            sec_results = self.sec_auditor.audit(root_data.headers)
-            self._merge_results(all_results, sec_results)
-            
-            # Secret Scanning
-            print("[*] Scanning for Secrets (Keys/Tokens)...")
-            secret_results = self.secret_scanner.scan(root_data)
-            self._merge_results(all_results, secret_results)
+            data = self._module('fetch').fetch(url, phase, cache)
+            root_state = self._page_state(data, previous_state, new_state, analyzer_versions)
+            self._analyze_root(data, enabled, root_state, all_results)
             
-            # WAF Detection
-            waf_results = self.waf_detector.detect(root_data.headers, root_data.cookies)
-            self._merge_results(all_results, waf_results)
-            
-            # OSINT Collection
-            osint_results = self.osint_collector.collect(root_data.html)
-            self._merge_results(all_results, osint_results)
-            
-            # Context Analysis (On Root only usually enough)
-            ctx_result = self.context_analyzer.analyze(root_data)
-            self._merge_results(all_results, [ctx_result])
-            
-            crawler.extract_links(root_data.html, root_data.final_url)
+            crawler.extract_links(data.html, data.final_url)
 
             # Threaded crawling
             def process_url(target_url):
                 # print(f"[*] Thread: {target_url}")
+                if phase.expired():
+                    return None
                 try:
-                    return self.fetcher.fetch(target_url)
+                    return self._module('fetch').fetch(target_url, phase, cache)
                 except Exception:
                     return None
 
-            while len(scanned_urls) < crawler.max_pages:
+            while len(scanned_urls) < crawler.max_pages and not phase.expired():
                 batch = []
                 while len(batch) < threads:
                     next_url = crawler.get_next_url()
@@ -190,49 +242,73 @@ class Scanner:
                 print(f"[*] Processing batch of {len(batch)} URLs...")
                 with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
                     future_to_url = {executor.submit(process_url, u): u for u in batch}
-                    for future in concurrent.futures.as_completed(future_to_url):
+                    for future in phase.as_completed(executor, future_to_url):
                         u = future_to_url[future]
                         try:
-                            data = future.result()
-                            if data:
+                            page_data = future.result()
+                            if page_data:
                                 scanned_urls.append(u)
-                                page_results = self.engine.analyze(data)
-                                self._merge_results(all_results, page_results)
+                                page_state = self._page_state(page_data, previous_state, new_state, analyzer_versions)
+                                if 'tech' in enabled:
+                                    page_results = self._run_analyzer(page_state, 'engine', lambda: self._module('tech').analyze(page_data))
+                                    self._merge_results(all_results, page_results)
                                 
                                 # Scan secrets in subpages
-                                page_secrets = self.secret_scanner.scan(data)
-                                self._merge_results(all_results, page_secrets)
+                                if 'secrets' in enabled:
+                                    page_secrets = self._run_analyzer(page_state, 'secrets', lambda: self._module('secrets').scan(page_data))
+                                    self._merge_results(all_results, page_secrets)
                                 
                                 if len(scanned_urls) < crawler.max_pages:
-                                    crawler.extract_links(data.html, data.final_url)
+                                    crawler.extract_links(page_data.html, page_data.final_url)
                         except Exception:
                             pass
                 
-        else:
+        elif 'fetch' in enabled:
             # Single Page
             print(f"[*] Fetching {url}...")
-            data = self.fetcher.fetch(url)
+            data = self._module('fetch').fetch(url, phase, cache)
             scanned_urls.append(data.final_url)
-            
-            # Security Audit
-            sec_results = self.sec_auditor.audit(data.headers)
-            self._merge_results(all_results, sec_results)
-            
-            # Context Analysis
-            ctx_result = self.context_analyzer.analyze(data)
-            self._merge_results(all_results, [ctx_result])
-            
-            print(f"[*] Analyzing content...")
-            all_results.extend(self.engine.analyze(data)) 
-            
-            print("[*] Scanning for Secrets...")
-            secret_results = self.secret_scanner.scan(data)
-            self._merge_results(all_results, secret_results)
+            page_state = self._page_state(data, previous_state, new_state, analyzer_versions)
+            self._analyze_root(data, enabled, page_state, all_results)
+
+        if 'ssl' in enabled and 'fetch' in enabled:
+            if data.peer_cert:
+                ssl_info = self._module('ssl').describe(data.peer_cert, data.tls_version, data.tls_cipher)
+            else:
+                # Plain-HTTP page (or failed fetch): fall back to a handshake of our own
+                ssl_info = self._module('ssl').inspect(url, phase)
+            self._apply_tls(ssl_info, target, previous_state, new_state, subdomains, all_results)
+
+        # Bucket names are seeded from subdomains and page keywords, so this runs after the root fetch
+        if 'cloud' in enabled:
+            print(f"[*] Checking for Cloud Storage Assets (S3/Azure/GCP)...")
+            cloud = self._module('cloud')
+            cloud_results = cloud.scan(url, phase, subdomains=subdomains, keywords=cloud.page_keywords(data))
+            self._merge_results(all_results, cloud_results)
+
+        if phase.expired():
+            partial_phases.append(phase.name)
 
         # --- Phase: Vulnerability Correlation (New) ---
-        print("[*] Correlating Versions with CVE Database...")
-        vuln_results = self.sec_auditor.check_vulnerabilities(all_results)
-        self._merge_results(all_results, vuln_results)
+        if 'vulns' in enabled:
+            print("[*] Correlating Versions with CVE Database...")
+            vuln_results = self._module('vulns').check_vulnerabilities(all_results)
+            self._merge_results(all_results, vuln_results)
+
+        if partial_phases:
+            print(f"[!] Time budget exhausted during: {', '.join(partial_phases)}. Returning partial results.")
+            # Each phase with the budget it ran out of: its own --phase-budget, else the scan's
+            exhausted = [f"{name} ({phase_budgets[name]:g}s)" if name in phase_budgets else
+                         (f"{name} ({time_budget:g}s total)" if time_budget else name) for name in partial_phases]
+            all_results.append(DetectionResult(
+                technology="Partial Results",
+                category="Scan Status",
+                confidence=100,
+                evidence=f"Time budget exhausted during: {', '.join(exhausted)}"
+            ))
+
+        if cache.hits:
+            print(f"[*] HTTP: {cache.requests} requests sent, {cache.hits} answered from the scan cache.")
 
         # --- Phase 4: Reporting ---
         all_results.sort(key=lambda x: x.confidence, reverse=True)
@@ -246,6 +322,12 @@ class Scanner:
                  unique_results.append(r)
         
         all_results = unique_results
+
+        if incremental:
+            reused = sum(1 for page in new_state['pages'].values() if page.pop('reused', False))
+            print(f"[*] Incremental: reused analysis for {reused}/{len(new_state['pages'])} pages.")
+            new_state['results'] = results_to_dicts(all_results)
+            self.state_store.save(target, new_state)
         
         report_path = ""
         csv_path = ""
@@ -255,7 +337,113 @@ class Scanner:
         if export_csv:
             csv_path = self.reporter.generate_csv(url, all_results)
             
-        return all_results, (root_data if deep_scan else data), report_path, csv_path
+        return all_results, data, report_path, csv_path
+
+    def _analyze_root(self, data: SiteData, enabled, page_state: Optional[PageState], all_results: List[DetectionResult]):
+        if 'tech' in enabled:
+            print(f"[*] Analyzing content...")
+            engine_results = self._run_analyzer(page_state, 'engine', lambda: self._module('tech').analyze(data))
+            self._merge_results(all_results, engine_results)
+
+        # Security Audit
+        if 'headers' in enabled:
+            sec_results = self._module('headers').audit(data.headers)
+            self._merge_results(all_results, sec_results)
+
+        # Secret Scanning
+        if 'secrets' in enabled:
+            print("[*] Scanning for Secrets (Keys/Tokens)...")
+            secret_results = self._run_analyzer(page_state, 'secrets', lambda: self._module('secrets').scan(data))
+            self._merge_results(all_results, secret_results)
+
+        # WAF Detection
+        if 'waf' in enabled:
+            waf_results = self._module('waf').detect(data.headers, data.cookies)
+            self._merge_results(all_results, waf_results)
+
+        # OSINT Collection
+        if 'osint' in enabled:
+            osint_results = self._module('osint').collect(data.html)
+            self._merge_results(all_results, osint_results)
+
+        # Context Analysis (On Root only usually enough)
+        if 'context' in enabled:
+            ctx_results = self._run_analyzer(page_state, 'context', lambda: [self._module('context').analyze(data)])
+            self._merge_results(all_results, ctx_results)
+
+    def _apply_tls(self, ssl_info: dict, target: str, previous_state: Optional[dict], new_state: Optional[dict],
+                   subdomains: set, all_results: List[DetectionResult]):
+        if new_state is not None and ssl_info.get('fingerprint'):
+            new_state['tls_fingerprint'] = ssl_info['fingerprint']
+            if previous_state.get('tls_fingerprint') not in (None, ssl_info['fingerprint']):
+                print("[*] TLS certificate changed since last scan.")
+        self._merge_results(all_results, self._module('ssl').technologies(ssl_info))
+        # Names on the certificate are hosts we know about without any lookup
+        subdomains.update(self._module('ssl').hostnames(ssl_info, target))
+
+    def _tls_summary(self, inspector, hosts: set, target: str, deadline: Deadline) -> List[DetectionResult]:
+        certs = inspector.inspect_many(hosts, deadline)
+        if not certs:
+            return []
+
+        unique = {info['fingerprint']: info for info in certs.values()}
+        days_left = {host: info['expires_in_days'] for host, info in certs.items() if info.get('expires_in_days') is not None}
+        expired = sorted(host for host, days in days_left.items() if days < 0)
+        expiring = sorted(host for host, days in days_left.items() if 0 <= days < 30)
+
+        # SAN entries feed back as newly discovered hosts
+        new_hosts = set()
+        for info in unique.values():
+            new_hosts |= inspector.hostnames(info, target)
+        new_hosts -= hosts
+        hosts |= new_hosts
+
+        results = [DetectionResult(
+            technology="TLS Certificates",
+            category="Infrastructure",
+            confidence=100,
+            evidence=f"{len(certs)} TLS hosts, {len(unique)} unique certificates; {len(new_hosts)} new hostnames from SANs"
+        )]
+        for info in unique.values():
+            self._merge_results(results, inspector.technologies(info))
+        if expired:
+            results.append(DetectionResult("Expired TLS Certificate", "Security Risk", 100, evidence=", ".join(expired[:20])))
+        if expiring:
+            results.append(DetectionResult("TLS Certificate Expiring Soon", "Security Risk", 70, evidence=", ".join(expiring[:20])))
+        return results
+
+    def _page_state(self, data: SiteData, previous_state: Optional[dict], new_state: Optional[dict],
+                    analyzer_versions: Dict[str, str]) -> Optional[PageState]:
+        if new_state is None or not data.status_code:
+            return None
+        previous_page = previous_state.get('pages', {}).get(data.final_url)
+        page_state = PageState(data, previous_page, analyzer_versions)
+        new_state['pages'][data.final_url] = page_state.current
+        return page_state
+
+    def _run_analyzer(self, page_state: Optional[PageState], analyzer: str, compute) -> List[DetectionResult]:
+        # Reuse last scan's output when every input this analyzer reads is unchanged
+        if page_state is None:
+            return compute()
+        results = page_state.cached(analyzer)
+        if results is None:
+            results = compute()
+            page_state.store(analyzer, results)
+        return results
+
+    def _phase_deadline(self, deadline: Deadline, name: str, phases: List[str], phase_budgets: Dict[str, float]) -> Deadline:
+        if name in phase_budgets:
+            return deadline.phase(name, phase_budgets[name])
+
+        remaining = deadline.remaining()
+        if remaining is None:
+            return deadline.phase(name)
+
+        # Split what's left between this phase and the ones still to come,
+        # so time unused by a fast phase rolls over to the next
+        upcoming = phases[phases.index(name):]
+        share = self.PHASE_SHARES[name] / sum(self.PHASE_SHARES[p] for p in upcoming)
+        return deadline.phase(name, remaining * share)
 
     def _merge_results(self, main_list: List[DetectionResult], new_list: List[DetectionResult]):
         if not new_list:
@@ -1,18 +1,57 @@
 from typing import Dict, List, Tuple
 from .utils import DetectionResult
+from .vuln_index import VulnerabilityIndex
 import json
 import os
 import re
+import sqlite3
+import threading
 
 class SecurityAuditor:
-    def __init__(self):
+    def __init__(self, store_path: str = None):
          base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-         vuln_path = os.path.join(base_dir, 'data', 'vulnerabilities.json')
-         try:
-             with open(vuln_path, 'r') as f:
-                 self.vuln_db = json.load(f)
-         except:
-             self.vuln_db = {}
+         self.vuln_path = os.path.join(base_dir, 'data', 'vulnerabilities.json')
+         # Advisories live in an on-disk store (see vuln_store); only the products a scan asks about are read
+         self.store_path = store_path
+         self._store = None
+         self._vuln_index = None
+         self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        # Opened on first correlation; header-only audits never touch it. The bundled
+        # vulnerabilities.json is imported like any other feed (skipped while unchanged).
+        with self._lock:
+            if self._store is None:
+                from .vuln_store import VulnerabilityStore
+                try:
+                    store = VulnerabilityStore(self.store_path)
+                    store.import_path(self.vuln_path)
+                    self._store = store
+                except (OSError, ValueError, sqlite3.Error):
+                    self._store = False # Unwritable cache: fall back to the bundled file in memory
+        return self._store
+
+    @property
+    def vuln_index(self) -> VulnerabilityIndex:
+        if self._vuln_index is None:
+            try:
+                with open(self.vuln_path, 'r') as f:
+                    self._vuln_index = VulnerabilityIndex.from_dict(json.load(f))
+            except:
+                self._vuln_index = VulnerabilityIndex()
+        return self._vuln_index
+
+    def preload(self):
+        return self.store
+
+    def advisories(self, technology: str, version: str) -> List[dict]:
+        if self.store:
+            try:
+                return self.store.lookup(technology, version)
+            except sqlite3.Error:
+                pass
+        return self.vuln_index.lookup(technology, version)
 
     def audit(self, headers: Dict[str, str]) -> List[DetectionResult]:
         score = 100
@@ -56,27 +95,21 @@ class SecurityAuditor:
 
     def check_vulnerabilities(self, detected_techs: List[DetectionResult]) -> List[DetectionResult]:
         vuln_results = []
-        
-        # Helper to strict version compare
-        def is_vulnerable(current_ver, max_ver):
-            try:
-                # Simple loose comparison for demo (ideal: packaging.version)
-                parts_cur = [int(x) for x in current_ver.split('.') if x.isdigit()]
-                parts_max = [int(x) for x in max_ver.split('.') if x.isdigit()]
-                return parts_cur < parts_max
-            except:
-                return False
+        seen = set()
 
         for tech in detected_techs:
-            if tech.technology in self.vuln_db and tech.version:
-                entries = self.vuln_db[tech.technology]['rules']
-                for entry in entries:
-                    if is_vulnerable(tech.version, entry['max_version']):
-                        vuln_results.append(DetectionResult(
-                            technology=f"Vulnerable {tech.technology}",
-                            category="Vulnerability",
-                            confidence=90,
-                            evidence=f"Ver: {tech.version} < {entry['max_version']} | {entry['severity']} | {entry['cve']}: {entry['description']}"
-                        ))
-                        break # One vuln per tech is enough for noise reduction
+            if not tech.version or (tech.technology, tech.version) in seen:
+                continue
+            seen.add((tech.technology, tech.version))
+            advisories = self.advisories(tech.technology, tech.version)
+            if not advisories:
+                continue
+            # One result per technology listing every matching advisory, most severe first
+            listing = "; ".join(f"{a['severity']} | {a['cve']}: {a['description']}" for a in advisories)
+            vuln_results.append(DetectionResult(
+                technology=f"Vulnerable {tech.technology}",
+                category="Vulnerability",
+                confidence=90,
+                evidence=f"Ver: {tech.version} | {len(advisories)} advisories | {listing}"
+            ))
         return vuln_results
@@ -0,0 +1,213 @@
+import json
+import os
+import socketserver
+import threading
+import time
+import uuid
+import concurrent.futures
+from collections import OrderedDict
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import dns.resolver
+from .scanner import Scanner
+from .registry import resolve_modules
+
+def _names(value) -> list:
+    # Module lists may arrive as JSON arrays or comma-separated strings
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(name).strip() for name in value if str(name).strip()]
+
+def _flag(value) -> bool:
+    # JSON true/false, or the strings and numbers form fields tend to send; bool("false") is True
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ('true', '1', 'yes', 'on', 'false', '0', 'no', 'off', ''):
+        return value.strip().lower() in ('true', '1', 'yes', 'on')
+    raise ValueError(f"not a boolean: {value!r}")
+
+# Crawl threads one job may use; admission control counts jobs, not their threads
+MAX_THREADS = 20
+
+def _threads(value) -> int:
+    return min(max(int(value), 1), MAX_THREADS)
+
+class ScanService:
+    # Scan options a client may pass in a job request, with their types
+    OPTIONS = {
+        'deep': _flag,
+        'passive': _flag,
+        'threads': _threads,
+        'time_budget': float,
+        'incremental': _flag,
+        'modules': _names,
+        'skip': _names
+    }
+
+    def __init__(self, scanner: Scanner, max_jobs=4, max_queue=16, max_history=200):
+        self.scanner = scanner
+        self.max_jobs = max_jobs
+        self.max_history = max_history
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_jobs)
+
+        # Admission control: running + queued jobs never exceed this many slots
+        self.slots = threading.BoundedSemaphore(max_jobs + max_queue)
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, request: dict) -> dict:
+        url = request.get('url')
+        if not url or not isinstance(url, str):
+            raise ValueError("'url' is required")
+
+        options = {}
+        for key, cast in self.OPTIONS.items():
+            if request.get(key) is not None:
+                options[key] = cast(request[key])
+        # Reject unknown module names up front rather than failing inside the job
+        enabled = resolve_modules(options.get('modules'), options.get('skip'))
+        if options.get('deep') and 'crawl' not in enabled:
+            raise ValueError("'deep' needs the crawl module")
+
+        if not self.slots.acquire(blocking=False):
+            return None
+
+        job = {
+            'id': uuid.uuid4().hex,
+            'url': url,
+            'options': options,
+            'status': 'queued',
+            'submitted': time.time(),
+            'started': None,
+            'finished': None,
+            'results': None,
+            'error': None
+        }
+        with self.lock:
+            self.jobs[job['id']] = job
+            self._trim_history()
+        self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> dict:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def summary(self) -> dict:
+        with self.lock:
+            statuses = [job['status'] for job in self.jobs.values()]
+        return {
+            'running': statuses.count('running'),
+            'queued': statuses.count('queued'),
+            'max_jobs': self.max_jobs,
+            'jobs': len(statuses)
+        }
+
+    def _run(self, job: dict):
+        job['status'] = 'running'
+        job['started'] = time.time()
+        options = job['options']
+        try:
+            results, data, _, _ = self.scanner.scan(
+                job['url'],
+                deep_scan=options.get('deep', False),
+                passive_mode=options.get('passive', False),
+                threads=options.get('threads', 5),
+                time_budget=options.get('time_budget'),
+                incremental=options.get('incremental', False),
+                modules=options.get('modules'),
+                skip=options.get('skip')
+            )
+            job['results'] = [asdict(r) for r in results]
+            job['final_url'] = data.final_url
+            job['status_code'] = data.status_code
+            job['status'] = 'done'
+        except Exception as e:
+            job['error'] = str(e)
+            job['status'] = 'failed'
+        finally:
+            job['finished'] = time.time()
+            self.slots.release()
+
+    def _trim_history(self):
+        # Drop the oldest finished jobs once the history is full
+        finished = [job_id for job_id, job in self.jobs.items() if job['finished']]
+        while len(self.jobs) > self.max_history and finished:
+            del self.jobs[finished.pop(0)]
+
+class ScanRequestHandler(BaseHTTPRequestHandler):
+    service: ScanService = None
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, dict(status='ok', **self.service.summary()))
+        elif self.path.startswith('/scans/'):
+            job = self.service.get(self.path[len('/scans/'):])
+            if job:
+                self._send(200, job)
+            else:
+                self._send(404, {'error': 'unknown job'})
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/scans':
+            self._send(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            job = self.service.submit(request)
+        except (ValueError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+            return
+
+        if job is None:
+            self._send(503, {'error': 'too many jobs, retry later'})
+        else:
+            self._send(202, {'id': job['id'], 'status': job['status']})
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        print(f"[service] {self.address_string()} {format % args}")
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def serve(scanner: Scanner, host='127.0.0.1', port=8700, socket_path=None, max_jobs=4, max_queue=16):
+    # Share resolver answers between jobs instead of re-querying per scan
+    dns.resolver.get_default_resolver().cache = dns.resolver.LRUCache()
+    scanner.preload()
+
+    handler = type('BoundScanRequestHandler', (ScanRequestHandler,), {'service': ScanService(scanner, max_jobs, max_queue)})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, handler)
+        print(f"[*] Scan service listening on unix:{socket_path}")
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        print(f"[*] Scan service listening on http://{host}:{port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
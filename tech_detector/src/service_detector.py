@@ -0,0 +1,206 @@
+import asyncio
+import os
+import re
+import struct
+from typing import Optional
+from .utils import DetectionResult
+from .deadline import Deadline
+
+class ServiceDetector:
+    # Ports where the client talks first; everything else gets a short wait for a banner
+    TLS_PORTS = {443, 465, 636, 853, 993, 995, 2376, 4443, 6443, 8443, 9443}
+    HTTP_PORTS = {80, 81, 3000, 5000, 5601, 8000, 8008, 8080, 8081, 8088, 8888, 9000, 9090, 9200}
+    REDIS_PORTS = {6379}
+
+    # Server header product -> technology name used in fingerprints/vulnerabilities
+    HTTP_PRODUCTS = {
+        'nginx': 'Nginx',
+        'apache': 'Apache',
+        'microsoft-iis': 'IIS',
+        'litespeed': 'LiteSpeed',
+        'caddy': 'Caddy',
+        'openresty': 'OpenResty',
+        'lighttpd': 'lighttpd',
+        'werkzeug': 'Werkzeug',
+        'gunicorn': 'Gunicorn'
+    }
+
+    # (product, banner regex with the version as group 1)
+    BANNERS = {
+        'ssh': [
+            ('OpenSSH', r'OpenSSH[_-]([\d.]+(?:p\d+)?)'),
+            ('Dropbear SSH', r'dropbear[_-]([\d.]+)')
+        ],
+        'smtp': [
+            ('Postfix', r'Postfix()'),
+            ('Exim', r'Exim ([\d.]+)'),
+            ('Sendmail', r'Sendmail ([\d.]+)'),
+            ('Microsoft Exchange', r'Microsoft ESMTP MAIL Service()')
+        ],
+        'ftp': [
+            ('vsftpd', r'vsFTPd ([\d.]+)'),
+            ('ProFTPD', r'ProFTPD ([\d.]+)'),
+            ('Pure-FTPd', r'Pure-FTPd()'),
+            ('FileZilla Server', r'FileZilla Server ([\d.]+)')
+        ]
+    }
+
+    TLS_VERSIONS = {0x0301: '1.0', 0x0302: '1.1', 0x0303: '1.2', 0x0304: '1.3'}
+
+    def __init__(self, banner_wait=1.0, read_limit=4096):
+        self.banner_wait = banner_wait
+        self.read_limit = read_limit
+
+    async def identify(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, port: int,
+                       host: str = "", deadline: Deadline = None, wait: float = None) -> Optional[DetectionResult]:
+        # Runs on a connection the port scanner already opened; one probe per connection
+        deadline = deadline or Deadline()
+        wait = deadline.timeout(min(wait or self.banner_wait, self.banner_wait))
+        try:
+            if port in self.TLS_PORTS:
+                return await self._probe_tls(reader, writer, port, host, wait)
+            if port in self.REDIS_PORTS:
+                return await self._probe_redis(reader, writer, port, wait)
+            if port not in self.HTTP_PORTS:
+                banner = await self._read(reader, wait)
+                if banner:
+                    return self._parse_banner(banner, port)
+            return await self._probe_http(reader, writer, port, host, wait)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, OSError, ValueError, struct.error):
+            return None
+
+    async def _read(self, reader: asyncio.StreamReader, wait: float) -> bytes:
+        try:
+            return await asyncio.wait_for(reader.read(self.read_limit), timeout=wait)
+        except asyncio.TimeoutError:
+            return b""
+
+    def _parse_banner(self, banner: bytes, port: int) -> Optional[DetectionResult]:
+        text = banner.decode('latin-1', errors='ignore')
+        first_line = text.strip().splitlines()[0] if text.strip() else ""
+
+        if text.startswith('SSH-'):
+            kind = 'ssh'
+        elif text.startswith('220'):
+            kind = 'ftp' if port == 21 or 'FTP' in text.upper() else 'smtp'
+        elif text.startswith('+OK'):
+            return self._result('POP3', '', port, first_line)
+        elif text.startswith('* OK'):
+            return self._result('IMAP', '', port, first_line)
+        elif self._is_mysql_handshake(banner):
+            # MySQL / MariaDB handshake: 3-byte length, sequence id, protocol 10, NUL-terminated version
+            server_version = banner[5:].split(b'\x00', 1)[0].decode('latin-1', errors='ignore')
+            product = 'MariaDB' if 'MariaDB' in server_version else 'MySQL'
+            version = re.search(r'([\d.]+)-MariaDB', server_version) if product == 'MariaDB' else None
+            version = version.group(1) if version else server_version.split('-')[0]
+            return self._result(product, version, port, f"handshake {server_version}")
+        else:
+            return None
+
+        for product, pattern in self.BANNERS[kind]:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                return self._result(product, match.group(1), port, first_line)
+        return self._result(kind.upper(), '', port, first_line)
+
+    def _is_mysql_handshake(self, banner: bytes) -> bool:
+        # The greeting is one packet: its little-endian length covers the rest, sequence id 0
+        return (len(banner) > 5 and banner[4] == 0x0a and banner[3] == 0
+                and int.from_bytes(banner[:3], 'little') == len(banner) - 4)
+
+    async def _probe_http(self, reader, writer, port, host, wait) -> Optional[DetectionResult]:
+        writer.write(f"HEAD / HTTP/1.0\r\nHost: {host or 'localhost'}\r\nUser-Agent: Mozilla/5.0\r\n\r\n".encode())
+        await writer.drain()
+        response = await self._read(reader, wait)
+        text = response.decode('latin-1', errors='ignore')
+        if not text.startswith('HTTP/'):
+            return None
+
+        server = re.search(r'^server:\s*(.+?)\s*$', text, re.IGNORECASE | re.MULTILINE)
+        if not server:
+            return self._result('HTTP', '', port, text.splitlines()[0])
+        token = server.group(1).split()[0]
+        name, _, version = token.partition('/')
+        product = self.HTTP_PRODUCTS.get(name.lower(), name)
+        return self._result(product, version, port, f"Server: {server.group(1)}")
+
+    async def _probe_redis(self, reader, writer, port, wait) -> Optional[DetectionResult]:
+        writer.write(b"INFO server\r\n")
+        await writer.drain()
+        text = (await self._read(reader, wait)).decode('latin-1', errors='ignore')
+        if 'redis_version:' in text:
+            version = re.search(r'redis_version:([\d.]+)', text)
+            return self._result('Redis', version.group(1) if version else '', port, "INFO answered without authentication")
+        if text.startswith('-NOAUTH') or text.startswith('-ERR'):
+            return self._result('Redis', '', port, text.strip().splitlines()[0])
+        return None
+
+    async def _probe_tls(self, reader, writer, port, host, wait) -> Optional[DetectionResult]:
+        writer.write(self._client_hello(host))
+        await writer.drain()
+        header = await asyncio.wait_for(reader.readexactly(5), timeout=wait)
+        content_type, _, length = struct.unpack('!BHH', header)
+        body = await asyncio.wait_for(reader.readexactly(length), timeout=wait)
+
+        if content_type == 0x15:
+            return self._result('TLS', '', port, f"handshake alert {body[-1] if body else '?'}")
+        if content_type != 0x16 or not body or body[0] != 0x02:
+            return None
+
+        # ServerHello: type(1) len(3) legacy_version(2) random(32) session_id cipher(2) compression(1) extensions
+        legacy_version = struct.unpack('!H', body[4:6])[0]
+        pos = 38
+        pos += 1 + body[pos]
+        cipher = struct.unpack('!H', body[pos:pos + 2])[0]
+        pos += 3
+
+        version = legacy_version
+        if pos + 2 <= len(body):
+            end = pos + 2 + struct.unpack('!H', body[pos:pos + 2])[0]
+            pos += 2
+            while pos + 4 <= min(end, len(body)):
+                ext_type, ext_len = struct.unpack('!HH', body[pos:pos + 4])
+                if ext_type == 0x002b and ext_len == 2:
+                    version = struct.unpack('!H', body[pos + 4:pos + 6])[0]
+                pos += 4 + ext_len
+
+        name = self.TLS_VERSIONS.get(version, hex(version))
+        return self._result('TLS', name, port, f"ServerHello TLS {name}, cipher 0x{cipher:04x}")
+
+    def _client_hello(self, host: str) -> bytes:
+        def ext(ext_type: int, data: bytes) -> bytes:
+            return struct.pack('!HH', ext_type, len(data)) + data
+
+        def vector(data: bytes, size_len=2) -> bytes:
+            return len(data).to_bytes(size_len, 'big') + data
+
+        ciphers = [0x1301, 0x1302, 0x1303, 0xc02b, 0xc02f, 0xc02c, 0xc030, 0xcca9, 0xcca8,
+                   0xc013, 0xc014, 0x009c, 0x009d, 0x002f, 0x0035]
+        sig_algs = [0x0403, 0x0804, 0x0401, 0x0503, 0x0805, 0x0501, 0x0806, 0x0601, 0x0201]
+
+        extensions = b"".join([
+            ext(0x000a, vector(struct.pack('!HH', 0x001d, 0x0017))),            # supported_groups: x25519, secp256r1
+            ext(0x000b, vector(b"\x00", 1)),                                   # ec_point_formats: uncompressed
+            ext(0x000d, vector(b"".join(struct.pack('!H', a) for a in sig_algs))),
+            ext(0x002b, vector(struct.pack('!HH', 0x0304, 0x0303), 1)),         # supported_versions: 1.3, 1.2
+            # key_share: any 32 bytes is an acceptable x25519 public value; we never finish the handshake
+            ext(0x0033, vector(struct.pack('!HH', 0x001d, 32) + os.urandom(32)))
+        ])
+        if host and not re.match(r'^[\d.:]+$', host):
+            server_name = b"\x00" + vector(host.encode('idna'))
+            extensions = ext(0x0000, vector(server_name)) + extensions
+
+        hello = (struct.pack('!H', 0x0303) + os.urandom(32) + vector(os.urandom(32), 1)
+                 + vector(b"".join(struct.pack('!H', c) for c in ciphers)) + vector(b"\x00", 1)
+                 + vector(extensions))
+        handshake = b"\x01" + vector(hello, 3)
+        return struct.pack('!BHH', 0x16, 0x0301, len(handshake)) + handshake
+
+    def _result(self, product: str, version: str, port: int, evidence: str) -> DetectionResult:
+        return DetectionResult(
+            technology=product,
+            category="Network Service",
+            confidence=90 if version else 70,
+            version=version,
+            evidence=f"{port}/tcp {evidence}"[:200]
+        )
@@ -1,47 +1,174 @@
 import requests
-from bs4 import BeautifulSoup
+import concurrent.futures
+import contextlib
+import queue
+import threading
+import zlib
+import xml.etree.ElementTree as ET
 from urllib.parse import urljoin
-from typing import List
+from typing import Iterator, List, Optional, Tuple
+from .deadline import Deadline
 
 class SitemapParser:
-    def __init__(self, base_url: str):
+    # Sitemaps are parsed while they download: each <url> is handed out and dropped from the tree,
+    # so a retail sitemap with millions of entries costs no more than the entries actually used.
+    # Sitemap indexes are followed (their sitemaps read concurrently), .xml.gz is inflated on the fly.
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+    }
+    CHUNK = 65536
+    MAX_DEPTH = 2   # The protocol allows index -> urlset; some sites nest one index deeper
+    WORKERS = 4     # Sitemaps of an index read at once
+
+    # Images and other non-pages
+    SKIPPED_EXTENSIONS = ('.jpg', '.png', '.pdf', '.css', '.js')
+
+    def __init__(self, base_url: str, cache=None):
         self.base_url = base_url
+        self.cache = cache # The scan's ResponseCache: sitemap.xml is also one of the fetcher's probes
         self.sitemap_urls = [
             urljoin(base_url, "sitemap.xml"),
             urljoin(base_url, "sitemap_index.xml"),
             urljoin(base_url, "wp-sitemap.xml")
         ]
 
-    def get_urls(self, limit=20) -> List[str]:
+    def get_urls(self, limit=20, deadline: Deadline = None) -> List[str]:
+        deadline = deadline or Deadline()
         found_urls = []
-        
+
         for sitemap_url in self.sitemap_urls:
-            try:
-                print(f"[*] Checking sitemap: {sitemap_url}")
-                # Use a specific, common User-Agent
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                }
-                response = requests.get(sitemap_url, headers=headers, timeout=10, verify=False)
-                
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.content, 'xml')
-                    urls = soup.find_all('loc')
-                    if urls:
-                        print(f"[*] Found sitemap with {len(urls)} entries.")
-                        # Extract text and filter images/other non-pages
-                        for url_tag in urls:
-                            loc = url_tag.text.strip()
-                            if not any(loc.endswith(ext) for ext in ['.jpg', '.png', '.pdf', '.css', '.js']):
-                                found_urls.append(loc)
-                                if len(found_urls) >= limit:
-                                    return found_urls
-                        
-                        # If we found URLs, we can stop checking other sitemap variants
-                        if found_urls:
+            if deadline.expired():
+                break
+            print(f"[*] Checking sitemap: {sitemap_url}")
+            # Leaving the loop stops the download (and any sitemaps still being read)
+            with contextlib.closing(self.entries(sitemap_url, deadline)) as entries:
+                for entry in entries:
+                    loc = entry['loc']
+                    if not loc.lower().endswith(self.SKIPPED_EXTENSIONS):
+                        found_urls.append(loc)
+                        if len(found_urls) >= limit:
                             return found_urls
-            except Exception as e:
-                # print(f"[-] Sitemap error {sitemap_url}: {e}")
-                pass
-                
+
+            # If we found URLs, we can stop checking other sitemap variants
+            if found_urls:
+                return found_urls
+
         return found_urls
+
+    def entries(self, sitemap_url: str, deadline: Deadline = None) -> Iterator[dict]:
+        # {'loc', 'lastmod', 'priority'} for every page, in document order per sitemap;
+        # stop iterating to stop downloading
+        deadline = deadline or Deadline()
+        stop = threading.Event()
+        try:
+            yield from self._walk(sitemap_url, deadline, stop, 0)
+        finally:
+            stop.set()
+
+    def _walk(self, url: str, deadline: Deadline, stop: threading.Event, depth: int) -> Iterator[dict]:
+        children = []
+        for kind, entry in self._parse(url, deadline, stop):
+            if kind == 'url':
+                yield entry
+            elif depth < self.MAX_DEPTH:
+                children.append(entry['loc'])
+        if children and not stop.is_set():
+            print(f"[*] Sitemap index {url}: reading {len(children)} sitemaps...")
+            yield from self._walk_many(children, deadline, stop, depth + 1)
+
+    def _walk_many(self, urls: List[str], deadline: Deadline, stop: threading.Event, depth: int) -> Iterator[dict]:
+        # Entries of several sitemaps, interleaved as they arrive
+        found = queue.Queue()
+        done = object()
+
+        def read(url):
+            try:
+                for entry in self._walk(url, deadline, stop, depth):
+                    if stop.is_set():
+                        return
+                    found.put(entry)
+            except Exception:
+                pass
+            finally:
+                found.put(done)
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.WORKERS)
+        try:
+            for url in urls:
+                executor.submit(read, url)
+            pending = len(urls)
+            while pending:
+                try:
+                    entry = found.get(timeout=0.5)
+                except queue.Empty:
+                    if deadline.expired():
+                        return
+                    continue
+                if entry is done:
+                    pending -= 1
+                else:
+                    yield entry
+        finally:
+            # Readers still running notice `stop` (set by entries()) or the deadline on their next chunk
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _parse(self, url: str, deadline: Deadline, stop: threading.Event) -> Iterator[Tuple[str, dict]]:
+        # ('url' | 'sitemap', entry) as the elements close; each one is cleared once read
+        parser = ET.XMLPullParser(events=('start', 'end'))
+        root = None
+        inflate = None
+        try:
+            for chunk in self._chunks(url, deadline):
+                if stop.is_set() or deadline.expired():
+                    return
+                if inflate is None:
+                    # .xml.gz served as a file (not as Content-Encoding, which requests already undoes)
+                    inflate = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == b'\x1f\x8b' else False
+                parser.feed(inflate.decompress(chunk) if inflate else chunk)
+                for event, elem in parser.read_events():
+                    if root is None:
+                        root = elem
+                    if event != 'end':
+                        continue
+                    kind = elem.tag.rsplit('}', 1)[-1]
+                    if kind in ('url', 'sitemap'):
+                        fields = {child.tag.rsplit('}', 1)[-1]: (child.text or '').strip() for child in elem}
+                        if fields.get('loc'):
+                            yield kind, {
+                                'loc': fields['loc'],
+                                'lastmod': fields.get('lastmod') or None,
+                                'priority': self._priority(fields.get('priority'))
+                            }
+                        root.clear()
+        except (ET.ParseError, zlib.error):
+            # Not a sitemap (an HTML catch-all page) or a truncated one: keep what was read
+            return
+
+    def _chunks(self, url: str, deadline: Deadline) -> Iterator[bytes]:
+        # The fetcher probes the well-known sitemap URLs as well: a copy it already holds is reused,
+        # anything else is streamed (a top-level sitemap can be as big as the ones an index points to)
+        if deadline.expired():
+            return
+        cached = self.cache.cached('GET', url) if self.cache is not None else None
+        if cached is not None:
+            if cached.status_code == 200:
+                for start in range(0, len(cached.content), self.CHUNK):
+                    yield cached.content[start:start + self.CHUNK]
+            return
+        try:
+            response = (self.cache or requests).get(url, headers=self.HEADERS, timeout=deadline.timeout(10), verify=False, stream=True)
+        except Exception:
+            return
+        with response:
+            if response.status_code != 200:
+                return
+            try:
+                yield from response.iter_content(self.CHUNK)
+            except Exception:
+                return
+
+    def _priority(self, value: Optional[str]) -> Optional[float]:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
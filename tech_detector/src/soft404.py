@@ -0,0 +1,187 @@
+import concurrent.futures
+import hashlib
+import math
+import re
+import threading
+import uuid
+from collections import Counter
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse
+from .deadline import Deadline
+
+class Soft404Baseline:
+    # What a host answers for paths that cannot exist. A few random paths are requested once per
+    # host (per scan); each answer is reduced to status, final path, a length bucket and a simhash
+    # of the body prefix. A path probe is then classified from its headers and first few KB: hosts
+    # with catch-all routing (every path 200s with the app shell or redirects to /login) no longer
+    # force a full download of every probe.
+    PREFIX = 4096           # Bytes of a probe that are read before deciding
+    SAMPLE_BODY = 65536     # Baseline answers are kept longer (ErrorFingerprinter reads them)
+    SIMHASH_DISTANCE = 6    # Of 64 bits: dynamic tokens (CSRF, timestamps) flip a few
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+    }
+
+    # Shapes of the paths we probe: bare, with an extension, dotfile, nested
+    SHAPES = ('/{0}', '/{0}.json', '/.{0}', '/{0}/{1}.php')
+
+    def __init__(self, cache=None):
+        self.cache = cache # The scan's ResponseCache: fully fetched URLs are not requested again
+        self._baselines = {} # scheme://host -> [sample]
+        self._landings = {}  # scheme://host -> scheme://host its root redirects to
+        self._host_locks = {}
+        self._lock = threading.Lock()
+
+    def samples(self, url: str, deadline: Deadline = None) -> List[dict]:
+        # Baseline answers of the host: {'path', 'status', 'headers', 'text', 'final_path', 'bucket', 'simhash'}
+        host = self._host(url)
+        with self._lock:
+            host_lock = self._host_locks.setdefault(host, threading.Lock())
+        with host_lock:
+            if not self._baselines.get(host):
+                # Nothing learned (budget spent, host not answering) is not kept: the next caller retries
+                self._baselines[host] = self._learn(host, deadline or Deadline())
+            return self._baselines[host]
+
+    def _learn(self, host: str, deadline: Deadline) -> List[dict]:
+        def sample(shape):
+            path = shape.format(uuid.uuid4().hex, uuid.uuid4().hex[:8])
+            response, body, complete = self.fetch(host + path, deadline, limit=self.SAMPLE_BODY, use_cache=False)
+            if response is None:
+                return None
+            response.close()
+            # The first redirect as such, for clients that don't follow redirects (PathDiscovery)
+            first_hop = self.fingerprint(response.history[0], response.history[0].content, True, path) if response.history else None
+            return dict(self.fingerprint(response, body, complete, path), path=path, first_hop=first_hop,
+                        headers=dict(response.headers), text=body.decode('utf-8', errors='replace'))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(self.SHAPES)) as executor:
+            return [s for s in executor.map(sample, self.SHAPES) if s]
+
+    def direct_samples(self, url: str, deadline: Deadline = None) -> List[dict]:
+        # The same baseline as seen without following redirects
+        return [sample['first_hop'] or sample for sample in self.samples(url, deadline)]
+
+    def landing(self, url: str, deadline: Deadline = None) -> str:
+        # scheme://host where the host's root ends up after redirects (http -> https, apex -> www)
+        host = self._host(url)
+        with self._lock:
+            if host in self._landings:
+                return self._landings[host]
+        response, _, _ = self.fetch(host + '/', deadline or Deadline(), limit=1)
+        if response is None:
+            return host
+        response.close()
+        landed = urlparse(response.url)
+        landed = f"{landed.scheme}://{landed.netloc}" if landed.hostname else host
+        with self._lock:
+            self._landings[host] = landed
+        return landed
+
+    def probe(self, url: str, deadline: Deadline, max_body: int = None, timeout=3) -> Optional[Tuple[object, bytes]]:
+        # (response, body) for a path that is really there: 200 and unlike the host's catch-all.
+        # Only the first PREFIX bytes are read to decide. The body is that prefix, or with max_body
+        # the whole body, read only for hits (None when it is larger than max_body).
+        response, body, complete = self.fetch(url, deadline, limit=self.PREFIX, timeout=timeout)
+        if response is None:
+            return None
+        if response.status_code != 200 or self.looks_missing(url, response, body, complete, deadline):
+            response.close()
+            return None
+        if max_body is not None and not complete:
+            more, complete = self.read(response, max_body + 1 - len(body))
+            body += more
+        response.close()
+        if max_body is not None and len(body) > max_body:
+            return None
+        return response, body
+
+    def fetch(self, url: str, deadline: Deadline, limit: int = None, timeout=3, use_cache=True) -> Tuple[Optional[object], bytes, bool]:
+        # (response, first `limit` bytes of the body, whether that is the whole body); (None, b'', False) on failure.
+        # The response stays open when the body was cut short.
+        limit = limit or self.PREFIX
+        if deadline.expired():
+            return None, b'', False
+        cached = self.cache.cached('GET', url) if self.cache is not None and use_cache else None
+        if cached is not None:
+            return cached, cached.content[:limit], len(cached.content) <= limit
+        try:
+            import requests
+            response = requests.get(url, headers=self.HEADERS, timeout=deadline.timeout(timeout), verify=False,
+                                    allow_redirects=True, stream=True)
+        except Exception:
+            return None, b'', False
+        body, complete = self.read(response, limit)
+        return response, body, complete
+
+    def read(self, response, limit: int) -> Tuple[bytes, bool]:
+        # Up to `limit` more bytes of a streamed response, and whether it has ended
+        chunks = []
+        size = 0
+        try:
+            for chunk in response.iter_content(min(limit, 8192)):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= limit:
+                    return b''.join(chunks)[:limit], False
+        except Exception:
+            return b''.join(chunks)[:limit], False
+        return b''.join(chunks), True
+
+    def fingerprint(self, response, body: bytes, complete: bool, path: str) -> dict:
+        length = response.headers.get('Content-Length')
+        if length is not None and length.isdigit() and not response.headers.get('Content-Encoding'):
+            length = int(length)
+        else:
+            length = len(body) if complete else None
+        # Pages often echo the requested path; it must not make two catch-all answers look different
+        echoes = {path, path.strip('/')} | set(re.findall(r'[0-9a-f]{8,}', path))
+        text = body[:self.PREFIX].decode('utf-8', errors='replace')
+        for echo in sorted(echoes, key=len, reverse=True):
+            if echo:
+                text = text.replace(echo, '')
+        # Where the answer ends up: after followed redirects, or the Location of one that wasn't followed
+        location = response.headers.get('Location') if 300 <= response.status_code < 400 else None
+        final_path = urlparse(location or response.url or '').path
+        for echo in sorted(echoes, key=len, reverse=True):
+            if echo and echo != '/':
+                final_path = final_path.replace(echo, '*')
+        return {
+            'status': response.status_code,
+            'final_path': final_path if location or response.history else None,
+            'bucket': int(math.log2(length + 1) * 4) if length is not None else None,
+            'simhash': self._simhash(text)
+        }
+
+    def looks_missing(self, url: str, response, body: bytes, complete: bool, deadline: Deadline = None) -> bool:
+        # True for a real 404/410 and for anything that answers like the host's catch-all
+        if response.status_code in (404, 410):
+            return True
+        probe = self.fingerprint(response, body, complete, urlparse(url).path)
+        return self.matches(probe, self.samples(url, deadline))
+
+    def matches(self, probe: dict, samples: List[dict]) -> bool:
+        # Whether a fingerprinted answer is one of the catch-all answers in `samples`
+        for sample in samples:
+            if sample['status'] != probe['status']:
+                continue
+            if probe['final_path'] is not None and probe['final_path'] == sample['final_path']:
+                return True # Redirected to the same place as a random path (login page, homepage)
+            if probe['bucket'] is not None and sample['bucket'] is not None and abs(probe['bucket'] - sample['bucket']) > 1:
+                continue
+            if bin(probe['simhash'] ^ sample['simhash']).count('1') <= self.SIMHASH_DISTANCE:
+                return True
+        return False
+
+    def _simhash(self, text: str) -> int:
+        weights = [0] * 64
+        # Markup repeats the same few tokens; each distinct one is hashed and spread once, weighted
+        for token, count in Counter(re.findall(r'\w+', text.lower())).items():
+            value = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), 'big')
+            for bit in range(64):
+                weights[bit] += count if value >> bit & 1 else -count
+        return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+    def _host(self, url: str) -> str:
+        parsed = urlparse(url if '://' in url else 'https://' + url)
+        return f"{parsed.scheme}://{parsed.netloc}"
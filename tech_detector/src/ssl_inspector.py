@@ -1,52 +1,137 @@
 import ssl
 import socket
+import hashlib
+import threading
+import concurrent.futures
+from collections import OrderedDict
 from urllib.parse import urlparse
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Set
+from .utils import DetectionResult, registered_domain
+from .deadline import Deadline
+from .cert_parser import parse_certificate
 
 class SSLInspector:
-    def inspect(self, url: str) -> dict:
-        parsed = urlparse(url)
-        hostname = parsed.netloc
-        port = 443
-        
+    # Deduce tech from Issuer: issuer organisation fragment -> (technology, category, confidence)
+    ISSUER_TECH = [
+        ('Cloudflare', ("Cloudflare", "CDN", 100)),
+        ('Google Trust Services', ("Google Cloud", "PaaS", 80)),
+        ("Let's Encrypt", ("Let's Encrypt", "SSL/TLS", 100)),
+        ('Amazon', ("AWS", "PaaS", 80))
+    ]
+
+    TIME_FORMAT = '%b %d %H:%M:%S %Y GMT' # Same layout as ssl.getpeercert()
+
+    def __init__(self, workers=50, cache_size=4096):
+        self.workers = workers
+        self.cache_size = cache_size
+        # Parsed + classified certificates by SHA-256 fingerprint: a wildcard or CDN certificate
+        # shared by hundreds of hosts is decoded once
+        self._certs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def inspect(self, url: str, deadline: Deadline = None) -> dict:
+        parsed = urlparse(url if '://' in url else 'https://' + url)
+        return self.inspect_host(parsed.hostname, 443 if parsed.scheme == 'http' else (parsed.port or 443), deadline)
+
+    def inspect_many(self, hosts: Iterable[str], deadline: Deadline = None, port=443) -> Dict[str, dict]:
+        # Concurrent handshakes; hosts without TLS (or unreachable) are left out
+        deadline = deadline or Deadline()
+        results = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            future_to_host = {executor.submit(self.inspect_host, host, port, deadline): host for host in set(hosts)}
+            for future in deadline.as_completed(executor, future_to_host):
+                info = future.result()
+                if info.get('fingerprint'):
+                    results[future_to_host[future]] = info
+        return results
+
+    def inspect_host(self, hostname: str, port=443, deadline: Deadline = None) -> dict:
+        deadline = deadline or Deadline()
         context = ssl.create_default_context()
         context.check_hostname = False
         context.verify_mode = ssl.CERT_NONE # We just want to inspect, not validate strictness
-        
+
         result = {}
-        
+        if not hostname or deadline.expired():
+            return result
+
         try:
-            with socket.create_connection((hostname, port), timeout=5) as sock:
+            with socket.create_connection((hostname, port), timeout=deadline.timeout(5)) as sock:
                 with context.wrap_socket(sock, server_hostname=hostname) as ssock:
-                    cert = ssock.getpeercert(binary_form=False) # Get parsed cert
-                    
-                    if not cert:
-                        # Sometimes getpeercert() returns empty if validation disabled/failed in a specific way
-                        # But with CERT_NONE + binary_form=False it might be empty if we don't verify?
-                        # Actually getting parsed info requires verification usually or manual parsing.
-                        # Let's try to get binary and parse if needed, but standard lib does it if we trust CA.
-                        # For simple inspection, let's use standard call.
-                        
-                        # Re-connect with standard settings just to get info?
-                        pass
-
-                    # Parse Issuer
-                    issuer = dict(x[0] for x in cert.get('issuer', []))
-                    subject = dict(x[0] for x in cert.get('subject', []))
-                    
-                    result['issuer_org'] = issuer.get('organizationName', 'Unknown')
-                    result['issuer_cn'] = issuer.get('commonName', 'Unknown')
-                    result['valid_from'] = cert.get('notBefore')
-                    result['valid_to'] = cert.get('notAfter')
+                    der_cert = ssock.getpeercert(binary_form=True)
+                    # Full chain as sent by the server (Python 3.13+); older versions only expose the leaf
+                    chain = getattr(ssock, 'get_unverified_chain', lambda: None)() or []
                     result['protocol'] = ssock.version()
-                    
-                    # Deduce tech from Issuer
-                    # e.g. "CloudFlare" -> Cloudflare
-                    # "Google Trust Services" -> GCP / Firebase
-                    # "Let's Encrypt" -> Standard Linux Hosting usually
-                    # "Amazon" -> AWS
-                    
+                    cipher = ssock.cipher()
+                    result['cipher'] = cipher[0] if cipher else ''
         except Exception as e:
             result['error'] = str(e)
-            
+            return result
+
+        result.update(self.describe(der_cert, chain=chain))
+        return result
+
+    def describe(self, der_cert: bytes, protocol: str = None, cipher: str = None, chain: list = None) -> dict:
+        # Inspection result for a certificate captured elsewhere (e.g. by the page fetch)
+        result = {}
+        if protocol is not None:
+            result['protocol'] = protocol
+            result['cipher'] = cipher or ''
+        if der_cert:
+            result.update(self.certificate(der_cert))
+            result['chain'] = [self.certificate(der).get('subject_cn', '') for der in (chain or [])[1:] if isinstance(der, bytes)]
+            result['expires_in_days'] = self._expires_in_days(result)
         return result
+
+    def certificate(self, der_cert: bytes) -> dict:
+        fingerprint = hashlib.sha256(der_cert).hexdigest()
+        with self._lock:
+            if fingerprint in self._certs:
+                self._certs.move_to_end(fingerprint)
+                return dict(self._certs[fingerprint])
+
+        info = {'fingerprint': fingerprint}
+        try:
+            cert = parse_certificate(der_cert)
+            info.update({
+                'issuer_org': cert['issuer'].get('organizationName', 'Unknown'),
+                'issuer_cn': cert['issuer'].get('commonName', 'Unknown'),
+                'subject_cn': cert['subject'].get('commonName', ''),
+                'valid_from': cert['not_before'].strftime(self.TIME_FORMAT),
+                'valid_to': cert['not_after'].strftime(self.TIME_FORMAT),
+                'sans': cert['sans']
+            })
+        except (ValueError, IndexError):
+            info['error'] = "Unparseable certificate"
+        info['technologies'] = self._classify(info.get('issuer_org', ''))
+
+        with self._lock:
+            self._certs[fingerprint] = info
+            while len(self._certs) > self.cache_size:
+                self._certs.popitem(last=False)
+        return dict(info)
+
+    def technologies(self, info: dict) -> List[DetectionResult]:
+        # Fresh objects every call: merged results are mutated in place by the scanner
+        return [DetectionResult(tech, category, confidence, evidence=f"SSL Issuer: {info.get('issuer_org')}")
+                for tech, category, confidence in info.get('technologies', [])]
+
+    def hostnames(self, info: dict, domain: str) -> Set[str]:
+        # SAN entries under the same registered domain (wildcards can't be resolved to a host)
+        registered = registered_domain(domain.split(':')[0])
+        return {name for name in info.get('sans', [])
+                if '*' not in name and (name == registered or name.endswith('.' + registered))}
+
+    def _classify(self, issuer_org: str) -> list:
+        for fragment, tech in self.ISSUER_TECH:
+            if fragment in issuer_org:
+                return [tech]
+        return []
+
+    def _expires_in_days(self, info: dict):
+        try:
+            not_after = datetime.strptime(info['valid_to'], self.TIME_FORMAT).replace(tzinfo=timezone.utc)
+        except (KeyError, ValueError):
+            return None
+        return (not_after - datetime.now(timezone.utc)).days
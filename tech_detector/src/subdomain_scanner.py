@@ -1,9 +1,10 @@
 import requests
-import socket
-import dns.resolver
 from urllib.parse import urlparse
-from typing import List
+from typing import Iterable, List, Optional, Set, Tuple
 from .utils import DetectionResult
+from .deadline import Deadline
+from .async_dns import AsyncDNSEngine, iter_wordlist
+from .ct_log import CTLogSource
 import concurrent.futures
 
 # User-Agent to avoid blocking
@@ -23,47 +24,77 @@ class SubdomainScanner:
         'elasticbeanstalk.com': 'AWS Elastic Beanstalk',
         'cloudfront.net': 'AWS CloudFront',
         'trafficmanager.net': 'Azure Traffic Manager',
-        'shop.myshopify.com': 'Shopify',
+        'myshopify.com': 'Shopify',
         'wpengine.com': 'WP Engine'
     }
 
-    def scan(self, url: str) -> List[DetectionResult]:
-        domain = urlparse(url).netloc
+    # Page a platform serves for a hostname nobody has claimed (None: only a dangling NXDOMAIN confirms)
+    TAKEOVER_FINGERPRINTS = {
+        'GitHub Pages': "There isn't a GitHub Pages site here.",
+        'Heroku': "No such app",
+        'AWS (S3/ElasticBeanstalk)': "NoSuchBucket",
+        'Shopify': "Sorry, this shop is currently unavailable",
+        'WP Engine': "The site you were looking for couldn't be found",
+        'Azure App Service': None,
+        'Azure Cloud Service': None,
+        'AWS Elastic Beanstalk': None,
+        'AWS CloudFront': None,
+        'Azure Traffic Manager': None
+    }
+
+    # Takeover findings listed in the evidence (a parked wildcard zone can yield thousands)
+    SHOWN_TAKEOVERS = 20
+
+    def __init__(self, wordlist: str = None, resolvers: List[str] = None, concurrency=1000, confirm_takeover=True,
+                 ct_mirror: str = None, ct_refresh=86400):
+        # wordlist: path to a file with one label per line (default: COMMON_SUBS)
+        self.wordlist = wordlist
+        self.dns_engine = AsyncDNSEngine(resolvers=resolvers, concurrency=concurrency)
+        self.ct_source = CTLogSource(refresh=ct_refresh, mirror=ct_mirror)
+        self.confirm_takeover = confirm_takeover
+        # Suffix index: a CNAME is matched by walking its label suffixes, not by scanning every signature
+        self.takeover_index = {suffix.lower(): platform for suffix, platform in self.TAKEOVER_SIGNATURES.items()}
+
+    def scan(self, url: str, deadline: Deadline = None, found: Set[str] = None) -> List[DetectionResult]:
+        # found: optional set that receives the discovered names (reused by other modules)
+        deadline = deadline or Deadline()
+        domain = urlparse(url).hostname or ''
         if domain.startswith('www.'):
             domain = domain[4:]
-            
+
+        # Detected once up front; brute-force answers matching the wildcard are discarded
+        wildcard = self.dns_engine.wildcard(domain, deadline=deadline)
+        found_subs = self.enumerate(domain, deadline, wildcard)
+        if found is not None:
+            found.update(found_subs)
+        return self.analyze(domain, found_subs, deadline, wildcard)
+
+    def enumerate(self, domain: str, deadline: Deadline = None, wildcard: set = None) -> Set[str]:
+        deadline = deadline or Deadline()
         found_subs = set()
-        
-        # 1. Bruteforce common subdomains
-        def check_sub(sub):
-            target = f"{sub}.{domain}"
-            try:
-                socket.gethostbyname(target)
-                return target
-            except:
-                return None
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-            future_to_sub = {executor.submit(check_sub, sub): sub for sub in self.COMMON_SUBS}
-            for future in concurrent.futures.as_completed(future_to_sub):
-                if future.result():
-                    found_subs.add(future.result())
-
-        # 2. CRT.sh (Certificate Transparency)
-        try:
-            r = requests.get(f"https://crt.sh/?q=%.{domain}&output=json", headers=HEADERS, timeout=10)
-            if r.status_code == 200:
-                data = r.json()
-                for entry in data:
-                    name_value = entry.get('name_value', '')
-                    for sub in name_value.split('\n'):
-                        if '*' not in sub and domain in sub:
-                            found_subs.add(sub)
-        except Exception:
-            pass # Fail silently if crt.sh is down
+        # 1. Bruteforce subdomains (async, streamed from the wordlist)
+        words = iter_wordlist(self.wordlist) if self.wordlist else iter(self.COMMON_SUBS)
+        found_subs.update(self.dns_engine.brute_force(domain, words, deadline, wildcard=wildcard))
 
+        # 2. Certificate Transparency (crt.sh streamed, or a local mirror; cached per registered domain)
+        if not deadline.expired():
+            found_subs.update(self.ct_source.names(domain, deadline))
+
+        return found_subs
+
+    def analyze(self, domain: str, found_subs: Set[str], deadline: Deadline = None, wildcard: set = None) -> List[DetectionResult]:
+        deadline = deadline or Deadline()
         results = []
-        
+
+        if wildcard:
+            results.append(DetectionResult(
+                technology="Wildcard DNS",
+                category="Reconnaissance",
+                confidence=100,
+                evidence=f"*.{domain} -> {', '.join(sorted(wildcard))}"
+            ))
+
         if found_subs:
             # Sort and limit evidence
             sorted_subs = sorted(list(found_subs))
@@ -74,27 +105,82 @@ class SubdomainScanner:
                 evidence=",".join(sorted_subs[:10]) + ("..." if len(found_subs) > 10 else "")
             ))
             
-            # 3. Check for Subdomain Takeover
-            # Only check a subset to avoid massive DNS queries if 1000 subs found
-            takeover_candidates = []
-            
-            for sub in list(found_subs)[:20]:
-                try:
-                    answers = dns.resolver.resolve(sub, 'CNAME')
-                    for rdata in answers:
-                        cname = str(rdata.target).rstrip('.')
-                        for fingerprint, platform in self.TAKEOVER_SIGNATURES.items():
-                            if fingerprint in cname:
-                                takeover_candidates.append(f"{sub} -> {cname} ({platform})")
-                except:
-                    pass
-            
-            if takeover_candidates:
+            # 3. Check for Subdomain Takeover (every subdomain, CNAME chains resolved concurrently)
+            confirmed, potential = self.check_takeover(found_subs, deadline)
+
+            if confirmed:
+                results.append(DetectionResult(
+                    technology="Subdomain Takeover",
+                    category="Security Risk",
+                    confidence=100,
+                    evidence=self._takeover_evidence(confirmed)
+                ))
+            if potential:
                 results.append(DetectionResult(
                     technology="Potential Subdomain Takeover",
                     category="Security Risk",
-                    confidence=90,
-                    evidence="; ".join(takeover_candidates)
+                    confidence=90 if not self.confirm_takeover else 60,
+                    evidence=self._takeover_evidence(potential)
                 ))
 
         return results
+
+    def check_takeover(self, subdomains: Iterable[str], deadline: Deadline = None) -> Tuple[List[str], List[str]]:
+        deadline = deadline or Deadline()
+        chains = self.dns_engine.cname_chains(sorted(subdomains), deadline)
+
+        candidates = []
+        for sub, info in sorted(chains.items()):
+            for cname in info['chain']:
+                platform = self._takeover_platform(cname)
+                if platform:
+                    candidates.append((sub, cname, platform, info['nxdomain']))
+                    break
+
+        if not self.confirm_takeover:
+            return [], [f"{sub} -> {cname} ({platform})" for sub, cname, platform, _ in candidates]
+
+        def confirm(candidate):
+            sub, cname, platform, nxdomain = candidate
+            if nxdomain:
+                return "dangling CNAME (NXDOMAIN)"
+            fingerprint = self.TAKEOVER_FINGERPRINTS.get(platform)
+            if not fingerprint or deadline.expired():
+                return None
+            for scheme in ('https', 'http'):
+                try:
+                    r = requests.get(f"{scheme}://{sub}", headers=HEADERS, timeout=deadline.timeout(5), allow_redirects=False)
+                    return "unclaimed page" if fingerprint in r.text else None
+                except Exception:
+                    continue
+            return None
+
+        reasons = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
+            future_to_candidate = {executor.submit(confirm, candidate): candidate for candidate in candidates}
+            for future in deadline.as_completed(executor, future_to_candidate):
+                reasons[future_to_candidate[future]] = future.result()
+
+        # Candidates left unchecked when the budget ran out still count as potential
+        confirmed, potential = [], []
+        for candidate in candidates:
+            sub, cname, platform, _ = candidate
+            if reasons.get(candidate):
+                confirmed.append(f"{sub} -> {cname} ({platform}, {reasons[candidate]})")
+            else:
+                potential.append(f"{sub} -> {cname} ({platform})")
+        return confirmed, potential
+
+    def _takeover_evidence(self, findings: List[str]) -> str:
+        shown = "; ".join(findings[:self.SHOWN_TAKEOVERS])
+        if len(findings) > self.SHOWN_TAKEOVERS:
+            shown += f"; ... ({len(findings)} in total)"
+        return shown
+
+    def _takeover_platform(self, cname: str) -> Optional[str]:
+        labels = cname.lower().rstrip('.').split('.')
+        for i in range(len(labels) - 1):
+            platform = self.takeover_index.get('.'.join(labels[i:]))
+            if platform:
+                return platform
+        return None
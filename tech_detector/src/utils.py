@@ -1,6 +1,72 @@
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any
-from bs4 import BeautifulSoup
+from typing import Dict, Iterable, Iterator, List, Optional, Any, TYPE_CHECKING
+import hashlib
+import json
+import os
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+# Local state (scan history, caches) lives here unless overridden
+CACHE_DIR = os.environ.get('TECHDETECTOR_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'techdetector'))
+
+# Well-known files the fetcher requests for every page (through the scan cache, so each once per host)
+PROBE_PATHS = ['/robots.txt', '/sitemap.xml', '/manifest.json', '/feed', '/rss', '/atom.xml', '/graphql',
+               '/.well-known/security.txt', '/.well-known/apple-app-site-association']
+
+def content_hash(content) -> str:
+    if isinstance(content, str):
+        content = content.encode('utf-8', errors='replace')
+    return hashlib.sha256(content or b"").hexdigest()
+
+# Second-level suffixes under which registrations happen one label deeper (no full public suffix list)
+MULTI_LABEL_SUFFIXES = {
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'com.tr', 'net.tr', 'org.tr', 'gen.tr', 'edu.tr', 'gov.tr', 'k12.tr',
+    'com.au', 'net.au', 'org.au', 'co.jp', 'ne.jp', 'or.jp', 'co.nz', 'co.za', 'com.br', 'com.cn', 'com.mx',
+    'co.in', 'co.kr', 'com.sg', 'com.hk', 'co.il', 'com.ar', 'com.ua', 'co.id'
+}
+
+def registered_domain(host: str) -> str:
+    labels = (host or '').lower().strip('.').split('.')
+    if len(labels) <= 2:
+        return '.'.join(labels)
+    if '.'.join(labels[-2:]) in MULTI_LABEL_SUFFIXES:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+def iter_json_array(chunks: Iterable[str], max_buffer=1 << 20) -> Iterator[Any]:
+    # Yields the elements of a top-level JSON array as text chunks arrive,
+    # so a multi-hundred-MB response is never held (or parsed) as a whole
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    for chunk in chunks:
+        buffer += chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                break # Element continues in the next chunk
+            if end == len(buffer) and buffer[end - 1] not in '}]"':
+                break # A number cut at the chunk edge may have more digits coming
+            pos = end
+            yield item
+        buffer = buffer[pos:]
+        if len(buffer) > max_buffer:
+            raise ValueError("JSON array element too large")
 
 @dataclass
 class SiteData:
@@ -10,7 +76,7 @@ class SiteData:
     headers: Dict[str, str]
     cookies: Dict[str, str]
     html: str
-    soup: Optional[BeautifulSoup] = None
+    soup: Optional['BeautifulSoup'] = None
     
     # Assets
     scripts: List[str] = field(default_factory=list) # URLs
@@ -26,6 +92,11 @@ class SiteData:
     # Extra
     favicon_hash: int = 0
     cert_issuer: str = ""
+
+    # TLS of the connection the page came in on (empty for plain HTTP)
+    peer_cert: bytes = b""  # DER
+    tls_version: str = ""
+    tls_cipher: str = ""
     dns_records: Dict[str, List[str]] = field(default_factory=dict)
     
     # Probes
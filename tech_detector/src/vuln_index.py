@@ -0,0 +1,156 @@
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+# Version keys: (release, (phase, number)) with trailing zero release segments dropped, so
+# 3.5 == 3.5.0 and 3.5.0-rc1 < 3.5.0 < 3.5.0p1. Phase ranks order dev < alpha < beta < rc < final < post.
+PHASES = {
+    'dev': -4, 'snapshot': -4,
+    'a': -3, 'alpha': -3,
+    'b': -2, 'beta': -2,
+    'c': -1, 'rc': -1, 'pre': -1, 'preview': -1,
+    'p': 1, 'pl': 1, 'patch': 1, 'post': 1, 'r': 1, 'rev': 1
+}
+FINAL = 0
+
+MIN_KEY = ((), (-10, 0))
+MAX_KEY = ((float('inf'),), (0, 0))
+
+@lru_cache(maxsize=65536)
+def parse_version(text: str) -> Optional[tuple]:
+    text = (text or '').strip().lower()
+    match = re.match(r'v?(\d+(?:\.\d+)*)(.*)$', text)
+    if not match:
+        return None
+    release = [int(part) for part in match.group(1).split('.')]
+    while release and release[-1] == 0:
+        release.pop()
+
+    suffix = match.group(2).split('+', 1)[0] # Build metadata never orders versions
+    phase = (FINAL, 0)
+    if re.match(r'[a-z]$', suffix):
+        # A bare trailing letter is a letter release (OpenSSL 1.0.2k, 1.12.4a) and sorts after the plain
+        # version; pre-releases carry a number or a word (1.0a1, 3.5.0-rc1, 2.0-beta)
+        phase = (1, ord(suffix) - ord('a') + 1)
+    else:
+        tag = re.match(r'[-._~]?([a-z]+)[-._]?(\d*)', suffix)
+        if tag and tag.group(1) in PHASES:
+            phase = (PHASES[tag.group(1)], int(tag.group(2) or 0))
+    return (tuple(release), phase)
+
+def _after(key: tuple) -> tuple:
+    # Smallest key above `key`: turns an inclusive bound (last_affected) into an exclusive one
+    return (key[0], key[1] + (1,))
+
+class _IntervalTree:
+    # Centered interval tree over half-open [start, end) version ranges: a stabbing query
+    # costs O(log n + hits) no matter how many advisories a product has.
+    def __init__(self, intervals: List[Tuple[tuple, tuple, int]]):
+        self.root = self._build(intervals)
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        points = sorted(point for start, end, _ in intervals for point in (start, end))
+        # Lower median: guarantees at least one interval stays at this node, so recursion always shrinks
+        center = points[(len(points) - 1) // 2]
+        left, right, here = [], [], []
+        for interval in intervals:
+            start, end, _ = interval
+            if end <= center:
+                left.append(interval)
+            elif start > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        by_start = sorted(here, key=lambda i: i[0])
+        by_end = sorted(here, key=lambda i: i[1], reverse=True)
+        return (center, by_start, by_end, self._build(left), self._build(right))
+
+    def stab(self, point: tuple) -> List[int]:
+        hits = []
+        node = self.root
+        while node:
+            center, by_start, by_end, left, right = node
+            if point < center:
+                # Everything here reaches past the center, so only the start matters
+                for start, _, value in by_start:
+                    if start > point:
+                        break
+                    hits.append(value)
+                node = left
+            else:
+                # Everything here starts at or before the center, so only the end matters
+                for _, end, value in by_end:
+                    if end <= point:
+                        break
+                    hits.append(value)
+                node = right
+        return hits
+
+class VulnerabilityIndex:
+    SEVERITY_ORDER = {'critical': 0, 'high': 1, 'medium': 2, 'moderate': 2, 'low': 3}
+
+    def __init__(self):
+        self.advisories = []  # id -> {'cve', 'severity', 'description', 'ranges'}
+        self._intervals = {}  # product (lowercase) -> [(start, end, advisory id)]
+        self._trees = {}      # product (lowercase) -> _IntervalTree, built on first query
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'VulnerabilityIndex':
+        # vulnerabilities.json layout: {product: {"rules": [rule, ...]}}
+        index = cls()
+        for product, entry in data.items():
+            for rule in entry.get('rules', []):
+                index.add(product, rule)
+        return index
+
+    def add(self, product: str, rule: dict):
+        # A rule lists affected ranges {"introduced" | "introduced_after", "fixed" | "last_affected"}; the legacy form
+        # {"max_version": X} means everything below X
+        ranges = rule.get('ranges') or ([{'fixed': rule['max_version']}] if rule.get('max_version') else [])
+        intervals = []
+        for affected in ranges:
+            if affected.get('introduced_after'):
+                start = parse_version(affected['introduced_after'])
+                start = _after(start) if start else None
+            else:
+                start = parse_version(affected['introduced']) if affected.get('introduced') not in (None, '0') else MIN_KEY
+            if affected.get('fixed'):
+                end = parse_version(affected['fixed'])
+            elif affected.get('last_affected'):
+                end = parse_version(affected['last_affected'])
+                end = _after(end) if end else None
+            else:
+                end = MAX_KEY
+            if start is not None and end is not None and start < end:
+                intervals.append((start, end))
+        if not intervals:
+            return
+
+        advisory_id = len(self.advisories)
+        self.advisories.append({
+            'cve': rule.get('cve', ''),
+            'severity': rule.get('severity', 'Unknown'),
+            'description': rule.get('description', ''),
+            'ranges': ranges
+        })
+        key = product.lower()
+        self._intervals.setdefault(key, []).extend((start, end, advisory_id) for start, end in intervals)
+        self._trees.pop(key, None)
+
+    def products(self) -> Iterable[str]:
+        return self._intervals.keys()
+
+    def lookup(self, product: str, version: str) -> List[dict]:
+        # Every advisory whose ranges contain the version, most severe first
+        key = product.lower()
+        point = parse_version(version)
+        if point is None or key not in self._intervals:
+            return []
+        tree = self._trees.get(key)
+        if tree is None:
+            tree = self._trees[key] = _IntervalTree(self._intervals[key])
+        ids = sorted(set(tree.stab(point)))
+        matches = [self.advisories[i] for i in ids]
+        return sorted(matches, key=lambda a: (self.SEVERITY_ORDER.get(a['severity'].lower(), 4), a['cve']))
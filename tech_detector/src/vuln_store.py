@@ -0,0 +1,330 @@
+import codecs
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+import zipfile
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Optional, Tuple
+from .utils import CACHE_DIR, iter_json_array
+from .vuln_index import VulnerabilityIndex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER);
+CREATE TABLE IF NOT EXISTS advisories (id INTEGER PRIMARY KEY, source TEXT, cve TEXT, severity TEXT, description TEXT);
+CREATE TABLE IF NOT EXISTS ranges (product TEXT, advisory INTEGER, introduced TEXT, introduced_after INTEGER,
+                                   fixed TEXT, last_affected TEXT);
+CREATE INDEX IF NOT EXISTS ranges_product ON ranges (product);
+CREATE INDEX IF NOT EXISTS advisories_source ON advisories (source);
+"""
+
+class VulnerabilityStore:
+    # Detected technology name -> product keys used by advisory feeds (NVD CPE vendor:product)
+    ALIASES = {
+        'apache': ['apache:http_server'],
+        'nginx': ['nginx:nginx', 'f5:nginx'],
+        'iis': ['microsoft:internet_information_services'],
+        'openssh': ['openbsd:openssh'],
+        'bootstrap': ['getbootstrap:bootstrap'],
+        'jquery ui': ['jqueryui:jquery_ui', 'jquery-ui'],
+        'mysql': ['oracle:mysql'],
+        'mariadb': ['mariadb:mariadb'],
+        'wordpress': ['wordpress:wordpress'],
+        'drupal': ['drupal:drupal'],
+        'php': ['php:php'],
+        'tomcat': ['apache:tomcat'],
+        'exim': ['exim:exim']
+    }
+
+    BATCH = 2000 # Advisories per transaction: memory stays flat however large the feed is
+
+    def __init__(self, path: str = None, cache_size=256):
+        self.path = path or os.path.join(CACHE_DIR, 'vulnerabilities.sqlite')
+        self.cache_size = cache_size
+        self._local = threading.local()
+        self._indexes = OrderedDict() # technology -> VulnerabilityIndex of its advisories
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        # One connection per thread (sqlite3 connections can't be shared across threads)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None) # Transactions are explicit
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # --- Querying ---
+
+    def lookup(self, technology: str, version: str) -> List[dict]:
+        index = self._index(technology)
+        return index.lookup(technology, version)
+
+    def _index(self, technology: str) -> VulnerabilityIndex:
+        # Advisories for one technology are read once and kept in a bounded LRU; the rest stay on disk
+        with self._lock:
+            if technology in self._indexes:
+                self._indexes.move_to_end(technology)
+                return self._indexes[technology]
+
+        products = self.product_keys(technology)
+        rows = self._db().execute(
+            f"SELECT a.id, a.cve, a.severity, a.description, r.introduced, r.introduced_after, r.fixed, r.last_affected "
+            f"FROM ranges r JOIN advisories a ON a.id = r.advisory WHERE r.product IN ({','.join('?' * len(products))}) "
+            f"ORDER BY a.id", products).fetchall()
+
+        rules = OrderedDict()
+        for advisory, cve, severity, description, introduced, after, fixed, last_affected in rows:
+            rule = rules.setdefault(cve or advisory, {'cve': cve, 'severity': severity, 'description': description,
+                                                      'ranges': [], 'advisory': advisory})
+            if rule['advisory'] != advisory:
+                continue # Same CVE from a second feed: the first import wins
+            rule['ranges'].append({'introduced_after' if after else 'introduced': introduced,
+                                   'fixed': fixed, 'last_affected': last_affected})
+        index = VulnerabilityIndex()
+        for rule in rules.values():
+            index.add(technology, rule)
+
+        with self._lock:
+            self._indexes[technology] = index
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+        return index
+
+    def product_keys(self, technology: str) -> List[str]:
+        name = technology.lower().strip()
+        underscored = name.replace(' ', '_')
+        keys = [name, underscored, f"{underscored}:{underscored}"] + self.ALIASES.get(name, [])
+        return list(dict.fromkeys(keys))
+
+    # --- Importing ---
+
+    def import_path(self, path: str) -> Tuple[int, int, int]:
+        # Imports a feed file (.json/.json.gz/.zip) or every feed under a directory.
+        # Files whose size and mtime are unchanged since the last import are skipped.
+        # Returns (files imported, files skipped, advisories written)
+        files = [path]
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+                           if name.endswith(('.json', '.json.gz', '.zip')))
+
+        imported = skipped = advisories = 0
+        for file_path in files:
+            count = self._import_file(os.path.abspath(file_path))
+            if count is None:
+                skipped += 1
+            else:
+                imported += 1
+                advisories += count
+        if imported:
+            with self._lock:
+                self._indexes.clear()
+        return imported, skipped, advisories
+
+    def _import_file(self, path: str) -> Optional[int]:
+        stat = os.stat(path)
+        db = self._db()
+        previous = db.execute("SELECT size, mtime_ns FROM sources WHERE path = ?", (path,)).fetchone()
+        if previous == (stat.st_size, stat.st_mtime_ns):
+            return None
+
+        count = 0
+        db.execute("BEGIN")
+        try:
+            # Changed (or new) source: its old advisories are replaced as a whole
+            db.execute("DELETE FROM ranges WHERE advisory IN (SELECT id FROM advisories WHERE source = ?)", (path,))
+            db.execute("DELETE FROM advisories WHERE source = ?", (path,))
+            for advisory in self._advisories(path):
+                self._insert(db, path, advisory)
+                count += 1
+                if count % self.BATCH == 0:
+                    db.execute("COMMIT")
+                    db.execute("BEGIN")
+            db.execute("INSERT OR REPLACE INTO sources (path, size, mtime_ns) VALUES (?, ?, ?)",
+                       (path, stat.st_size, stat.st_mtime_ns))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return count
+
+    def _insert(self, db: sqlite3.Connection, source: str, advisory: dict):
+        cursor = db.execute("INSERT INTO advisories (source, cve, severity, description) VALUES (?, ?, ?, ?)",
+                            (source, advisory['cve'], advisory['severity'], advisory['description']))
+        db.executemany("INSERT INTO ranges VALUES (?, ?, ?, ?, ?, ?)", [
+            (product.lower(), cursor.lastrowid, affected.get('introduced') or affected.get('introduced_after') or '0',
+             1 if affected.get('introduced_after') else 0, affected.get('fixed'), affected.get('last_affected'))
+            for product, affected in advisory['ranges']
+        ])
+
+    def _advisories(self, path: str) -> Iterator[dict]:
+        # Normalized advisories: {'cve', 'severity', 'description', 'ranges': [(product, range dict)]}
+        if path.endswith('.zip'):
+            # OSV exports: one advisory per member
+            with zipfile.ZipFile(path) as archive:
+                for name in archive.namelist():
+                    if name.endswith('.json'):
+                        with archive.open(name) as f:
+                            yield from self._parse_document(self._chunks(f))
+            return
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            yield from self._parse_document(self._chunks(f))
+
+    def _chunks(self, f, size=1 << 16) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        for block in iter(lambda: f.read(size), b''):
+            yield decoder.decode(block)
+
+    def _parse_document(self, chunks: Iterator[str]) -> Iterator[dict]:
+        # NVD feeds wrap their items in one huge array ("CVE_Items" in 1.1, "vulnerabilities" in 2.0):
+        # that array is streamed item by item. Anything else (a single OSV advisory, the bundled
+        # vulnerabilities.json, a JSON array of OSV advisories) is small enough, or an array itself.
+        head = ''
+        for chunk in chunks:
+            head += chunk
+            match = re.search(r'"(CVE_Items|vulnerabilities)"\s*:\s*\[', head)
+            if match:
+                rest = head[match.end() - 1:]
+                for item in iter_json_array(self._prepend(rest, chunks), max_buffer=16 << 20):
+                    advisory = self._from_nvd(item)
+                    if advisory:
+                        yield advisory
+                return
+            stripped = head.lstrip()
+            if stripped.startswith('['):
+                for item in iter_json_array(self._prepend(head, chunks), max_buffer=16 << 20):
+                    yield from self._from_document(item)
+                return
+            if len(head) > 1 << 16:
+                break
+        head += ''.join(chunks)
+        if head.strip():
+            yield from self._from_document(json.loads(head))
+
+    def _prepend(self, first: str, chunks: Iterator[str]) -> Iterator[str]:
+        yield first
+        yield from chunks
+
+    def _from_document(self, doc) -> Iterator[dict]:
+        if not isinstance(doc, dict):
+            return
+        if 'affected' in doc:
+            advisory = self._from_osv(doc)
+            if advisory:
+                yield advisory
+        elif 'cve' in doc or 'configurations' in doc:
+            advisory = self._from_nvd(doc)
+            if advisory:
+                yield advisory
+        else:
+            # Bundled format: {product: {"rules": [{"cve", "severity", "description", "ranges" | "max_version"}]}}
+            for product, entry in doc.items():
+                for rule in (entry.get('rules', []) if isinstance(entry, dict) else []):
+                    ranges = rule.get('ranges') or ([{'fixed': rule['max_version']}] if rule.get('max_version') else [])
+                    yield {
+                        'cve': rule.get('cve', ''),
+                        'severity': rule.get('severity', 'Unknown'),
+                        'description': rule.get('description', ''),
+                        'ranges': [(product, affected) for affected in ranges]
+                    }
+
+    def _from_osv(self, doc: dict) -> Optional[dict]:
+        ranges = []
+        for affected in doc.get('affected', []):
+            product = (affected.get('package') or {}).get('name')
+            if not product:
+                continue
+            for version_range in affected.get('ranges', []):
+                if version_range.get('type') == 'GIT':
+                    continue # Commit hashes, not versions
+                # Events come in order: introduced, then fixed / last_affected closes the range
+                current = None
+                for event in version_range.get('events', []):
+                    if 'introduced' in event:
+                        current = {'introduced': event['introduced']}
+                    elif current and ('fixed' in event or 'last_affected' in event):
+                        current.update({k: event[k] for k in ('fixed', 'last_affected') if k in event})
+                        ranges.append((product, current))
+                        current = None
+                if current:
+                    ranges.append((product, current))
+            if not affected.get('ranges'):
+                # Explicit version lists only
+                ranges.extend((product, {'introduced': v, 'last_affected': v}) for v in affected.get('versions', []))
+        if not ranges:
+            return None
+
+        aliases = [a for a in doc.get('aliases', []) if a.startswith('CVE-')]
+        severity = (doc.get('database_specific') or {}).get('severity') or 'Unknown'
+        return {
+            'cve': aliases[0] if aliases else doc.get('id', ''),
+            'severity': severity.capitalize(),
+            'description': doc.get('summary') or (doc.get('details') or '')[:200],
+            'ranges': ranges
+        }
+
+    def _from_nvd(self, item: dict) -> Optional[dict]:
+        cve = item.get('cve', {})
+        if 'CVE_data_meta' in cve:
+            # NVD JSON 1.1
+            cve_id = cve['CVE_data_meta'].get('ID', '')
+            descriptions = cve.get('description', {}).get('description_data', [])
+            impact = item.get('impact', {})
+            severity = (impact.get('baseMetricV3', {}).get('cvssV3', {}).get('baseSeverity')
+                        or impact.get('baseMetricV2', {}).get('severity'))
+            nodes = item.get('configurations', {}).get('nodes', [])
+        else:
+            # NVD API 2.0
+            cve_id = cve.get('id', '')
+            descriptions = cve.get('descriptions', [])
+            metrics = cve.get('metrics', {})
+            severity = None
+            for key in ('cvssMetricV31', 'cvssMetricV30', 'cvssMetricV2'):
+                for metric in metrics.get(key, []):
+                    severity = severity or metric.get('cvssData', {}).get('baseSeverity') or metric.get('baseSeverity')
+            nodes = [node for config in cve.get('configurations', []) for node in config.get('nodes', [])]
+
+        description = next((d.get('value', '') for d in descriptions if d.get('lang', 'en') == 'en'), '')
+        ranges = list(self._cpe_ranges(nodes))
+        if not ranges:
+            return None
+        return {
+            'cve': cve_id,
+            'severity': (severity or 'Unknown').capitalize(),
+            'description': description[:200],
+            'ranges': ranges
+        }
+
+    def _cpe_ranges(self, nodes: Iterable[dict]) -> Iterator[Tuple[str, dict]]:
+        for node in nodes:
+            yield from self._cpe_ranges(node.get('children', []))
+            for match in node.get('cpe_match', []) + node.get('cpeMatch', []):
+                if not match.get('vulnerable', True):
+                    continue
+                parts = (match.get('cpe23Uri') or match.get('criteria') or '').split(':')
+                if len(parts) < 7:
+                    continue
+                product = f"{parts[3]}:{parts[4]}"
+                version, update = parts[5], parts[6]
+                if version not in ('*', '-', ''):
+                    # A single listed version (OpenSSH-style updates such as p1 are part of it)
+                    if update not in ('*', '-', ''):
+                        version += update
+                    yield product, {'introduced': version, 'last_affected': version}
+                    continue
+                affected = {}
+                if match.get('versionStartIncluding'):
+                    affected['introduced'] = match['versionStartIncluding']
+                elif match.get('versionStartExcluding'):
+                    affected['introduced_after'] = match['versionStartExcluding']
+                if match.get('versionEndExcluding'):
+                    affected['fixed'] = match['versionEndExcluding']
+                elif match.get('versionEndIncluding'):
+                    affected['last_affected'] = match['versionEndIncluding']
+                if affected:
+                    yield product, affected
@@ -0,0 +1,55 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Dependencies that must not be imported just to build a Scanner
+HEAVY_MODULES = ['requests', 'bs4', 'lxml', 'dns.resolver', 'mmh3']
+
+# Runs in a fresh interpreter so nothing is already cached in sys.modules
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from src.scanner import Scanner
+scanner = Scanner()
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms": elapsed * 1000, "heavy": [m for m in %r if m in sys.modules]}))
+"""
+
+def measure(runs: int) -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = []
+    heavy = set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", PROBE % HEAVY_MODULES], cwd=root,
+                             capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        samples.append(result["ms"])
+        heavy.update(result["heavy"])
+    return {"median_ms": statistics.median(samples), "min_ms": min(samples), "heavy": sorted(heavy)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Import/startup benchmark for the Scanner (fails on regression)")
+    parser.add_argument("--runs", type=int, default=7, help="Fresh interpreters to time (default: 7)")
+    parser.add_argument("--max-ms", type=float, default=60.0, help="Fail if the median startup exceeds this (default: 60)")
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    print(f"[*] Scanner import + construction: median {result['median_ms']:.1f} ms, min {result['min_ms']:.1f} ms over {args.runs} runs")
+
+    failed = False
+    if result["heavy"]:
+        print(f"[-] Heavy modules imported at startup: {', '.join(result['heavy'])}")
+        failed = True
+    if result["median_ms"] > args.max_ms:
+        print(f"[-] Startup regression: {result['median_ms']:.1f} ms > {args.max_ms:.1f} ms budget")
+        failed = True
+
+    if not failed:
+        print("[+] Startup within budget.")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.fingerprint_db import MANIFEST, FingerprintDB, build_manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate a directory of fingerprint shards and write its manifest.json")
+    parser.add_argument("directory", help="Directory of fingerprint shards (our format or upstream Wappalyzer)")
+    parser.add_argument("--check", action="store_true", help="Only validate; do not write the manifest")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"not a directory: {args.directory}")
+
+    manifest = build_manifest(args.directory)
+    print(f"[*] {len(manifest['shards'])} shards, {len(manifest['technologies'])} technologies")
+
+    if not args.check:
+        tmp_path = os.path.join(args.directory, f"{MANIFEST}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(args.directory, MANIFEST))
+        print(f"[+] Manifest written to {os.path.join(args.directory, MANIFEST)}")
+
+    # Compile every pattern once so broken shards are caught here rather than at scan time
+    db = FingerprintDB(args.directory)
+    db.preload()
+    for error in db.errors:
+        print(f"[-] {error}")
+    sys.exit(1 if db.errors else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from src.library_hashes import LibraryHashIndex, hash_variants
+from src.vuln_index import parse_version
+
+JSDELIVR_FILES = "https://data.jsdelivr.com/v1/packages/npm/{package}@{version}?structure=flat"
+JSDELIVR_FILE = "https://cdn.jsdelivr.net/npm/{package}@{version}{name}"
+
+# Package directories that never end up on a page as-is
+SKIPPED_DIRS = ('/src/', '/test/', '/tests/', '/spec/', '/node_modules/', '/types/')
+
+def read_text(path: str) -> str:
+    # Decoded the way the fetcher hands bundles to the engine
+    with open(path, 'rb') as f:
+        return f.read().decode('utf-8', errors='replace')
+
+def add(libraries: dict, technology: str, version: str, content: str, categories: dict) -> int:
+    library = libraries.setdefault(technology, {'category': categories.get(technology, 'JavaScript Libraries'), 'hashes': {}})
+    added = 0
+    for digest in set(hash_variants(content)):
+        versions = library['hashes'].setdefault(digest, [])
+        if version not in versions:
+            versions.append(version)
+            versions.sort(key=lambda v: parse_version(v) or ((), (0, 0)))
+            added += 1
+    return added
+
+def from_tree(libraries: dict, directory: str, categories: dict) -> int:
+    # <directory>/<Technology>/<version>/**/*.js
+    added = 0
+    for technology in sorted(os.listdir(directory)):
+        tech_dir = os.path.join(directory, technology)
+        if not os.path.isdir(tech_dir):
+            continue
+        for version in sorted(os.listdir(tech_dir)):
+            for root, _, files in os.walk(os.path.join(tech_dir, version)):
+                for file_name in files:
+                    if file_name.endswith('.js'):
+                        added += add(libraries, technology, version, read_text(os.path.join(root, file_name)), categories)
+    return added
+
+def from_npm(libraries: dict, spec: str, categories: dict) -> int:
+    # "jquery@3.7.1,3.6.4=jQuery": every shipped .js file of those releases, as jsDelivr serves them
+    import requests
+    package_versions, _, technology = spec.partition('=')
+    package, _, versions = package_versions.rpartition('@')
+    added = 0
+    for version in versions.split(','):
+        listing = requests.get(JSDELIVR_FILES.format(package=package, version=version), timeout=30)
+        listing.raise_for_status()
+        for entry in listing.json().get('files', []):
+            name = entry.get('name', '')
+            if not name.endswith('.js') or any(d in name for d in SKIPPED_DIRS):
+                continue
+            r = requests.get(JSDELIVR_FILE.format(package=package, version=version, name=name), timeout=30)
+            if r.status_code == 200:
+                r.encoding = 'utf-8'
+                added += add(libraries, technology or package, version, r.text, categories)
+        print(f"[*] {package}@{version}: done")
+    return added
+
+def main():
+    parser = argparse.ArgumentParser(description="Add known library releases to the JS bundle hash index")
+    parser.add_argument("--tree", action="append", default=[], help="Directory laid out as <Technology>/<version>/**/*.js")
+    parser.add_argument("--file", action="append", default=[], nargs=3, metavar=("TECHNOLOGY", "VERSION", "PATH"),
+                        help="A single release file")
+    parser.add_argument("--npm", action="append", default=[], metavar="PACKAGE@VERSIONS=TECHNOLOGY",
+                        help="Fetch releases from jsDelivr, e.g. jquery@3.7.1,3.6.4=jQuery")
+    parser.add_argument("--output", default=LibraryHashIndex.DEFAULT_PATH, help="Index to update (default: data/library_hashes.json)")
+    args = parser.parse_args()
+
+    try:
+        with open(args.output, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {'libraries': {}}
+    libraries = index.setdefault('libraries', {})
+
+    # Technologies we already fingerprint keep their category
+    with open(os.path.join(ROOT, 'data', 'fingerprints.json'), 'r', encoding='utf-8') as f:
+        categories = {rule['name']: rule.get('category', 'Unknown') for rule in json.load(f).get('technologies', [])}
+
+    added = 0
+    for directory in args.tree:
+        added += from_tree(libraries, directory, categories)
+    for technology, version, path in args.file:
+        added += add(libraries, technology, version, read_text(path), categories)
+    for spec in args.npm:
+        added += from_npm(libraries, spec, categories)
+
+    tmp_path = f"{args.output}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, args.output)
+    total = sum(len(library['hashes']) for library in libraries.values())
+    print(f"[+] {added} new hash(es); {total} in {args.output}")
+
+if __name__ == "__main__":
+    main()